@@ -14,12 +14,60 @@ CAMPOS_CONFIG = {
 
 # === CONFIGURACIÓN DE BALANZA GAMA ===
 BALANZA_CONFIG = {
+    'simular_balanza': False, # True = usar el emulador (pty, solo Linux) en lugar de la balanza
+    'peso_min_simulado': 15.0,  # Rango de pesos de los fardos emulados
+    'peso_max_simulado': 45.0,
     'puerto_serie': 'COM1',   # Puerto serie de la balanza
     'baudrate': 9600,         # Velocidad de comunicación
     'timeout': 1,             # Timeout en segundos
     'activar_dtr': True,      # Activar DTR para la balanza
     'activar_rts': True,      # Activar RTS para la balanza
-    'protocolo': 'CONTINUO',  # Protocolo de comunicación
+    'protocolo': 'CONTINUO',  # Decodificador a usar (ver funciones/protocolos.py)
+    'modo_lectura': 'auto',   # 'continuo', 'comando' (sondeo) o 'auto' (sondea si la balanza no transmite sola)
+    'sondeo_intervalo_min': 0.05,     # Segundos entre pedidos mientras el peso cambia
+    'sondeo_intervalo_max': 0.5,      # Segundos entre pedidos con la balanza quieta
+    'sondeo_timeout': 0.5,            # Segundos de espera de cada respuesta
+    'division_balanza': 0.01,         # División (resolución) de la balanza en kg
+    'filtro_etapas': ['mediana', 'ema', 'banda_muerta', 'redondeo'],  # Filtros del peso mostrado, en orden ([] = crudo).
+                                      # La captura usa la mediana (o el peso ST de la balanza), sin promedio ni banda
+    'filtro_ventana_mediana': 5,      # Lecturas de la mediana móvil (descarta picos)
+    'filtro_alfa_ema': 0.3,           # Peso de cada lectura nueva en el promedio exponencial
+    'filtro_salto': 2.0,              # kg de salto que reinician el promedio (carga nueva)
+    'filtro_banda_muerta': 0.02,      # kg que debe moverse el peso para cambiar lo mostrado
+    'filtro_muestras': 64,            # Tamaño del anillo de muestras del filtro
+    'estabilidad_muestras': 10,       # Lecturas evaluadas si la balanza no informa ST/US
+    'estabilidad_tolerancia': 0.5,    # kg de variación pico a pico aceptada
+    'estabilidad_espera_max': 5.0,    # Segundos que "Pesar" espera a que el peso se asiente
+    'timeout_sin_datos': 5.0,         # Segundos sin tramas para dar el puerto por perdido (0 = no vigilar)
+    'reconexion_espera_min': 0.5,     # Primera espera entre reintentos de conexión
+    'reconexion_espera_max': 30.0,    # Tope de la espera exponencial entre reintentos
+    'grabar_captura': False,          # Grabar los bytes crudos recibidos (diagnóstico de campo)
+    'carpeta_capturas': 'capturas',
+    'captura_tamano_max_mb': 10,      # Tamaño de cada archivo antes de rotar
+    'captura_archivos_max': 20,       # Archivos que se conservan (se borran los más viejos)
+    'telemetria': False,              # Guardar cada lectura (con resúmenes de 1 s y 1 min)
+    'carpeta_telemetria': 'telemetria',
+    'telemetria_dias': 90,            # Días de telemetría que se conservan (0 = todos)
+    'proceso_separado': False,        # Leer la balanza en otro proceso (memoria compartida)
+}
+
+# === BALANZAS ADICIONALES ===
+# Otras balanzas del puesto (ej. la de camiones para el romaneo). Cada una toma los
+# valores de BALANZA_CONFIG y reemplaza los que indique. Roles usados por la interfaz:
+#   'romaneo' -> llena "Kg Bruto Romaneo" con el peso en vivo
+# Ejemplo:
+#   {'nombre': 'Romaneo', 'rol': 'romaneo', 'puerto_serie': 'COM2',
+#    'baudrate': 9600, 'protocolo': 'CONTINUO', 'peso_min_simulado': 8000.0,
+#    'peso_max_simulado': 30000.0}
+BALANZAS_ADICIONALES = []
+
+# === CONFIGURACIÓN DE AUTO-PESAJE ===
+AUTOPESAJE_CONFIG = {
+    'umbral_carga': 20.0,          # kg a partir de los cuales hay un fardo en la balanza
+    'umbral_cero': 2.0,            # kg bajo los cuales la balanza se considera vacía (rearma)
+    'permanencia_minima': 1.0,     # Segundos de peso estable antes de capturar
+    'sonido': True,                # Pitido de confirmación en cada captura
+    'carpeta_registro': 'registros',  # Carpeta del registro diario de capturas/rechazos
 }
 
 # === CONFIGURACIÓN VISUAL MEJORADA ===
@@ -85,6 +133,23 @@ EXPORTACION_CONFIG = {
     'encoding': 'utf-8-sig',  # Para compatibilidad con Excel
 }
 
+# === CONFIGURACIÓN DE LA BASE DE DATOS ===
+BASE_DATOS_CONFIG = {
+    'wal': False,                  # False = journal DELETE. True = WAL, solo si la base está en disco
+                                   # local y NINGUNA otra PC la abre por la red (visor, configurar_red):
+                                   # WAL necesita memoria compartida (-shm), que no funciona por SMB
+    'synchronous': 'NORMAL',       # Con WAL: NORMAL o FULL
+    'mmap_mb': 64,                 # Lectura por memoria mapeada (0 = desactivada; solo disco local)
+    'cache_mb': 16,                # Caché de páginas por conexión
+    'busy_timeout_ms': 10000,      # Espera máxima si otra conexión tiene la base bloqueada
+    'sentencias_cacheadas': 256,   # Sentencias preparadas que guarda cada conexión
+    'escritura_agrupada_ms': 200,  # Guardados que llegan dentro de esta ventana van en una transacción
+    'espera_cierre_s': 10,         # Máximo que espera el cierre a que se escriba lo encolado
+    'diario': True,                # Diario local del ticket abierto para recuperarlo tras un corte
+    'carpeta_diario': 'diario',
+    'pagina_historial': 500,       # Tickets por página en el historial y el visor (0 = todos)
+}
+
 # === MENSAJES DEL SISTEMA ===
 MENSAJES = {
     'ticket_creado': 'Ticket creado exitosamente',
@@ -3,6 +3,8 @@ import os
 from datetime import datetime
 from typing import List, Optional, Tuple
 from funciones.modelos import Ticket, Fardo
+from funciones.conexion_bd import ConexionesSQLite
+from config.configuracion import CAMPOS_CONFIG
 
 class BaseDatos:
     """Clase para manejar la base de datos SQLite"""
@@ -10,13 +12,13 @@ class BaseDatos:
     def __init__(self, nombre_db: str = "pesaje_fardos.db"):
         self.nombre_db = nombre_db
         self.ruta_db = os.path.join(os.path.dirname(os.path.dirname(__file__)), nombre_db)
+        self.conexiones = ConexionesSQLite(self.ruta_db)
         self.inicializar_db()
     
     def inicializar_db(self):
         """Inicializa la base de datos y crea las tablas si no existen"""
         try:
-            with sqlite3.connect(self.ruta_db) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.transaccion() as cursor:
                 
                 # Tabla de tickets
                 cursor.execute('''
@@ -63,111 +65,397 @@ class BaseDatos:
                     cursor.execute('ALTER TABLE tickets ADD COLUMN resto REAL DEFAULT 0')
                     print("✅ Columna resto agregada")
                 
+                cursor.execute("PRAGMA table_info(fardos)")
+                if 'peso_crudo' not in [columna[1] for columna in cursor.fetchall()]:
+                    cursor.execute('ALTER TABLE fardos ADD COLUMN peso_crudo REAL')
+                    print("✅ Columna peso_crudo agregada")
+                
                 # Índices para mejor rendimiento
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_numero ON tickets(numero)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_tickets_fecha ON tickets(fecha_creacion)')
                 cursor.execute('CREATE INDEX IF NOT EXISTS idx_fardos_ticket ON fardos(ticket_id)')
                 
-                conn.commit()
+                self._crear_resumen(cursor)
+                
                 print("✅ Base de datos inicializada correctamente")
                 
         except Exception as e:
             print(f"❌ Error al inicializar base de datos: {str(e)}")
             raise
     
-    def guardar_ticket(self, ticket: Ticket, datos_adicionales: dict = None) -> bool:
-        """Guarda un ticket completo en la base de datos"""
-        try:
-            with sqlite3.connect(self.ruta_db) as conn:
-                cursor = conn.cursor()
-                
-                # Preparar datos adicionales
-                kg_bruto_romaneo = None
+    @staticmethod
+    def _expresion_rinde(fila: str) -> str:
+        """Rinde en SQL sobre una fila de tickets_resumen (mismo cálculo que el panel)"""
+        tara = float(CAMPOS_CONFIG.get('tara_por_fardo', 2.0))
+        return (f"CASE WHEN {fila}.kg_bruto_romaneo > 0 THEN "
+                f"({fila}.peso_total + COALESCE({fila}.resto, 0) - COALESCE({fila}.agregado, 0) "
+                f"- {fila}.cantidad_fardos * {tara!r}) * 100.0 / {fila}.kg_bruto_romaneo END")
+    
+    def _crear_resumen(self, cursor):
+        """Tabla tickets_resumen: totales por ticket que mantienen los triggers
+
+        El historial y el visor leen solo esta tabla en lugar de agrupar todos los
+        fardos. Cada alta, repesaje o baja de fardo la corrige en O(1); mínimo y
+        máximo de hora se recalculan por índice solo si se tocó el extremo.
+        """
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tickets_resumen'")
+        nueva = cursor.fetchone() is None
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tickets_resumen (
+                ticket_id INTEGER PRIMARY KEY REFERENCES tickets (id),
+                numero TEXT NOT NULL,
+                fecha_creacion TIMESTAMP,
+                fecha_guardado TIMESTAMP,
+                estado TEXT,
+                kg_bruto_romaneo REAL,
+                agregado REAL,
+                resto REAL,
+                cantidad_fardos INTEGER NOT NULL DEFAULT 0,
+                peso_total REAL NOT NULL DEFAULT 0,
+                primera_pesada TIMESTAMP,
+                ultima_pesada TIMESTAMP,
+                rinde REAL
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_resumen_guardado ON tickets_resumen(estado, fecha_guardado)')
+        # Mínimo / máximo de hora por ticket sin recorrer sus fardos
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_fardos_ticket_hora ON fardos(ticket_id, hora_pesaje)')
+        
+        # Datos del ticket
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS resumen_ticket_alta AFTER INSERT ON tickets BEGIN
+                INSERT OR REPLACE INTO tickets_resumen (ticket_id, numero, fecha_creacion, fecha_guardado,
+                                                        estado, kg_bruto_romaneo, agregado, resto)
+                VALUES (NEW.id, NEW.numero, NEW.fecha_creacion, NEW.fecha_guardado,
+                        NEW.estado, NEW.kg_bruto_romaneo, NEW.agregado, NEW.resto);
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS resumen_ticket_cambio AFTER UPDATE ON tickets BEGIN
+                UPDATE tickets_resumen
+                SET numero = NEW.numero, fecha_creacion = NEW.fecha_creacion,
+                    fecha_guardado = NEW.fecha_guardado, estado = NEW.estado,
+                    kg_bruto_romaneo = NEW.kg_bruto_romaneo, agregado = NEW.agregado, resto = NEW.resto
+                WHERE ticket_id = NEW.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS resumen_ticket_baja AFTER DELETE ON tickets BEGIN
+                DELETE FROM tickets_resumen WHERE ticket_id = OLD.id;
+            END
+        ''')
+        
+        # Fardos (el UPSERT de _escribir_fardos dispara alta o cambio)
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS resumen_fardo_alta AFTER INSERT ON fardos BEGIN
+                UPDATE tickets_resumen
+                SET cantidad_fardos = cantidad_fardos + 1,
+                    peso_total = ROUND(peso_total + NEW.peso, 6),
+                    primera_pesada = CASE WHEN primera_pesada IS NULL OR NEW.hora_pesaje < primera_pesada
+                                          THEN NEW.hora_pesaje ELSE primera_pesada END,
+                    ultima_pesada = CASE WHEN ultima_pesada IS NULL OR NEW.hora_pesaje > ultima_pesada
+                                         THEN NEW.hora_pesaje ELSE ultima_pesada END
+                WHERE ticket_id = NEW.ticket_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS resumen_fardo_cambio
+            AFTER UPDATE OF peso, hora_pesaje ON fardos BEGIN
+                UPDATE tickets_resumen
+                SET peso_total = ROUND(peso_total - OLD.peso + NEW.peso, 6),
+                    primera_pesada = CASE
+                        WHEN OLD.hora_pesaje = primera_pesada
+                            THEN (SELECT MIN(hora_pesaje) FROM fardos WHERE ticket_id = NEW.ticket_id)
+                        WHEN NEW.hora_pesaje < primera_pesada THEN NEW.hora_pesaje
+                        ELSE primera_pesada END,
+                    ultima_pesada = CASE
+                        WHEN OLD.hora_pesaje = ultima_pesada
+                            THEN (SELECT MAX(hora_pesaje) FROM fardos WHERE ticket_id = NEW.ticket_id)
+                        WHEN NEW.hora_pesaje > ultima_pesada THEN NEW.hora_pesaje
+                        ELSE ultima_pesada END
+                WHERE ticket_id = NEW.ticket_id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS resumen_fardo_baja AFTER DELETE ON fardos BEGIN
+                UPDATE tickets_resumen
+                SET cantidad_fardos = cantidad_fardos - 1,
+                    peso_total = CASE WHEN cantidad_fardos <= 1 THEN 0
+                                      ELSE ROUND(peso_total - OLD.peso, 6) END,
+                    primera_pesada = CASE WHEN OLD.hora_pesaje = primera_pesada
+                        THEN (SELECT MIN(hora_pesaje) FROM fardos WHERE ticket_id = OLD.ticket_id)
+                        ELSE primera_pesada END,
+                    ultima_pesada = CASE WHEN OLD.hora_pesaje = ultima_pesada
+                        THEN (SELECT MAX(hora_pesaje) FROM fardos WHERE ticket_id = OLD.ticket_id)
+                        ELSE ultima_pesada END
+                WHERE ticket_id = OLD.ticket_id;
+            END
+        ''')
+        
+        # Rinde: depende de la tara configurada, así que estos triggers se rehacen siempre.
+        # También al insertar: un ticket con kg de romaneo y sin fardos ya tiene rinde
+        rinde = self._expresion_rinde('NEW')
+        cursor.execute('DROP TRIGGER IF EXISTS resumen_rinde_alta')
+        cursor.execute(f'''
+            CREATE TRIGGER resumen_rinde_alta AFTER INSERT ON tickets_resumen BEGIN
+                UPDATE tickets_resumen SET rinde = {rinde} WHERE ticket_id = NEW.ticket_id;
+            END
+        ''')
+        cursor.execute('DROP TRIGGER IF EXISTS resumen_rinde')
+        cursor.execute(f'''
+            CREATE TRIGGER resumen_rinde
+            AFTER UPDATE OF cantidad_fardos, peso_total, kg_bruto_romaneo, agregado, resto
+            ON tickets_resumen BEGIN
+                UPDATE tickets_resumen SET rinde = {rinde} WHERE ticket_id = NEW.ticket_id;
+            END
+        ''')
+        
+        if nueva:
+            # Migración única: resumen de los tickets que ya estaban guardados
+            cursor.execute('''
+                INSERT INTO tickets_resumen (ticket_id, numero, fecha_creacion, fecha_guardado, estado,
+                                             kg_bruto_romaneo, agregado, resto, cantidad_fardos,
+                                             peso_total, primera_pesada, ultima_pesada)
+                SELECT t.id, t.numero, t.fecha_creacion, t.fecha_guardado, t.estado,
+                       t.kg_bruto_romaneo, t.agregado, t.resto, COUNT(f.id),
+                       ROUND(COALESCE(SUM(f.peso), 0), 6), MIN(f.hora_pesaje), MAX(f.hora_pesaje)
+                FROM tickets t
+                LEFT JOIN fardos f ON t.id = f.ticket_id
+                GROUP BY t.id
+            ''')
+            print(f"✅ Resumen de tickets generado ({cursor.rowcount} tickets)")
+        
+        # Solo escribe si cambió la tara (o en la migración)
+        rinde = self._expresion_rinde('tickets_resumen')
+        cursor.execute(f'UPDATE tickets_resumen SET rinde = {rinde} WHERE rinde IS NOT ({rinde})')
+    
+    @staticmethod
+    def _leer_datos_adicionales(datos_adicionales: dict = None) -> tuple:
+        """Convierte los campos del panel a (kg_bruto_romaneo, agregado, resto, observaciones)"""
+        kg_bruto_romaneo = None
+        agregado = 0.0
+        resto = 0.0
+        observaciones = ""
+        
+        if datos_adicionales:
+            # Kg Bruto Romaneo
+            kg_bruto_str = datos_adicionales.get('kg_bruto_romaneo', '').strip()
+            if kg_bruto_str:
+                try:
+                    kg_bruto_romaneo = float(kg_bruto_str.replace(',', '.'))
+                except ValueError:
+                    kg_bruto_romaneo = None
+            
+            # Agregado
+            agregado_str = datos_adicionales.get('agregado', '0').strip()
+            try:
+                agregado = float(agregado_str.replace(',', '.'))
+            except ValueError:
                 agregado = 0.0
+            
+            # Resto
+            resto_str = datos_adicionales.get('resto', '0').strip()
+            try:
+                resto = float(resto_str.replace(',', '.'))
+            except ValueError:
                 resto = 0.0
-                observaciones = ""
-                
-                if datos_adicionales:
-                    # Kg Bruto Romaneo
-                    kg_bruto_str = datos_adicionales.get('kg_bruto_romaneo', '').strip()
-                    if kg_bruto_str:
-                        try:
-                            kg_bruto_romaneo = float(kg_bruto_str.replace(',', '.'))
-                        except ValueError:
-                            kg_bruto_romaneo = None
-                    
-                    # Agregado
-                    agregado_str = datos_adicionales.get('agregado', '0').strip()
-                    try:
-                        agregado = float(agregado_str.replace(',', '.'))
-                    except ValueError:
-                        agregado = 0.0
-                    
-                    # Resto
-                    resto_str = datos_adicionales.get('resto', '0').strip()
-                    try:
-                        resto = float(resto_str.replace(',', '.'))
-                    except ValueError:
-                        resto = 0.0
-                    
-                    # Observaciones
-                    observaciones = datos_adicionales.get('observaciones', '').strip()
-                
-                # Verificar si el ticket ya existe
-                cursor.execute('SELECT id FROM tickets WHERE numero = ?', (ticket.numero,))
-                ticket_existente = cursor.fetchone()
-                
-                if ticket_existente:
-                    # Actualizar ticket existente
-                    ticket_id = ticket_existente[0]
-                    cursor.execute('''
-                        UPDATE tickets 
-                        SET kg_bruto_romaneo = ?, agregado = ?, resto = ?, 
-                            observaciones = ?, fecha_guardado = CURRENT_TIMESTAMP
-                        WHERE id = ?
-                    ''', (kg_bruto_romaneo, agregado, resto, observaciones, ticket_id))
-                    
-                    # Eliminar fardos existentes para reemplazarlos
-                    cursor.execute('DELETE FROM fardos WHERE ticket_id = ?', (ticket_id,))
-                else:
-                    # Insertar nuevo ticket
-                    cursor.execute('''
-                        INSERT INTO tickets (numero, fecha_creacion, kg_bruto_romaneo, 
-                                           agregado, resto, observaciones)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (ticket.numero, ticket.fecha_creacion, kg_bruto_romaneo, 
-                          agregado, resto, observaciones))
-                    ticket_id = cursor.lastrowid
-                
-                # Insertar fardos
-                for fardo in ticket.fardos:
-                    cursor.execute('''
-                        INSERT INTO fardos (ticket_id, numero, peso, hora_pesaje)
-                        VALUES (?, ?, ?, ?)
-                    ''', (ticket_id, fardo.numero, fardo.peso, fardo.hora_pesaje))
-                
-                conn.commit()
-                print(f"✅ Ticket {ticket.numero} guardado correctamente")
-                return True
+            
+            # Observaciones
+            observaciones = datos_adicionales.get('observaciones', '').strip()
+        
+        return kg_bruto_romaneo, agregado, resto, observaciones
+    
+    def _cabecera(self, ticket: Ticket, datos_adicionales: dict = None) -> dict:
+        """Datos de la fila del ticket, copiados del modelo"""
+        return {
+            'numero': ticket.numero,
+            'fecha_creacion': ticket.fecha_creacion,
+            'id_bd': ticket.id_bd,
+            'cabecera': self._leer_datos_adicionales(datos_adicionales),
+        }
+    
+    def _escribir_cabecera(self, cursor, datos: dict) -> Tuple[int, bool]:
+        """Inserta o actualiza la fila del ticket; devuelve (id, True si ya existía)"""
+        kg_bruto_romaneo, agregado, resto, observaciones = datos['cabecera']
+        
+        ticket_id = datos['id_bd']
+        if ticket_id is None:
+            # Verificar si el ticket ya existe
+            cursor.execute('SELECT id FROM tickets WHERE numero = ?', (datos['numero'],))
+            ticket_existente = cursor.fetchone()
+            ticket_id = ticket_existente[0] if ticket_existente else None
+        
+        if ticket_id is not None:
+            cursor.execute('''
+                UPDATE tickets 
+                SET kg_bruto_romaneo = ?, agregado = ?, resto = ?, 
+                    observaciones = ?, fecha_guardado = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (kg_bruto_romaneo, agregado, resto, observaciones, ticket_id))
+            return ticket_id, True
+        
+        cursor.execute('''
+            INSERT INTO tickets (numero, fecha_creacion, kg_bruto_romaneo, 
+                               agregado, resto, observaciones)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (datos['numero'], datos['fecha_creacion'], kg_bruto_romaneo, 
+              agregado, resto, observaciones))
+        return cursor.lastrowid, False
+    
+    @staticmethod
+    def _escribir_fardos(cursor, ticket_id: int, fardos: dict):
+        """UPSERT de los fardos {numero: (peso, peso_crudo, hora_pesaje)} sobre (ticket_id, numero)"""
+        filas = [(ticket_id, numero) + datos for numero, datos in fardos.items()]
+        if not filas:
+            return
+        if sqlite3.sqlite_version_info >= (3, 24, 0):
+            cursor.executemany('''
+                INSERT INTO fardos (ticket_id, numero, peso, peso_crudo, hora_pesaje)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(ticket_id, numero) DO UPDATE SET
+                    peso = excluded.peso, peso_crudo = excluded.peso_crudo,
+                    hora_pesaje = excluded.hora_pesaje
+            ''', filas)
+            return
+        # SQLite anterior a 3.24 (Python viejo en Windows 7): sin UPSERT
+        for fila in filas:
+            cursor.execute('''
+                UPDATE fardos SET peso = ?, peso_crudo = ?, hora_pesaje = ?
+                WHERE ticket_id = ? AND numero = ?
+            ''', fila[2:] + fila[:2])
+            if cursor.rowcount == 0:
+                cursor.execute('''
+                    INSERT INTO fardos (ticket_id, numero, peso, peso_crudo, hora_pesaje)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', fila)
+    
+    def preparar_guardado(self, ticket: Ticket, datos_adicionales: dict = None) -> dict:
+        """Copia lo que hay que escribir del ticket y lo da por guardado
+
+        Corre en el hilo de la interfaz: el resultado no comparte nada mutable con el
+        modelo, así que escribir_guardados() puede ejecutarse en otro hilo. Si la
+        escritura falla, ticket.devolver_cambios(pendiente['cambios']) repone las marcas.
+        """
+        pendiente = self._cabecera(ticket, datos_adicionales)
+        modificados, eliminados = cambios = ticket.tomar_cambios()
+        # Un Ticket que nunca se guardó se escribe entero (reemplaza uno viejo con su número)
+        pendiente['reemplazar'] = ticket.id_bd is None
+        pendiente['fardos'] = {f.numero: (f.peso, f.peso_crudo, f.hora_pesaje) for f in ticket.fardos
+                               if pendiente['reemplazar'] or f.numero in modificados}
+        pendiente['eliminados'] = set(eliminados)
+        pendiente['cambios'] = cambios
+        return pendiente
+    
+    def escribir_guardados(self, pendientes: List[dict]) -> List[int]:
+        """Escribe varios guardados preparados en una sola transacción; devuelve los id"""
+        ids = []
+        with self.conexiones.transaccion() as cursor:
+            for pendiente in pendientes:
+                ticket_id, existia = self._escribir_cabecera(cursor, pendiente)
+                if pendiente['reemplazar']:
+                    if existia:
+                        cursor.execute('DELETE FROM fardos WHERE ticket_id = ?', (ticket_id,))
+                elif pendiente['eliminados']:
+                    cursor.executemany('DELETE FROM fardos WHERE ticket_id = ? AND numero = ?',
+                                       [(ticket_id, numero) for numero in pendiente['eliminados']])
+                self._escribir_fardos(cursor, ticket_id, pendiente['fardos'])
+                ids.append(ticket_id)
+        return ids
+    
+    def guardar_ticket(self, ticket: Ticket, datos_adicionales: dict = None) -> bool:
+        """Guarda el ticket escribiendo solo los fardos que cambiaron desde el último guardado"""
+        pendiente = self.preparar_guardado(ticket, datos_adicionales)
+        try:
+            ticket.id_bd = self.escribir_guardados([pendiente])[0]
+            print(f"✅ Ticket {ticket.numero} guardado correctamente "
+                  f"({len(pendiente['fardos'])} fardos escritos, {len(pendiente['eliminados'])} eliminados)")
+            return True
                 
         except Exception as e:
+            ticket.devolver_cambios(pendiente['cambios'])
             print(f"❌ Error al guardar ticket: {str(e)}")
             return False
     
-    def obtener_historial_tickets(self) -> List[Tuple]:
-        """Obtiene el historial de todos los tickets"""
+    def consolidar(self) -> bool:
+        """True si lo confirmado ya sobrevive a un corte de luz
+
+        Con WAL y synchronous=NORMAL un commit queda en el -wal hasta el próximo
+        checkpoint; este lo fuerza (PASSIVE: no espera a los lectores).
+        """
+        conexiones = self.conexiones
+        conexiones.conexion()
+        if conexiones.modo_journal != 'WAL':
+            return True
+        if str(conexiones.config.get('synchronous', 'NORMAL')).upper() in ('FULL', 'EXTRA'):
+            return True
+        with conexiones.consulta() as cursor:
+            ocupada, paginas, copiadas = cursor.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()
+        return not ocupada and copiadas == paginas
+    
+    def actualizar_cabecera(self, ticket: Ticket, datos_adicionales: dict = None) -> bool:
+        """Guarda solo los datos del ticket (romaneo, agregado, resto, observaciones)"""
+        try:
+            with self.conexiones.transaccion() as cursor:
+                ticket_id, _ = self._escribir_cabecera(cursor, self._cabecera(ticket, datos_adicionales))
+            ticket.id_bd = ticket_id
+            return True
+        except Exception as e:
+            print(f"❌ Error al actualizar ticket: {str(e)}")
+            return False
+    
+    def insertar_fardo(self, ticket: Ticket, fardo: Fardo) -> bool:
+        """Escribe un fardo nuevo (o lo reemplaza si el número ya estaba)"""
+        return self._guardar_fardo(ticket, fardo)
+    
+    def actualizar_fardo(self, ticket: Ticket, fardo: Fardo) -> bool:
+        """Escribe el repesaje de un fardo"""
+        return self._guardar_fardo(ticket, fardo)
+    
+    def _guardar_fardo(self, ticket: Ticket, fardo: Fardo) -> bool:
+        if ticket.id_bd is None:
+            # El ticket todavía no existe en la base: primer guardado completo
+            return self.guardar_ticket(ticket)
+        try:
+            with self.conexiones.transaccion() as cursor:
+                self._escribir_fardos(cursor, ticket.id_bd,
+                                      {fardo.numero: (fardo.peso, fardo.peso_crudo, fardo.hora_pesaje)})
+            ticket.fardos_modificados.discard(fardo.numero)
+            return True
+        except Exception as e:
+            print(f"❌ Error al guardar fardo #{fardo.numero}: {str(e)}")
+            return False
+    
+    def eliminar_fardo(self, ticket: Ticket, numero_fardo: int) -> bool:
+        """Borra un fardo del ticket en la base"""
+        if ticket.id_bd is None:
+            ticket.fardos_eliminados.discard(numero_fardo)
+            return True  # Nunca se guardó: no hay nada que borrar
+        try:
+            with self.conexiones.transaccion() as cursor:
+                cursor.execute('DELETE FROM fardos WHERE ticket_id = ? AND numero = ?',
+                               (ticket.id_bd, numero_fardo))
+            ticket.fardos_eliminados.discard(numero_fardo)
+            return True
+        except Exception as e:
+            print(f"❌ Error al eliminar fardo #{numero_fardo}: {str(e)}")
+            return False
+    
+    def obtener_historial_tickets(self, limite: int = None, desde: int = 0) -> List[Tuple]:
+        """Obtiene el historial de los tickets, del último guardado hacia atrás
+
+        Lee tickets_resumen: el costo depende de las filas pedidas (`limite`,
+        desde la fila `desde`), no de la cantidad de fardos guardados.
+        """
         try:
-            with sqlite3.connect(self.ruta_db) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.consulta() as cursor:
                 cursor.execute('''
-                    SELECT t.numero, t.fecha_creacion, COUNT(f.id) as cantidad_fardos,
-                           COALESCE(SUM(f.peso), 0) as peso_total, t.fecha_guardado
-                    FROM tickets t
-                    LEFT JOIN fardos f ON t.id = f.ticket_id
-                    WHERE t.estado = 'ACTIVO'
-                    GROUP BY t.id, t.numero, t.fecha_creacion, t.fecha_guardado
-                    ORDER BY t.fecha_guardado DESC
-                ''')
+                    SELECT numero, fecha_creacion, cantidad_fardos, peso_total, fecha_guardado
+                    FROM tickets_resumen
+                    WHERE estado = 'ACTIVO'
+                    ORDER BY fecha_guardado DESC
+                    LIMIT ? OFFSET ?
+                ''', (-1 if limite is None else limite, desde))
                 return cursor.fetchall()
         except Exception as e:
             print(f"❌ Error al obtener historial: {str(e)}")
@@ -176,8 +464,7 @@ class BaseDatos:
     def cargar_ticket(self, numero_ticket: str) -> Optional[Ticket]:
         """Carga un ticket completo desde la base de datos"""
         try:
-            with sqlite3.connect(self.ruta_db) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.consulta() as cursor:
                 
                 # Obtener datos del ticket
                 cursor.execute('''
@@ -205,9 +492,10 @@ class BaseDatos:
                     SELECT id FROM tickets WHERE numero = ?
                 ''', (numero_ticket,))
                 ticket_id = cursor.fetchone()[0]
+                ticket.id_bd = ticket_id
                 
                 cursor.execute('''
-                    SELECT numero, peso, hora_pesaje
+                    SELECT numero, peso, hora_pesaje, peso_crudo
                     FROM fardos 
                     WHERE ticket_id = ?
                     ORDER BY numero
@@ -215,7 +503,7 @@ class BaseDatos:
                 
                 fardos_data = cursor.fetchall()
                 for fardo_data in fardos_data:
-                    fardo = Fardo(fardo_data[0], fardo_data[1])
+                    fardo = Fardo(fardo_data[0], fardo_data[1], fardo_data[3])
                     fardo.hora_pesaje = datetime.fromisoformat(fardo_data[2])
                     ticket.fardos.append(fardo)
                 
@@ -229,14 +517,12 @@ class BaseDatos:
     def eliminar_ticket(self, numero_ticket: str) -> bool:
         """Marca un ticket como eliminado (soft delete)"""
         try:
-            with sqlite3.connect(self.ruta_db) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.transaccion() as cursor:
                 cursor.execute('''
                     UPDATE tickets 
                     SET estado = 'ELIMINADO', fecha_guardado = CURRENT_TIMESTAMP
                     WHERE numero = ?
                 ''', (numero_ticket,))
-                conn.commit()
                 return cursor.rowcount > 0
         except Exception as e:
             print(f"❌ Error al eliminar ticket: {str(e)}")
@@ -245,28 +531,19 @@ class BaseDatos:
     def obtener_estadisticas_generales(self) -> dict:
         """Obtiene estadísticas generales de la base de datos"""
         try:
-            with sqlite3.connect(self.ruta_db) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.consulta() as cursor:
                 
                 # Total de tickets
                 cursor.execute('SELECT COUNT(*) FROM tickets WHERE estado = "ACTIVO"')
                 total_tickets = cursor.fetchone()[0]
                 
-                # Total de fardos
+                # Total de fardos y peso total (del resumen por ticket)
                 cursor.execute('''
-                    SELECT COUNT(*) FROM fardos f
-                    JOIN tickets t ON f.ticket_id = t.id
-                    WHERE t.estado = "ACTIVO"
+                    SELECT COALESCE(SUM(cantidad_fardos), 0), COALESCE(SUM(peso_total), 0)
+                    FROM tickets_resumen
+                    WHERE estado = 'ACTIVO'
                 ''')
-                total_fardos = cursor.fetchone()[0]
-                
-                # Peso total
-                cursor.execute('''
-                    SELECT COALESCE(SUM(f.peso), 0) FROM fardos f
-                    JOIN tickets t ON f.ticket_id = t.id
-                    WHERE t.estado = "ACTIVO"
-                ''')
-                peso_total = cursor.fetchone()[0]
+                total_fardos, peso_total = cursor.fetchone()
                 
                 return {
                     'total_tickets': total_tickets,
@@ -276,3 +553,7 @@ class BaseDatos:
         except Exception as e:
             print(f"❌ Error al obtener estadísticas: {str(e)}")
             return {'total_tickets': 0, 'total_fardos': 0, 'peso_total': 0}
+    
+    def cerrar(self):
+        """Cierra las conexiones (con WAL, la última vuelca el journal a la base)"""
+        self.conexiones.cerrar()
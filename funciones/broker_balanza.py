@@ -0,0 +1,271 @@
+"""
+Broker de balanza: un proceso abre el puerto serie y lo comparte
+Usa una ConexionBalanza común (reconexión, sondeo, decodificador) y reparte
+cada trama a los clientes conectados por TCP o socket Unix. Así la aplicación,
+la ventana de prueba, el detector o una segunda PC de visualización leen la
+misma balanza a la vez.
+
+Cada cliente elige qué recibe mandando una línea al conectarse:
+    RAW   (por defecto) las tramas tal como llegan, terminadas en CR LF: sirve
+          para ConexionBalanza con puerto 'tcp://...' o un terminal serie
+    JSON  una línea JSON por lectura decodificada (peso, estable, neto, unidad, t)
+
+Cada cliente tiene su propia cola acotada: si no lee a tiempo se descartan sus
+tramas más viejas, nunca se frena la lectura ni a los demás clientes.
+"""
+import json
+import os
+import selectors
+import socket
+import threading
+from collections import deque
+from urllib.parse import urlparse
+
+
+class ClienteBroker:
+    """Un suscriptor conectado"""
+
+    def __init__(self, sock, direccion, cola_max):
+        self.sock = sock
+        self.direccion = direccion
+        self.modo = 'RAW'
+        self.cola = deque()
+        self.cola_max = cola_max
+        self.pendiente = b''        # Parte de un mensaje que el socket no aceptó todavía
+        self.entrada = b''          # Comandos del cliente a medio llegar
+        self.enviados = 0
+        self.descartados = 0
+
+    def encolar(self, mensaje: bytes):
+        """Agrega un mensaje descartando el más viejo si la cola está llena (llamar con el lock)"""
+        if len(self.cola) >= self.cola_max:
+            self.cola.popleft()
+            self.descartados += 1
+        self.cola.append(mensaje)
+
+
+class BrokerBalanza:
+    """Reparte las tramas de una ConexionBalanza a clientes TCP / Unix"""
+
+    def __init__(self, balanza, direcciones, cola_max: int = 256):
+        self.balanza = balanza
+        self.direcciones = list(direcciones)
+        self.cola_max = cola_max
+        self.clientes = {}
+        self._servidores = []
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._activo = False
+        # Par de sockets (no os.pipe()): en Windows select() solo acepta sockets
+        self._despertar_r, self._despertar_w = socket.socketpair()
+        self._despertar_r.setblocking(False)
+        self._despertar_w.setblocking(False)
+
+    # === SERVIDOR ===
+
+    def iniciar(self):
+        """Abre los sockets de escucha y empieza a repartir"""
+        for url in self.direcciones:
+            servidor = self._escuchar(url)
+            servidor.setblocking(False)
+            self._selector.register(servidor, selectors.EVENT_READ, 'servidor')
+            self._servidores.append((url, servidor))
+            print(f"📡 Broker escuchando en {url}")
+        self._selector.register(self._despertar_r, selectors.EVENT_READ, 'despertar')
+
+        self.balanza.observadores.append(self.publicar)
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle, name='broker-balanza')
+        self._hilo.daemon = True
+        self._hilo.start()
+
+    @staticmethod
+    def _escuchar(url):
+        destino = urlparse(url)
+        if destino.scheme == 'tcp':
+            servidor = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            servidor.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            servidor.bind((destino.hostname or '127.0.0.1', destino.port or 7700))
+        elif destino.scheme == 'unix':
+            if os.path.exists(destino.path):
+                os.remove(destino.path)  # Socket que quedó de una ejecución anterior
+            servidor = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            servidor.bind(destino.path)
+        else:
+            raise ValueError(f"Esquema no soportado: {url} (use tcp:// o unix://)")
+        servidor.listen(16)
+        return servidor
+
+    def detener(self):
+        """Desconecta a los clientes y cierra los sockets de escucha"""
+        if self.publicar in self.balanza.observadores:
+            self.balanza.observadores.remove(self.publicar)
+        self._activo = False
+        self._despertar()
+        if self._hilo and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=2)
+        for cliente in list(self.clientes.values()):
+            self._cerrar_cliente(cliente)
+        for url, servidor in self._servidores:
+            servidor.close()
+            destino = urlparse(url)
+            if destino.scheme == 'unix' and os.path.exists(destino.path):
+                os.remove(destino.path)
+        self._servidores = []
+        try:
+            self._selector.unregister(self._despertar_r)
+        except (KeyError, ValueError):
+            pass
+        self._despertar_r.close()
+        self._despertar_w.close()
+
+    def _despertar(self):
+        try:
+            self._despertar_w.send(b'\0')
+        except (BlockingIOError, OSError):
+            pass  # Ya hay avisos pendientes (o el broker se detuvo)
+
+    # === PUBLICACIÓN (hilo de lectura de la balanza) ===
+
+    def publicar(self, trama: bytes, lectura, timestamp: float):
+        """Encola la trama (y la lectura decodificada) para cada cliente"""
+        if not self.clientes:
+            return
+        crudo = trama + b'\r\n'
+        decodificada = None
+        if lectura is not None:
+            decodificada = (json.dumps({
+                'peso': lectura.peso,
+                'unidad': lectura.unidad,
+                'estable': lectura.estable,
+                'neto': lectura.neto,
+                't': timestamp,
+                'rol': self.balanza.rol,
+            }) + '\n').encode('utf-8')
+
+        with self._lock:
+            for cliente in self.clientes.values():
+                if cliente.modo == 'JSON':
+                    if decodificada is not None:
+                        cliente.encolar(decodificada)
+                else:
+                    cliente.encolar(crudo)
+        self._despertar()
+
+    # === BUCLE DE E/S ===
+
+    def _bucle(self):
+        while self._activo:
+            self._actualizar_intereses()
+            for clave, mascara in self._selector.select(timeout=1.0):
+                if clave.data == 'despertar':
+                    try:
+                        while self._despertar_r.recv(512):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                elif clave.data == 'servidor':
+                    self._aceptar(clave.fileobj)
+                else:
+                    cliente = clave.data
+                    if mascara & selectors.EVENT_READ:
+                        self._leer_cliente(cliente)
+                    if mascara & selectors.EVENT_WRITE and cliente.sock.fileno() != -1:
+                        self._escribir_cliente(cliente)
+
+    def _actualizar_intereses(self):
+        """Pide aviso de escritura solo a los clientes con algo pendiente"""
+        with self._lock:
+            for cliente in list(self.clientes.values()):
+                eventos = selectors.EVENT_READ
+                if cliente.pendiente or cliente.cola:
+                    eventos |= selectors.EVENT_WRITE
+                try:
+                    self._selector.modify(cliente.sock, eventos, cliente)
+                except (KeyError, ValueError, OSError):
+                    pass
+
+    def _aceptar(self, servidor):
+        try:
+            sock, direccion = servidor.accept()
+        except (BlockingIOError, OSError):
+            return
+        sock.setblocking(False)
+        if sock.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        cliente = ClienteBroker(sock, direccion or 'unix', self.cola_max)
+        with self._lock:
+            self.clientes[sock.fileno()] = cliente
+        self._selector.register(sock, selectors.EVENT_READ, cliente)
+        print(f"🔗 Cliente conectado al broker: {cliente.direccion}")
+
+    def _leer_cliente(self, cliente):
+        """Procesa los comandos del cliente (RAW / JSON); cualquier otra cosa se ignora"""
+        try:
+            datos = cliente.sock.recv(4096)
+        except BlockingIOError:
+            return
+        except OSError:
+            datos = b''
+        if not datos:
+            self._cerrar_cliente(cliente)
+            return
+        # Solo el broker le habla a la balanza: los pedidos de peso de los clientes no se reenvían
+        cliente.entrada = (cliente.entrada + datos)[-256:]
+        while b'\n' in cliente.entrada:
+            linea, cliente.entrada = cliente.entrada.split(b'\n', 1)
+            comando = linea.strip().upper()
+            if comando in (b'RAW', b'JSON'):
+                with self._lock:
+                    cliente.modo = comando.decode('ascii')
+                    cliente.cola.clear()
+
+    def _escribir_cliente(self, cliente):
+        """Manda lo que el socket acepte sin bloquear"""
+        while True:
+            if not cliente.pendiente:
+                with self._lock:
+                    if not cliente.cola:
+                        return
+                    # Se juntan los mensajes encolados en un solo send
+                    cliente.pendiente = b''.join(cliente.cola)
+                    cliente.enviados += len(cliente.cola)
+                    cliente.cola.clear()
+            try:
+                enviados = cliente.sock.send(cliente.pendiente)
+            except BlockingIOError:
+                return
+            except OSError:
+                self._cerrar_cliente(cliente)
+                return
+            cliente.pendiente = cliente.pendiente[enviados:]
+            if cliente.pendiente:
+                return
+
+    def _cerrar_cliente(self, cliente):
+        with self._lock:
+            self.clientes = {fd: c for fd, c in self.clientes.items() if c is not cliente}
+        try:
+            self._selector.unregister(cliente.sock)
+        except (KeyError, ValueError, OSError):
+            pass
+        try:
+            cliente.sock.close()
+        except OSError:
+            pass
+        print(f"👋 Cliente desconectado del broker: {cliente.direccion}")
+
+    def obtener_estado(self) -> dict:
+        """Clientes conectados y sus contadores"""
+        with self._lock:
+            return {
+                'clientes': [{
+                    'direccion': str(c.direccion),
+                    'modo': c.modo,
+                    'enviados': c.enviados,
+                    'descartados': c.descartados,
+                    'en_cola': len(c.cola),
+                } for c in self.clientes.values()],
+                'balanza': self.balanza.obtener_estado(),
+            }
@@ -0,0 +1,179 @@
+"""
+Captura cruda del puerto serie y reproducción
+Cada bloque leído del puerto se guarda con su hora (time.monotonic_ns) en un
+archivo binario compacto que rota por tamaño. Una captura de campo se puede
+volver a pasar por el mismo camino de adquisición, a la velocidad original o
+lo más rápido posible, para reproducir fallas y medir cambios del parser.
+
+Formato (little endian):
+    cabecera: b'PFCAP001' | time_ns (q) | monotonic_ns (Q) | largo metadatos (H) | metadatos JSON
+    registro: monotonic_ns (Q) | largo (I) | bytes
+"""
+import os
+import json
+import glob
+import struct
+import threading
+import time
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from funciones import reloj
+
+MAGIA = b'PFCAP001'
+_CABECERA = struct.Struct('<8sqQH')
+_REGISTRO = struct.Struct('<QI')
+
+
+class GrabadorCaptura:
+    """Graba los bloques crudos recibidos en archivos .cap rotados"""
+
+    def __init__(self, carpeta: str, metadatos: dict = None,
+                 tamano_maximo: int = 10 * 1024 * 1024, archivos_maximos: int = 20):
+        self.carpeta = carpeta
+        self.metadatos = metadatos or {}
+        self.tamano_maximo = tamano_maximo
+        self.archivos_maximos = archivos_maximos
+
+        self.archivo = None
+        self.ruta_actual = None
+        self.tamano_actual = 0
+        self.bloques_grabados = 0
+        self._ultimo_flush = 0.0
+        self._lock = threading.Lock()  # grabar() corre en el hilo de lectura
+
+        if not os.path.exists(self.carpeta):
+            os.makedirs(self.carpeta)
+
+    def _abrir_archivo(self):
+        """Crea un archivo nuevo con la cabecera y borra los más viejos"""
+        marca = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        self.ruta_actual = os.path.join(self.carpeta, f"captura_{marca}.cap")
+        self.archivo = open(self.ruta_actual, 'wb')
+
+        metadatos = json.dumps(self.metadatos).encode('utf-8')
+        self.archivo.write(_CABECERA.pack(MAGIA, reloj.time_ns(), reloj.monotonic_ns(),
+                                          len(metadatos)))
+        self.archivo.write(metadatos)
+        self.tamano_actual = _CABECERA.size + len(metadatos)
+        self._rotar_viejos()
+
+    def _rotar_viejos(self):
+        """Deja solo los últimos archivos_maximos archivos de captura"""
+        archivos = sorted(glob.glob(os.path.join(self.carpeta, 'captura_*.cap')))
+        for ruta in archivos[:-self.archivos_maximos]:
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+
+    def grabar(self, datos: bytes, monotonic_ns: Optional[int] = None):
+        """Agrega un bloque recibido a la captura"""
+        if monotonic_ns is None:
+            monotonic_ns = reloj.monotonic_ns()
+        with self._lock:
+            if self.archivo is None or self.tamano_actual >= self.tamano_maximo:
+                self._cerrar_archivo()
+                self._abrir_archivo()
+
+            self.archivo.write(_REGISTRO.pack(monotonic_ns, len(datos)))
+            self.archivo.write(datos)
+            self.tamano_actual += _REGISTRO.size + len(datos)
+            self.bloques_grabados += 1
+
+            # El archivo queda con buffer; se vuelca a disco como mucho una vez por segundo
+            ahora = time.monotonic()
+            if ahora - self._ultimo_flush >= 1.0:
+                self.archivo.flush()
+                self._ultimo_flush = ahora
+
+    def cerrar(self):
+        """Vuelca y cierra el archivo actual"""
+        with self._lock:
+            self._cerrar_archivo()
+
+    def _cerrar_archivo(self):
+        if self.archivo:
+            try:
+                self.archivo.close()
+            except OSError:
+                pass
+        self.archivo = None
+
+
+def leer_cabecera(archivo) -> dict:
+    """Lee la cabecera de un archivo de captura abierto en modo binario"""
+    crudo = archivo.read(_CABECERA.size)
+    if len(crudo) < _CABECERA.size:
+        raise ValueError("Archivo de captura vacío o truncado")
+    magia, time_ns, monotonic_ns, largo = _CABECERA.unpack(crudo)
+    if magia != MAGIA:
+        raise ValueError("No es un archivo de captura de balanza")
+    metadatos = json.loads(archivo.read(largo).decode('utf-8') or '{}')
+    return {
+        'time_ns': time_ns,
+        'monotonic_ns': monotonic_ns,
+        'metadatos': metadatos,
+    }
+
+
+def leer_captura(ruta: str) -> Iterator[Tuple[int, bytes]]:
+    """Recorre los bloques (monotonic_ns, datos) de un archivo de captura"""
+    with open(ruta, 'rb') as archivo:
+        leer_cabecera(archivo)
+        while True:
+            crudo = archivo.read(_REGISTRO.size)
+            if len(crudo) < _REGISTRO.size:
+                return  # Fin (o último registro a medio escribir si la app se cerró mal)
+            instante, largo = _REGISTRO.unpack(crudo)
+            datos = archivo.read(largo)
+            if len(datos) < largo:
+                return
+            yield instante, datos
+
+
+def listar_capturas(carpeta: str) -> List[str]:
+    """Archivos de captura de la carpeta, del más viejo al más nuevo"""
+    return sorted(glob.glob(os.path.join(carpeta, 'captura_*.cap')))
+
+
+class ReproductorCaptura:
+    """Entrega los bloques de una o varias capturas respetando (o no) sus tiempos"""
+
+    def __init__(self, rutas, velocidad: float = 1.0):
+        if isinstance(rutas, str):
+            rutas = [rutas]
+        self.rutas = list(rutas)
+        self.velocidad = velocidad    # 1.0 = tiempo real, 2.0 = doble, 0 = lo más rápido posible
+        self.detenido = False
+
+        with open(self.rutas[0], 'rb') as archivo:
+            self.cabecera = leer_cabecera(archivo)
+
+    @property
+    def metadatos(self) -> dict:
+        return self.cabecera['metadatos']
+
+    def detener(self):
+        self.detenido = True
+
+    def bloques(self) -> Iterator[Tuple[float, bytes]]:
+        """Devuelve (hora original en segundos epoch, datos) esperando entre bloques"""
+        # Hora de pared de la captura: hace la reproducción determinista
+        base_epoch = self.cabecera['time_ns'] - self.cabecera['monotonic_ns']
+        inicio_real = None
+        inicio_captura = None
+
+        for ruta in self.rutas:
+            for instante, datos in leer_captura(ruta):
+                if self.detenido:
+                    return
+                if self.velocidad:
+                    if inicio_real is None:
+                        inicio_real = time.monotonic()
+                        inicio_captura = instante
+                    objetivo = inicio_real + (instante - inicio_captura) / 1e9 / self.velocidad
+                    espera = objetivo - time.monotonic()
+                    if espera > 0:
+                        time.sleep(espera)
+                yield (base_epoch + instante) / 1e9, datos
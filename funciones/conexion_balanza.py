@@ -0,0 +1,713 @@
+import serial
+import serial.tools.list_ports
+import threading
+import time
+import os
+import queue
+from collections import deque
+from typing import Optional
+from config.configuracion import BALANZA_CONFIG
+from funciones import reloj
+from funciones.captura_serie import GrabadorCaptura, ReproductorCaptura
+from funciones.latencia import MedidorLatencia
+from funciones.lector_tramas import LectorTramas
+from funciones.protocolos import obtener_decodificador
+from funciones.estabilidad import DetectorEstabilidad
+from funciones.filtro_peso import FiltroPeso
+from funciones.sondeo_balanza import SondeoBalanza
+from funciones.multiplexor_serie import MultiplexorSerie, obtener_multiplexor
+from funciones.puerto_socket import PuertoSocket, es_url_socket
+from funciones.telemetria import AlmacenTelemetria, ESTABLE as T_ESTABLE, NETO as T_NETO
+
+class ConexionBalanza:
+    """Clase modular para manejar cualquier balanza"""
+
+    def __init__(self, conectar: bool = True, configuracion: dict = None):
+        # Balanzas adicionales: sus claves reemplazan las de BALANZA_CONFIG
+        self.config = dict(BALANZA_CONFIG)
+        if configuracion:
+            self.config.update(configuracion)
+        self.nombre = self.config.get('nombre', 'Fardos')
+        self.rol = self.config.get('rol', 'fardos')
+        
+        self.conexion = None
+        self.peso_actual = 0.0           # Peso filtrado (ver funciones/filtro_peso.py)
+        self.peso_crudo = 0.0            # Último valor tal como lo mandó la balanza
+        self.conectada = False
+        self.ultimo_error = None
+        self.lector = LectorTramas()
+        self.max_datos_log = 50
+        self.datos_recibidos = deque(maxlen=self.max_datos_log)  # Tramas crudas (bytes)
+        
+        # Última lectura publicada por el hilo de adquisición
+        self._lock = threading.Lock()
+        self._lectura_nueva = threading.Condition(self._lock)
+        self.lecturas_publicadas = 0     # Se incrementa con cada lectura decodificada
+        self.timestamp_peso = None
+        self.recibido_ns = None          # reloj.monotonic_ns() de los bytes de la última lectura
+        self.ultima_lectura = None
+        self.latencia = MedidorLatencia()
+        self._hilo_lectura = None
+        self._leyendo = False
+        self.multiplexor = None          # Hilo de E/S compartido (si el puerto lo permite)
+        self.sondeo = None               # Pedidos de peso (balanzas por comando)
+        self.observadores = []           # f(trama, lectura, timestamp) por cada trama (broker)
+        self.ultimo_dato = None          # time.monotonic() de la última trama recibida
+        self._datos_desde_conexion = False
+        self.tramas_recibidas = 0
+        self.tramas_invalidas = 0
+        
+        # Captura cruda opcional (ver funciones/captura_serie.py)
+        self.grabador = None
+        self.telemetria = None           # Todas las lecturas a disco (ver funciones/telemetria.py)
+        self._hilo_reproduccion = None
+        self._reproductor = None
+        
+        # Supervisor: abre, vigila y reconecta el puerto en segundo plano
+        self._lock_conexion = threading.RLock()
+        self._evento_supervisor = threading.Event()
+        self._hilo_supervisor = None
+        self._supervisando = False
+        self.estado_conexion = 'CONECTANDO'
+        self.proximo_reintento = None
+        self.adaptador = None            # (vid, pid, número de serie) del adaptador USB
+        self.eventos_estado = queue.Queue(maxsize=100)  # Cambios de estado para la interfaz
+        self.emulador = None
+        
+        # Cargar configuración
+        self.cargar_configuracion()
+        
+        if not conectar:
+            # Uso sin puerto (reproducción de capturas, pruebas)
+            self.estado_conexion = 'DESCONECTADA'
+            return
+        
+        if self.config.get('simular_balanza', False):
+            self.iniciar_emulador()
+        
+        if self.config.get('grabar_captura', False):
+            self.iniciar_grabacion()
+        
+        if self.config.get('telemetria', False):
+            self.iniciar_telemetria()
+        
+        # Conectar en segundo plano para no demorar el arranque de la ventana
+        self.iniciar_supervisor()
+
+    def cargar_configuracion(self):
+        """Carga la configuración (BALANZA_CONFIG más la propia de esta balanza)"""
+        self.puerto = self.config.get('puerto_serie', 'COM1')
+        self.baudrate = self.config.get('baudrate', 9600)
+        self.timeout = self.config.get('timeout', 1)
+        self.protocolo = self.config.get('protocolo', 'CONTINUO')
+        self.decodificador = obtener_decodificador(self.protocolo)
+        self.activar_dtr = self.config.get('activar_dtr', True)
+        self.activar_rts = self.config.get('activar_rts', True)
+        self.estabilidad = DetectorEstabilidad(
+            self.config.get('estabilidad_muestras', 10),
+            self.config.get('estabilidad_tolerancia', 0.5))
+        self.filtro = FiltroPeso.desde_config(self.config)
+        self.timeout_sin_datos = self.config.get('timeout_sin_datos', 5.0)
+        self.espera_min = self.config.get('reconexion_espera_min', 0.5)
+        self.espera_max = self.config.get('reconexion_espera_max', 30.0)
+        self.modo_lectura = self.config.get('modo_lectura', 'auto')
+
+    def intentar_conexion(self):
+        """Intenta conectar con la balanza SIN tirar error si falla"""
+        with self._lock_conexion:
+            self._abrir_puerto()
+        return self.conectada
+
+    def _abrir_puerto(self):
+        """Abre el puerto configurado y arranca el hilo de adquisición"""
+        try:
+            self._cerrar_puerto()
+            self.lector.limpiar()
+            with self._lock:
+                self.estabilidad.reiniciar()
+                self.filtro.reiniciar()
+                
+            if es_url_socket(self.puerto):
+                # tcp:// o unix://: la balanza la comparte el broker (utils/broker_balanza.py)
+                self.conexion = PuertoSocket(self.puerto, self.timeout)
+            else:
+                # EXACTAMENTE como tu función
+                self.conexion = serial.Serial(
+                    port=self.puerto,
+                    baudrate=self.baudrate,
+                    bytesize=serial.EIGHTBITS,
+                    parity=serial.PARITY_NONE,
+                    stopbits=serial.STOPBITS_ONE,
+                    timeout=self.timeout,
+                    xonxoff=False,      # Soft handshake OFF
+                    rtscts=False,       # RTS/CTS OFF (hardware handshake OFF)
+                    dsrdtr=False        # DSR/DTR OFF
+                )
+
+            # Activar DTR y RTS manualmente - EXACTAMENTE como tu función
+            try:
+                self.conexion.setDTR(True)
+                self.conexion.setRTS(True)
+            except (serial.SerialException, OSError):
+                pass  # Pseudo-terminal del emulador: no tiene líneas de control
+            
+            self.conectada = True
+            self.ultimo_error = None
+            self.ultimo_dato = time.monotonic()
+            self._datos_desde_conexion = False
+            print(f"✅ Balanza conectada: {self.puerto} @ {self.baudrate} bps")
+            self._identificar_adaptador()
+            self._publicar_estado('CONECTADA')
+            
+            # Drenar el puerto en segundo plano
+            self._iniciar_lectura()
+            
+        except Exception as e:
+            self.conexion = None
+            self.conectada = False
+            self.ultimo_error = str(e)
+            print(f"⚠️ Balanza no disponible: {self.puerto} - {str(e)}")
+
+    def iniciar_emulador(self):
+        """Reemplaza la balanza real por el emulador (pruebas sin hardware)"""
+        from funciones.simulador_balanza import EmuladorBalanza, EscenarioFardos
+        try:
+            escenario = EscenarioFardos(self.config.get('peso_min_simulado', 15.0),
+                                        self.config.get('peso_max_simulado', 45.0))
+            # Solo en modo 'comando' el emulador espera pedidos; si no, transmite solo
+            self.emulador = EmuladorBalanza(self.protocolo, self.baudrate, escenario=escenario,
+                                            continuo=self.modo_lectura != 'comando')
+            self.puerto = self.emulador.iniciar()
+        except Exception as e:
+            # El emulador usa pty: solo funciona en Linux
+            self.emulador = None
+            print(f"⚠️ No se pudo iniciar el emulador de balanza: {e}")
+
+    # === CAPTURA Y REPRODUCCIÓN ===
+
+    def iniciar_grabacion(self, carpeta=None):
+        """Empieza a grabar todo lo que llega del puerto"""
+        if self.grabador:
+            return
+        if carpeta is None:
+            carpeta = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                   self.config.get('carpeta_capturas', 'capturas'))
+            if self.rol != 'fardos':
+                # Cada balanza rota sus propios archivos
+                carpeta = os.path.join(carpeta, self.rol)
+        self.grabador = GrabadorCaptura(
+            carpeta,
+            {'puerto': self.puerto, 'baudrate': self.baudrate, 'protocolo': self.protocolo,
+             'rol': self.rol},
+            int(self.config.get('captura_tamano_max_mb', 10) * 1024 * 1024),
+            self.config.get('captura_archivos_max', 20))
+        print(f"⏺️ Grabando captura de la balanza en {carpeta}")
+
+    def iniciar_telemetria(self, carpeta=None):
+        """Empieza a guardar cada lectura decodificada con sus resúmenes de 1 s / 1 min"""
+        if self.telemetria:
+            return
+        if carpeta is None:
+            carpeta = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                   self.config.get('carpeta_telemetria', 'telemetria'), self.rol)
+        self.telemetria = AlmacenTelemetria(carpeta, self.config.get('telemetria_dias', 90))
+        self.telemetria.iniciar()
+        print(f"📈 Telemetría de la balanza {self.nombre} en {carpeta}")
+
+    def detener_telemetria(self):
+        """Vuelca lo pendiente y deja de guardar lecturas"""
+        if self.telemetria:
+            self.telemetria.detener()
+            self.telemetria = None
+
+    def detener_grabacion(self):
+        """Deja de grabar y cierra el archivo actual"""
+        grabador = self.grabador
+        self.grabador = None
+        if grabador:
+            grabador.cerrar()
+
+    def reproducir_captura(self, rutas, velocidad: float = 1.0, esperar: bool = False):
+        """Pasa una captura por el camino de adquisición en lugar del puerto"""
+        reproductor = ReproductorCaptura(rutas, velocidad)
+        
+        # La captura reemplaza al puerto mientras dura
+        self.detener_reproduccion()
+        self.detener_supervisor()
+        with self._lock_conexion:
+            self._cerrar_puerto()
+            self.lector.limpiar()
+            with self._lock:
+                self.estabilidad.reiniciar()
+                self.filtro.reiniciar()
+        
+        protocolo = reproductor.metadatos.get('protocolo')
+        if protocolo and protocolo != self.protocolo:
+            print(f"ℹ️ La captura es del protocolo {protocolo}, se decodifica como {self.protocolo}")
+        
+        self.tramas_recibidas = 0
+        self.tramas_invalidas = 0
+        self.conectada = True
+        self._reproductor = reproductor
+        self._publicar_estado('REPRODUCIENDO')
+        self._hilo_reproduccion = threading.Thread(target=self._bucle_reproduccion,
+                                                   args=(reproductor,))
+        self._hilo_reproduccion.daemon = True
+        self._hilo_reproduccion.start()
+        if esperar:
+            self._hilo_reproduccion.join()
+
+    def _bucle_reproduccion(self, reproductor):
+        """Entrega los bloques grabados con la hora en que llegaron originalmente"""
+        try:
+            for timestamp, datos in reproductor.bloques():
+                self._procesar_bloque(datos, timestamp)
+        except Exception as e:
+            self.ultimo_error = f"Error al reproducir captura: {e}"
+            print(f"⚠️ {self.ultimo_error}")
+        self.conectada = False
+        self._publicar_estado('DESCONECTADA')
+
+    def detener_reproduccion(self):
+        """Corta una reproducción en curso"""
+        if self._reproductor:
+            self._reproductor.detener()
+        if self._hilo_reproduccion and self._hilo_reproduccion.is_alive() \
+                and self._hilo_reproduccion is not threading.current_thread():
+            self._hilo_reproduccion.join(timeout=2)
+        self._hilo_reproduccion = None
+        self._reproductor = None
+
+    def _cerrar_puerto(self):
+        """Detiene la lectura y cierra el puerto (el supervisor sigue activo)"""
+        self._detener_lectura()
+        if self.conexion and self.conexion.is_open:
+            try:
+                self.conexion.close()
+            except Exception:
+                pass
+        self.conexion = None
+        self.conectada = False
+
+    # === SUPERVISOR DE CONEXIÓN ===
+
+    def iniciar_supervisor(self):
+        """Inicia el hilo que abre el puerto y lo reconecta si se pierde"""
+        if self._supervisando:
+            return
+        self._supervisando = True
+        self._evento_supervisor.clear()
+        self._hilo_supervisor = threading.Thread(target=self._bucle_supervisor)
+        self._hilo_supervisor.daemon = True
+        self._hilo_supervisor.start()
+
+    def detener_supervisor(self):
+        """Detiene el supervisor (no cierra el puerto)"""
+        self._supervisando = False
+        self._evento_supervisor.set()
+        if self._hilo_supervisor and self._hilo_supervisor.is_alive() \
+                and self._hilo_supervisor is not threading.current_thread():
+            self._hilo_supervisor.join(timeout=2)
+        self._hilo_supervisor = None
+
+    def _esperar_supervisor(self, segundos):
+        """Espera interrumpible: la despiertan un error de lectura o cerrar()"""
+        self._evento_supervisor.wait(segundos)
+        self._evento_supervisor.clear()
+
+    def _bucle_supervisor(self):
+        """Conecta, vigila que lleguen datos y reintenta con espera exponencial"""
+        espera = self.espera_min
+        while self._supervisando:
+            if self.conectada:
+                silencio = time.monotonic() - self.ultimo_dato
+                if not self.timeout_sin_datos or silencio < self.timeout_sin_datos:
+                    # La balanza respondió: el próximo corte arranca con la espera mínima
+                    if self._datos_desde_conexion:
+                        espera = self.espera_min
+                    self._esperar_supervisor(0.5)
+                    continue
+                
+                # Puerto abierto pero mudo (cable cortado, adaptador colgado, balanza apagada)
+                with self._lock_conexion:
+                    self._cerrar_puerto()
+                    self.ultimo_error = f"Sin datos durante {silencio:.0f} s"
+                print(f"⚠️ Balanza sin datos: {self.puerto} - reconectando")
+                self._esperar_reintento('SIN_DATOS', espera)
+                espera = min(espera * 2, self.espera_max)
+                continue
+            
+            if self.estado_conexion == 'CONECTADA':
+                # El hilo de lectura cortó por un error del puerto
+                self._esperar_reintento('DESCONECTADA', espera)
+                espera = min(espera * 2, self.espera_max)
+                continue
+            
+            self._publicar_estado('CONECTANDO')
+            with self._lock_conexion:
+                if not self._supervisando:
+                    break
+                self._seguir_adaptador()
+                self._abrir_puerto()
+            if self.conectada:
+                continue
+            
+            self._esperar_reintento('DESCONECTADA', espera)
+            espera = min(espera * 2, self.espera_max)
+
+    def _esperar_reintento(self, estado, espera):
+        """Publica el estado con la hora del próximo intento y espera"""
+        self.proximo_reintento = time.time() + espera
+        self._publicar_estado(estado)
+        self._esperar_supervisor(espera)
+
+    def _publicar_estado(self, estado):
+        """Deja el nuevo estado en la cola que consume la interfaz"""
+        self.estado_conexion = estado
+        if estado in ('CONECTANDO', 'CONECTADA'):
+            self.proximo_reintento = None
+        evento = self.obtener_estado()
+        try:
+            self.eventos_estado.put_nowait(evento)
+        except queue.Full:
+            # Nadie consume la cola: se descarta el evento más viejo
+            try:
+                self.eventos_estado.get_nowait()
+                self.eventos_estado.put_nowait(evento)
+            except (queue.Empty, queue.Full):
+                pass
+
+    def obtener_eventos_estado(self) -> list:
+        """Devuelve (sin bloquear) los cambios de estado pendientes"""
+        eventos = []
+        while True:
+            try:
+                eventos.append(self.eventos_estado.get_nowait())
+            except queue.Empty:
+                return eventos
+
+    def _identificar_adaptador(self):
+        """Recuerda VID/PID/serie del adaptador USB para seguirlo si cambia de nombre"""
+        try:
+            for port in serial.tools.list_ports.comports():
+                if port.device == self.puerto and port.vid is not None:
+                    self.adaptador = (port.vid, port.pid, port.serial_number)
+                    return
+        except Exception:
+            pass
+
+    def _seguir_adaptador(self):
+        """Si el puerto desapareció, busca el mismo adaptador con otro nombre (COM7, ttyUSB1...)"""
+        if not self.adaptador:
+            return
+        try:
+            puertos = serial.tools.list_ports.comports()
+        except Exception:
+            return
+        if any(port.device == self.puerto for port in puertos):
+            return
+        
+        vid, pid, serie = self.adaptador
+        for port in puertos:
+            if port.vid == vid and port.pid == pid and \
+                    (serie is None or port.serial_number == serie):
+                print(f"🔌 Adaptador de la balanza encontrado en {port.device} "
+                      f"(antes {self.puerto})")
+                self.puerto = port.device
+                return
+
+    def extraer_peso(self, texto):
+        """Extrae el valor numérico del peso con el decodificador del protocolo"""
+        lectura = self.decodificador.decodificar(texto.encode('ascii', errors='ignore'))
+        return lectura.peso if lectura else None
+
+    def _iniciar_lectura(self):
+        """Drena el puerto en segundo plano y publica la última lectura"""
+        self._leyendo = True
+        multiplexor = None
+        # soporta() antes de crear el multiplexor: en Windows ni siquiera se construye
+        if self.config.get('usar_multiplexor', True) and MultiplexorSerie.soporta(self.conexion):
+            multiplexor = obtener_multiplexor()
+        if multiplexor:
+            # Un solo hilo de E/S para todas las balanzas
+            self.multiplexor = multiplexor
+            multiplexor.registrar(self.conexion, self._recibir_bloque, self._fallo_lectura)
+        else:
+            self._hilo_lectura = threading.Thread(target=self._bucle_lectura,
+                                                  args=(self.conexion,))
+            self._hilo_lectura.daemon = True
+            self._hilo_lectura.start()
+        self._iniciar_sondeo()
+    
+    def _iniciar_sondeo(self):
+        """Sondea las balanzas por comando (en 'auto', solo si la balanza no transmite sola)"""
+        comando = self.decodificador.comando
+        if self.modo_lectura == 'continuo' or not comando.strip():
+            return
+        conexion = self.conexion
+        self.sondeo = SondeoBalanza(
+            comando, conexion.write,
+            en_cola=self.decodificador.en_cola,
+            intervalo_min=self.config.get('sondeo_intervalo_min', 0.05),
+            intervalo_max=self.config.get('sondeo_intervalo_max', 0.5),
+            timeout_respuesta=self.config.get('sondeo_timeout', 0.5),
+            tolerancia=self.config.get('estabilidad_tolerancia', 0.5),
+            esperar_continuo=1.0 if self.modo_lectura == 'auto' else 0.0)
+        self.sondeo.iniciar()
+    
+    def _detener_lectura(self):
+        """Detiene el hilo de adquisición"""
+        if self.sondeo:
+            self.sondeo.detener()
+            self.sondeo = None
+        self._leyendo = False
+        if self.multiplexor:
+            if self.conexion:
+                self.multiplexor.quitar(self.conexion)
+            self.multiplexor = None
+        if self.conexion and hasattr(self.conexion, 'cancel_read'):
+            try:
+                self.conexion.cancel_read()  # Despierta un read() bloqueado
+            except Exception:
+                pass
+        if self._hilo_lectura and self._hilo_lectura.is_alive() \
+                and self._hilo_lectura is not threading.current_thread():
+            self._hilo_lectura.join(timeout=max(1.0, self.timeout + 0.5))
+        self._hilo_lectura = None
+    
+    def _bucle_lectura(self, conexion):
+        """Lee el puerto continuamente y arma líneas completas (sin multiplexor)"""
+        while self._leyendo:
+            try:
+                # Un solo read() por bloque; sin datos bloquea hasta el timeout
+                datos = conexion.read(conexion.in_waiting or 1)
+                if datos:
+                    self._recibir_bloque(datos)
+            except Exception as e:
+                self._fallo_lectura(e)
+                break
+    
+    def _recibir_bloque(self, datos):
+        """Bloque recién leído del puerto (hilo de lectura o multiplexor)"""
+        recibido_ns = reloj.monotonic_ns()
+        if self.grabador:
+            self.grabador.grabar(datos, recibido_ns)
+        self._procesar_bloque(datos, time.time(), recibido_ns)
+    
+    def _fallo_lectura(self, error):
+        """El puerto dejó de responder: el supervisor reconecta"""
+        if self._leyendo:
+            print(f"⚠️ Error al leer peso ({self.nombre}): {str(error)}")
+            self.ultimo_error = str(error)
+            self.conectada = False
+            self._evento_supervisor.set()  # Reconectar sin esperar
+    
+    def _procesar_bloque(self, datos, timestamp, recibido_ns=None):
+        """Arma las tramas de un bloque de bytes y publica cada lectura"""
+        if recibido_ns is None:
+            recibido_ns = reloj.monotonic_ns()
+        tramas = self.lector.alimentar(datos)
+        if not tramas:
+            return
+        
+        armado_ns = reloj.monotonic_ns()
+        self.ultimo_dato = armado_ns / 1e9
+        self._datos_desde_conexion = True
+        for trama in tramas:
+            self._procesar_trama(trama, timestamp, recibido_ns, armado_ns)
+    
+    def _procesar_trama(self, trama, timestamp, recibido_ns, armado_ns):
+        """Decodifica una trama y la publica en la instantánea"""
+        # Agregar al log
+        self._agregar_dato_recibido(trama)
+        self.tramas_recibidas += 1
+        self.latencia.registrar_trama(armado_ns)
+        
+        lectura = self.decodificador.decodificar(trama)
+        decodificado_ns = reloj.monotonic_ns()
+        sondeo = self.sondeo
+        if sondeo:
+            # Respuesta a un pedido (aunque no se pueda decodificar)
+            sondeo.trama_recibida(recibido_ns, lectura.peso if lectura else None)
+        if lectura is None:
+            self.tramas_invalidas += 1
+            self._notificar_observadores(trama, None, timestamp)
+            return
+        
+        # Solo este hilo usa el filtro: se calcula fuera del lock
+        peso = self.filtro.agregar(lectura.peso)
+        # Estabilidad y captura sin el atraso del promedio ni la banda muerta. Si
+        # la balanza informa ST/US, su peso estable se captura tal cual
+        pesaje = lectura.peso if lectura.estable is not None else self.filtro.pesaje
+        with self._lock:
+            self.peso_actual = peso
+            self.peso_crudo = lectura.peso
+            self.timestamp_peso = timestamp
+            self.recibido_ns = recibido_ns
+            self.ultima_lectura = lectura
+            estable = self.estabilidad.agregar(pesaje, timestamp, lectura.estable)
+            self.lecturas_publicadas += 1
+            self._lectura_nueva.notify_all()
+        self.latencia.registrar_lectura(recibido_ns, armado_ns, decodificado_ns,
+                                        reloj.monotonic_ns())
+        telemetria = self.telemetria
+        if telemetria:
+            telemetria.registrar(lectura.peso, recibido_ns,
+                                 (T_ESTABLE if estable else 0) | (T_NETO if lectura.neto else 0))
+        # Después de publicar: los observadores ven la instantánea ya actualizada
+        self._notificar_observadores(trama, lectura, timestamp)
+    
+    def _notificar_observadores(self, trama, lectura, timestamp):
+        """Avisa la trama (y su lectura, o None) a los observadores (broker, proceso separado)"""
+        for observador in self.observadores:
+            try:
+                observador(trama, lectura, timestamp)
+            except Exception as e:
+                print(f"⚠️ Error en observador de la balanza: {e}")
+    
+    def obtener_peso(self) -> float:
+        """Devuelve la última lectura publicada sin tocar el puerto"""
+        with self._lock:
+            return self.peso_actual
+    
+    def obtener_lectura(self) -> dict:
+        """Devuelve la última lectura junto con su hora de llegada"""
+        with self._lock:
+            lectura = self.ultima_lectura
+            estabilidad = self.estabilidad
+            return {
+                'peso': self.peso_actual,
+                'peso_crudo': self.peso_crudo,
+                'timestamp': self.timestamp_peso,
+                'recibido_ns': self.recibido_ns,
+                'unidad': lectura.unidad if lectura else 'kg',
+                'neto': lectura.neto if lectura else False,
+                # Sin conexión no hay forma de saber si el peso sigue asentado
+                'estable': estabilidad.estable and self.conectada,
+                'estable_desde': estabilidad.estable_desde,
+                'valor_estable': estabilidad.valor_estable
+            }
+
+    def esperar_lectura_nueva(self, timeout: float = 1.0) -> Optional[dict]:
+        """Espera una lectura decodificada posterior a la llamada
+
+        Para quien necesita un peso recién llegado (no uno ya publicado). Devuelve lo
+        mismo que obtener_lectura() o None si no llegó nada en `timeout` segundos.
+        Bloquea: no llamarla desde callbacks de Tk.
+        """
+        with self._lock:
+            actual = self.lecturas_publicadas
+            if not self._lectura_nueva.wait_for(lambda: self.lecturas_publicadas != actual, timeout):
+                return None
+        return self.obtener_lectura()
+
+    def _agregar_dato_recibido(self, trama):
+        """Agrega la trama cruda al log (se decodifica recién al consultarlo)"""
+        # Solo agregar si es diferente al último
+        if not self.datos_recibidos or self.datos_recibidos[-1] != trama:
+            self.datos_recibidos.append(trama)
+
+    def obtener_datos_recibidos(self):
+        """Obtiene el log de datos"""
+        return [trama.decode('ascii', errors='replace').strip()
+                for trama in list(self.datos_recibidos)]
+
+    def limpiar_datos_recibidos(self):
+        """Limpia el log"""
+        self.datos_recibidos.clear()
+
+    def obtener_puertos_disponibles(self):
+        """Obtiene puertos COM disponibles"""
+        try:
+            puertos = []
+            for port in serial.tools.list_ports.comports():
+                puertos.append({
+                    'puerto': port.device,
+                    'descripcion': port.description,
+                    'fabricante': port.manufacturer or 'Desconocido'
+                })
+            return puertos
+        except Exception:
+            return []
+
+    def cambiar_configuracion(self, puerto=None, baudrate=None, protocolo=None, 
+                            activar_dtr=None, activar_rts=None, timeout=None):
+        """Cambia configuración y reconecta"""
+        try:
+            if puerto is not None:
+                self.puerto = puerto
+            if baudrate is not None:
+                self.baudrate = baudrate
+            if protocolo is not None:
+                self.protocolo = protocolo
+                self.decodificador = obtener_decodificador(protocolo)
+            if activar_dtr is not None:
+                self.activar_dtr = activar_dtr
+            if activar_rts is not None:
+                self.activar_rts = activar_rts
+            if timeout is not None:
+                self.timeout = timeout
+
+            # Reabrir con la nueva configuración (el supervisor sigue reintentando si falla)
+            self.adaptador = None
+            conectada = self.intentar_conexion()
+            self._evento_supervisor.set()
+            return conectada
+                
+        except Exception as e:
+            print(f"Error al cambiar configuración: {e}")
+            return False
+
+    def probar_conexion(self):
+        """Prueba la conexión"""
+        if not self.conectada:
+            return {
+                'exito': False,
+                'mensaje': f'Balanza desconectada - Puerto: {self.puerto}',
+                'peso': self.peso_actual
+            }
+        
+        try:
+            peso = self.obtener_peso()
+            return {
+                'exito': True,
+                'peso': peso,
+                'mensaje': f'Conexión OK - Peso: {peso:.2f} kg'
+            }
+        except Exception as e:
+            return {
+                'exito': False,
+                'mensaje': f'Error: {str(e)}',
+                'peso': self.peso_actual
+            }
+
+    def obtener_estado(self):
+        """Obtiene estado actual"""
+        return {
+            'conectada': self.conectada,
+            'estado': self.estado_conexion,
+            'proximo_reintento': self.proximo_reintento,
+            'puerto': self.puerto,
+            'baudrate': self.baudrate,
+            'protocolo': self.protocolo,
+            'peso_actual': self.peso_actual,
+            'ultimo_error': self.ultimo_error,
+            'dtr': self.activar_dtr,
+            'rts': self.activar_rts,
+            'tramas_recibidas': self.tramas_recibidas,
+            'tramas_invalidas': self.tramas_invalidas,
+            'grabando': self.grabador is not None,
+            'sondeo': self.sondeo.obtener_estado() if self.sondeo else None
+        }
+
+    def cerrar(self):
+        """Cierra conexión"""
+        self.detener_supervisor()
+        self.detener_reproduccion()
+        with self._lock_conexion:
+            self._cerrar_puerto()
+        self.detener_grabacion()
+        self.detener_telemetria()
+        if self.emulador:
+            self.emulador.detener()
+            self.emulador = None
@@ -0,0 +1,172 @@
+"""
+Conexiones SQLite persistentes
+Cada consulta abría su propio sqlite3.connect(): volver a leer el esquema y
+trabajar con el journal de rollback y la caché por defecto. ConexionesSQLite
+mantiene una conexión por hilo, abierta la primera vez que el hilo la pide, y
+le aplica una sola vez los ajustes de BASE_DATOS_CONFIG:
+
+    journal_mode        DELETE por defecto. WAL (lecturas y escrituras no se
+                        bloquean entre sí) solo si se pide con 'wal': True: usa
+                        memoria compartida (-shm) que no funciona por SMB, así
+                        que los visores que abren la base por la red verían
+                        datos viejos o corruptos
+    synchronous         NORMAL con WAL (un corte de la aplicación no pierde nada
+                        confirmado; uno de luz, a lo sumo el último guardado)
+    mmap_size           lectura por memoria mapeada (también solo en disco local)
+    cache_size, temp_store=MEMORY, busy_timeout
+
+Las sentencias preparadas quedan en la caché de cada conexión
+('sentencias_cacheadas'), así que repetir una consulta no la vuelve a compilar.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from config.configuracion import BASE_DATOS_CONFIG
+
+# Sistemas de archivos de red (Linux) sobre los que no se usa WAL ni mmap
+_FS_RED = ('nfs', 'nfs4', 'cifs', 'smbfs', 'smb3', 'fuse.sshfs', 'afs')
+
+
+def es_ruta_local(ruta: str) -> bool:
+    """False si la base está en una carpeta compartida o una unidad de red"""
+    ruta = os.path.abspath(ruta)
+    if ruta.startswith(('\\\\', '//')):
+        return False  # Ruta UNC
+    if os.name == 'nt':
+        try:
+            import ctypes
+            unidad = os.path.splitdrive(ruta)[0] + '\\'
+            return ctypes.windll.kernel32.GetDriveTypeW(unidad) != 4  # DRIVE_REMOTE
+        except Exception:
+            return True
+    try:
+        montaje, tipo = '', ''
+        with open('/proc/mounts', encoding='utf-8') as archivo:
+            for linea in archivo:
+                partes = linea.split()
+                if len(partes) < 3:
+                    continue
+                punto = partes[1]
+                if (ruta == punto or ruta.startswith(punto.rstrip('/') + '/')) and len(punto) > len(montaje):
+                    montaje, tipo = punto, partes[2]
+        return tipo not in _FS_RED
+    except OSError:
+        return True
+
+
+class ConexionesSQLite:
+    """Una conexión ajustada por hilo sobre el mismo archivo de base de datos"""
+
+    def __init__(self, ruta_db: str, solo_lectura: bool = False, configuracion: dict = None):
+        self.ruta_db = ruta_db
+        self.solo_lectura = solo_lectura
+        self.config = dict(BASE_DATOS_CONFIG)
+        if configuracion:
+            self.config.update(configuracion)
+        self.local = es_ruta_local(ruta_db)
+        self.modo_journal = None
+
+        self._hilos = threading.local()
+        self._abiertas = []  # (hilo, conexión) para cerrarlas todas al salir
+        self._lock = threading.Lock()
+
+    def conexion(self) -> sqlite3.Connection:
+        """La conexión del hilo actual (la abre y ajusta la primera vez)"""
+        conexion = getattr(self._hilos, 'conexion', None)
+        if conexion is None:
+            conexion = self._abrir()
+            self._hilos.conexion = conexion
+            self._hilos.profundidad = 0
+        return conexion
+
+    def _usar_wal(self) -> bool:
+        # Solo con 'wal': True explícito: ni 'auto' ni otros valores activan WAL
+        if self.config.get('wal', False) is not True:
+            return False
+        if not self.local:
+            print("⚠️ La base está en una carpeta de red: se usa journal DELETE en lugar de WAL")
+            return False
+        return True
+
+    def _abrir(self) -> sqlite3.Connection:
+        espera_ms = int(self.config.get('busy_timeout_ms', 10000))
+        # check_same_thread=False solo para poder cerrarla desde cerrar():
+        # cada conexión la usa únicamente el hilo que la abrió
+        conexion = sqlite3.connect(self.ruta_db, timeout=espera_ms / 1000,
+                                   cached_statements=int(self.config.get('sentencias_cacheadas', 256)),
+                                   check_same_thread=False)
+        conexion.execute(f'PRAGMA busy_timeout = {espera_ms}')
+
+        if not self.solo_lectura:
+            # El modo queda grabado en el archivo: el visor (solo lectura) no lo cambia
+            modo = 'WAL' if self._usar_wal() else 'DELETE'
+            try:
+                self.modo_journal = conexion.execute(f'PRAGMA journal_mode = {modo}').fetchone()[0].upper()
+            except sqlite3.OperationalError as e:
+                print(f"⚠️ No se pudo pasar la base a journal {modo}: {e}")
+        if self.modo_journal is None:
+            self.modo_journal = conexion.execute('PRAGMA journal_mode').fetchone()[0].upper()
+        if self.modo_journal == 'WAL':
+            conexion.execute(f"PRAGMA synchronous = {self.config.get('synchronous', 'NORMAL')}")
+
+        if self.local:
+            conexion.execute(f"PRAGMA mmap_size = {int(self.config.get('mmap_mb', 64)) * 1024 * 1024}")
+        conexion.execute(f"PRAGMA cache_size = {-int(self.config.get('cache_mb', 16)) * 1024}")  # Negativo: KiB
+        conexion.execute('PRAGMA temp_store = MEMORY')
+        if self.solo_lectura:
+            conexion.execute('PRAGMA query_only = ON')
+
+        with self._lock:
+            # Las conexiones de hilos que ya terminaron se cierran aquí
+            vivas = []
+            for hilo, abierta in self._abiertas:
+                if hilo.is_alive():
+                    vivas.append((hilo, abierta))
+                else:
+                    abierta.close()
+            vivas.append((threading.current_thread(), conexion))
+            self._abiertas = vivas
+        return conexion
+
+    @contextmanager
+    def consulta(self):
+        """Cursor para lecturas sobre la conexión del hilo"""
+        cursor = self.conexion().cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    @contextmanager
+    def transaccion(self):
+        """Cursor dentro de una transacción: commit al salir, rollback si hay excepción
+
+        Las transacciones anidadas se suman a la de afuera (confirma la más externa).
+        """
+        conexion = self.conexion()
+        cursor = conexion.cursor()
+        self._hilos.profundidad += 1
+        try:
+            yield cursor
+            if self._hilos.profundidad == 1:
+                conexion.commit()
+        except BaseException:
+            if self._hilos.profundidad == 1:
+                conexion.rollback()
+            raise
+        finally:
+            self._hilos.profundidad -= 1
+            cursor.close()
+
+    def cerrar(self):
+        """Cierra las conexiones de todos los hilos (al terminar la aplicación)"""
+        with self._lock:
+            abiertas, self._abiertas = self._abiertas, []
+        for _, conexion in abiertas:
+            try:
+                conexion.close()
+            except sqlite3.Error:
+                pass
+        self._hilos = threading.local()
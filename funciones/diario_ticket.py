@@ -0,0 +1,250 @@
+"""
+Diario del ticket en pesaje
+Si la aplicación o la PC se caen a mitad de un ticket, lo pesado desde el
+último guardado en la base se perdía. Cada ticket abierto tiene un archivo de
+diario local (BASE_DATOS_CONFIG['carpeta_diario']) al que se agrega un registro
+de tamaño fijo por alta, repesaje o baja de fardo, con fsync: agregar cuesta
+lo mismo con 5 fardos que con 500.
+
+    cabecera  '<8s64sqI'   firma, número de ticket, creación (µs epoch), crc32
+    registro  '<B3xIddqI'  tipo, número de fardo, peso, peso crudo (NaN = sin
+                           dato), hora de pesaje (µs epoch), crc32
+
+Los registros son absolutos (el fardo queda con ese peso), así que el diario
+se puede aplicar sobre lo que ya está en la base. Al arrancar, leer_diario()
+devuelve las operaciones y aplicar_operaciones() rehace el ticket. Un registro
+cortado por el corte de luz (crc inválido o incompleto) se descarta. Cuando
+un guardado queda firme en la base, confirmar() descarta lo ya guardado.
+"""
+import glob
+import math
+import os
+import re
+import struct
+import zlib
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from funciones.modelos import Ticket, Fardo
+
+FIRMA = b'DIARIO1\x00'
+CABECERA = struct.Struct('<8s64sqI')
+REGISTRO = struct.Struct('<B3xIddqI')
+
+ALTA = 1
+REPESAJE = 2
+BAJA = 3
+
+EXTENSION = '.diario'
+
+
+def _microsegundos(fecha: datetime) -> int:
+    return int(round(fecha.timestamp() * 1_000_000))
+
+
+def _fecha(microsegundos: int) -> datetime:
+    return datetime.fromtimestamp(microsegundos / 1_000_000)
+
+
+def ruta_diario(carpeta: str, numero_ticket: str) -> str:
+    """Archivo de diario de un ticket (el número real va en la cabecera)
+
+    Si el número tiene caracteres que no van en un nombre de archivo, se agrega
+    el crc32 del número original para que dos tickets no compartan archivo.
+    """
+    nombre = re.sub(r'[^\w.-]', '_', numero_ticket)
+    if nombre != numero_ticket:
+        nombre += '-%08x' % zlib.crc32(numero_ticket.encode('utf-8'))
+    return os.path.join(carpeta, nombre + EXTENSION)
+
+
+def _numero_en_archivo(ruta: str) -> Optional[str]:
+    """Número de ticket de la cabecera del diario (None si no se puede leer)"""
+    try:
+        with open(ruta, 'rb') as archivo:
+            datos = archivo.read(CABECERA.size)
+    except OSError:
+        return None
+    if len(datos) < CABECERA.size:
+        return None
+    firma, numero, _, crc = CABECERA.unpack(datos)
+    if firma != FIRMA or zlib.crc32(datos[:-4]) != crc:
+        return None
+    return numero.rstrip(b'\x00').decode('utf-8', errors='replace')
+
+
+def diarios_pendientes(carpeta: str) -> List[str]:
+    """Diarios que quedaron abiertos, del más reciente al más viejo"""
+    rutas = glob.glob(os.path.join(carpeta, '*' + EXTENSION))
+    return sorted(rutas, key=os.path.getmtime, reverse=True)
+
+
+def _empaquetar_cabecera(numero: str, fecha_creacion: datetime) -> bytes:
+    datos = CABECERA.pack(FIRMA, numero.encode('utf-8')[:64], _microsegundos(fecha_creacion), 0)
+    return datos[:-4] + struct.pack('<I', zlib.crc32(datos[:-4]))
+
+
+def _empaquetar_registro(tipo: int, numero: int, peso: float, peso_crudo: Optional[float],
+                         hora: datetime) -> bytes:
+    crudo = math.nan if peso_crudo is None else peso_crudo
+    datos = REGISTRO.pack(tipo, numero, peso, crudo, _microsegundos(hora), 0)
+    return datos[:-4] + struct.pack('<I', zlib.crc32(datos[:-4]))
+
+
+def leer_diario(ruta: str) -> Tuple[str, datetime, List[tuple], int]:
+    """(numero, fecha_creacion, operaciones, bytes válidos) de un diario
+
+    Cada operación es (tipo, numero_fardo, peso, peso_crudo, hora_pesaje). La
+    lectura se detiene en el primer registro incompleto o con crc inválido.
+    """
+    with open(ruta, 'rb') as archivo:
+        datos = archivo.read()
+    if len(datos) < CABECERA.size:
+        raise ValueError(f"Diario sin cabecera: {ruta}")
+    firma, numero, creacion, crc = CABECERA.unpack_from(datos, 0)
+    if firma != FIRMA or zlib.crc32(datos[:CABECERA.size - 4]) != crc:
+        raise ValueError(f"Cabecera de diario inválida: {ruta}")
+
+    operaciones = []
+    posicion = CABECERA.size
+    while posicion + REGISTRO.size <= len(datos):
+        tipo, fardo, peso, crudo, hora, crc = REGISTRO.unpack_from(datos, posicion)
+        if zlib.crc32(datos[posicion:posicion + REGISTRO.size - 4]) != crc or tipo not in (ALTA, REPESAJE, BAJA):
+            break
+        operaciones.append((tipo, fardo, peso, None if math.isnan(crudo) else crudo, _fecha(hora)))
+        posicion += REGISTRO.size
+    return numero.rstrip(b'\x00').decode('utf-8', errors='replace'), _fecha(creacion), operaciones, posicion
+
+
+def aplicar_operaciones(ticket: Ticket, operaciones: List[tuple]) -> int:
+    """Rehace sobre el ticket las operaciones del diario; devuelve cuántas cambiaron algo
+
+    Pasan por los métodos del modelo, así que quedan marcadas para el próximo guardado.
+    """
+    aplicadas = 0
+    for tipo, numero, peso, peso_crudo, hora in operaciones:
+        existente = ticket.obtener_fardo(numero)
+        if tipo == BAJA:
+            if existente is not None:
+                ticket.eliminar_fardo(numero)
+                aplicadas += 1
+            continue
+        if existente is not None:
+            fardo = ticket.repesar_fardo(numero, peso, peso_crudo)
+        else:
+            fardo = Fardo(numero, peso, peso_crudo)
+            ticket.agregar_fardo(fardo)
+        fardo.hora_pesaje = hora
+        aplicadas += 1
+    return aplicadas
+
+
+class DiarioTicket:
+    """Diario de solo agregado de un ticket abierto"""
+
+    def __init__(self, carpeta: str, ticket: Ticket, ruta: str = None):
+        """`ruta` sigue un diario recuperado que quedó con otro nombre de archivo"""
+        os.makedirs(carpeta, exist_ok=True)
+        self.numero = ticket.numero
+        self.ruta = ruta or ruta_diario(carpeta, ticket.numero)
+        self._cabecera = _empaquetar_cabecera(ticket.numero, ticket.fecha_creacion)
+
+        valido = 0
+        if os.path.exists(self.ruta):
+            try:
+                numero, _, _, valido = leer_diario(self.ruta)
+            except (OSError, ValueError):
+                numero, valido = None, 0
+            if numero is not None and numero != ticket.numero:
+                # Diario de otro ticket con el mismo nombre de archivo: no se pisa
+                raise FileExistsError(f"{self.ruta} es el diario del ticket {numero}")
+        self._abrir()
+        if valido:
+            os.ftruncate(self._fd, valido)  # Descarta un registro cortado al final
+        else:
+            os.ftruncate(self._fd, 0)
+            os.write(self._fd, self._cabecera)
+        os.fsync(self._fd)
+        self.tamano = os.fstat(self._fd).st_size
+        self._descartado = 0  # Bytes ya confirmados y quitados del archivo
+
+    def _abrir(self):
+        banderas = os.O_WRONLY | os.O_CREAT | os.O_APPEND | getattr(os, 'O_BINARY', 0)
+        self._fd = os.open(self.ruta, banderas, 0o644)
+
+    @property
+    def posicion(self) -> int:
+        """Marca para confirmar(): todo lo registrado hasta ahora
+
+        Es lógica (no se mueve cuando confirmar() acorta el archivo).
+        """
+        return self._descartado + self.tamano
+
+    def _agregar(self, registro: bytes):
+        os.write(self._fd, registro)
+        os.fsync(self._fd)
+        self.tamano += len(registro)
+
+    def registrar_fardo(self, fardo: Fardo):
+        self._agregar(_empaquetar_registro(ALTA, fardo.numero, fardo.peso, fardo.peso_crudo,
+                                           fardo.hora_pesaje))
+
+    def registrar_repesaje(self, fardo: Fardo):
+        self._agregar(_empaquetar_registro(REPESAJE, fardo.numero, fardo.peso, fardo.peso_crudo,
+                                           fardo.hora_pesaje))
+
+    def registrar_baja(self, numero_fardo: int):
+        self._agregar(_empaquetar_registro(BAJA, numero_fardo, 0.0, None, datetime.now()))
+
+    def confirmar(self, posicion: int):
+        """Descarta los registros hasta `posicion`: ya están firmes en la base"""
+        fisica = posicion - self._descartado
+        if self._fd is None or fisica <= CABECERA.size:
+            return
+        if fisica >= self.tamano:
+            os.ftruncate(self._fd, CABECERA.size)
+            os.fsync(self._fd)
+            self._descartado += self.tamano - CABECERA.size
+            self.tamano = CABECERA.size
+            return
+        # Llegaron fardos después del guardado: se conservan solo esos
+        with open(self.ruta, 'rb') as archivo:
+            archivo.seek(fisica)
+            cola = archivo.read(self.tamano - fisica)
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(self._cabecera + cola)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.close(self._fd)
+        os.replace(temporal, self.ruta)
+        self._abrir()
+        self._descartado += fisica - CABECERA.size
+        self.tamano = CABECERA.size + len(cola)
+
+    @staticmethod
+    def borrar(carpeta: str, numero_ticket: str):
+        """Borra el diario de un ticket que no está abierto
+
+        Solo si la cabecera es de ese ticket (o ilegible): el archivo puede ser
+        el diario de otro ticket pendiente de recuperar.
+        """
+        ruta = ruta_diario(carpeta, numero_ticket)
+        numero = _numero_en_archivo(ruta)
+        if numero is not None and numero != numero_ticket:
+            return
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+    def cerrar(self, borrar: bool = False):
+        """Cierra el diario; con borrar=True el ticket ya no necesita recuperarse"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        if borrar:
+            try:
+                os.remove(self.ruta)
+            except FileNotFoundError:
+                pass
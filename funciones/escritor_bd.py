@@ -0,0 +1,206 @@
+"""
+Escritura diferida de tickets
+El auto-guardado después de cada fardo corría guardar_ticket() en el hilo de Tk:
+con la base en una carpeta de red, cada captura congelaba la pantalla lo que
+tardara el fsync remoto. EscritorDiferido escribe en un hilo propio:
+
+    guardar()              (hilo de la interfaz) copia lo que cambió del ticket
+                           con BaseDatos.preparar_guardado() y lo encola
+    hilo 'escritor-bd'     junta lo que llegue dentro de la ventana de agrupado
+                           (BASE_DATOS_CONFIG['escritura_agrupada_ms']) y lo
+                           escribe en una sola transacción
+    obtener_resultados()   (hilo de la interfaz) confirmaciones y fallos, para
+                           que el "💾 Guardado" refleje el commit real
+
+Un guardado que falla devuelve sus cambios al ticket (quedan marcados para el
+próximo intento). cerrar() vacía la cola con un tiempo máximo.
+"""
+import queue
+import threading
+import time
+from typing import List
+
+from config.configuracion import BASE_DATOS_CONFIG
+
+_FIN = object()
+
+
+def combinar_guardados(anterior: dict, nuevo: dict) -> dict:
+    """Un solo guardado equivalente a escribir `anterior` y después `nuevo` (mismo ticket)"""
+    combinado = dict(nuevo)
+    combinado['id_bd'] = nuevo['id_bd'] if nuevo['id_bd'] is not None else anterior['id_bd']
+    combinado['reemplazar'] = anterior['reemplazar'] or nuevo['reemplazar']
+    if nuevo['reemplazar']:
+        combinado['fardos'] = dict(nuevo['fardos'])  # Ya trae el ticket entero
+    else:
+        fardos = {numero: datos for numero, datos in anterior['fardos'].items()
+                  if numero not in nuevo['eliminados']}
+        fardos.update(nuevo['fardos'])
+        combinado['fardos'] = fardos
+    combinado['eliminados'] = (anterior['eliminados'] - set(nuevo['fardos'])) | nuevo['eliminados']
+    combinado['cambios_todos'] = anterior.get('cambios_todos', [anterior['cambios']]) + [nuevo['cambios']]
+    return combinado
+
+
+class EscritorDiferido:
+    """Hilo único que escribe en la base los guardados encolados por la interfaz"""
+
+    def __init__(self, bd, ventana_agrupado: float = None):
+        self.bd = bd
+        if ventana_agrupado is None:
+            ventana_agrupado = BASE_DATOS_CONFIG.get('escritura_agrupada_ms', 200) / 1000
+        self.ventana_agrupado = ventana_agrupado
+
+        self._cola = queue.Queue()
+        self._resultados = queue.Queue()
+        self._en_vuelo = {}  # numero de ticket -> guardados encolados sin resultado (solo hilo de Tk)
+        self._sin_escribir = 0  # Guardados encolados que el hilo todavía no terminó
+        self._vacio = threading.Condition()
+        self.transacciones = 0
+        self.ultimo_error = None
+
+        self.hilo = threading.Thread(target=self._bucle, name='escritor-bd', daemon=True)
+        self.hilo.start()
+
+    # === HILO DE LA INTERFAZ ===
+
+    def guardar(self, ticket, datos_adicionales: dict = None, origen: str = 'auto', marca=None):
+        """Encola el guardado de lo que cambió en el ticket (no bloquea)
+
+        `marca` (la posición del diario del ticket) vuelve en el resultado para
+        acortar el diario cuando el guardado quedó firme ('durable').
+        """
+        pendiente = self.bd.preparar_guardado(ticket, datos_adicionales)
+        pendiente['ticket'] = ticket
+        pendiente['origen'] = origen
+        pendiente['marca'] = marca
+        self._en_vuelo[ticket.numero] = self._en_vuelo.get(ticket.numero, 0) + 1
+        with self._vacio:
+            self._sin_escribir += 1
+        self._cola.put(pendiente)
+
+    def pendiente(self, ticket) -> bool:
+        """True si hay guardados de este ticket encolados o escribiéndose"""
+        return ticket is not None and self._en_vuelo.get(ticket.numero, 0) > 0
+
+    def obtener_resultados(self) -> List[dict]:
+        """Resultados terminados desde la última consulta
+
+        Cada uno: {'ticket', 'ok', 'error', 'origen', 'fardos', 'guardados', 'marca',
+        'durable'}. Los guardados que fallaron ya devolvieron sus cambios al ticket.
+        """
+        resultados = []
+        while True:
+            try:
+                pendiente, ticket_id, error, durable = self._resultados.get_nowait()
+            except queue.Empty:
+                return resultados
+            ticket = pendiente['ticket']
+            todos = pendiente.get('cambios_todos', [pendiente['cambios']])
+            restantes = self._en_vuelo.get(ticket.numero, 0) - len(todos)
+            if restantes > 0:
+                self._en_vuelo[ticket.numero] = restantes
+            else:
+                self._en_vuelo.pop(ticket.numero, None)
+            if error is None:
+                ticket.id_bd = ticket_id
+            else:
+                for cambios in todos:
+                    ticket.devolver_cambios(cambios)
+            resultados.append({
+                'ticket': ticket,
+                'ok': error is None,
+                'error': error,
+                'origen': pendiente['origen'],
+                'fardos': len(pendiente['fardos']),
+                'guardados': len(todos),
+                'marca': pendiente.get('marca'),
+                'durable': durable,
+            })
+
+    def ocupado(self) -> bool:
+        """True si queda algo encolado o escribiéndose (no bloquea)"""
+        with self._vacio:
+            return self._sin_escribir > 0
+
+    def vaciar(self, timeout: float = 5.0) -> bool:
+        """Espera a que se escriba todo lo encolado (False si no alcanzó el tiempo)
+
+        Bloquea: desde la interfaz, consultar ocupado() con after().
+        """
+        limite = time.monotonic() + timeout
+        with self._vacio:
+            while self._sin_escribir:
+                restante = limite - time.monotonic()
+                if restante <= 0 or not self.hilo.is_alive():
+                    return False
+                self._vacio.wait(restante)
+        return True
+
+    def cerrar(self, timeout: float = None) -> bool:
+        """Escribe lo pendiente (con tiempo máximo) y detiene el hilo
+
+        Si no alcanzó el tiempo devuelve False y el hilo sigue escribiendo: la
+        aplicación puede seguir abierta y volver a intentar.
+        """
+        if timeout is None:
+            timeout = BASE_DATOS_CONFIG.get('espera_cierre_s', 10)
+        if not self.vaciar(timeout):
+            return False
+        self._cola.put(_FIN)
+        self.hilo.join(1.0)
+        return True
+
+    # === HILO ESCRITOR ===
+
+    def _bucle(self):
+        terminar = False
+        while not terminar:
+            primero = self._cola.get()
+            if primero is _FIN:
+                break
+            lote = [primero]
+            limite = time.monotonic() + self.ventana_agrupado
+            # Ventana de agrupado: los fardos de una ráfaga van en la misma transacción
+            while True:
+                restante = limite - time.monotonic()
+                try:
+                    siguiente = self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait()
+                except queue.Empty:
+                    break
+                if siguiente is _FIN:
+                    terminar = True  # Se escribe lo juntado y se termina
+                    break
+                lote.append(siguiente)
+            self._escribir(lote)
+
+    def _escribir(self, lote: List[dict]):
+        # Un guardado por ticket, en el orden en que llegaron
+        por_ticket = {}
+        for pendiente in lote:
+            numero = pendiente['numero']
+            if numero in por_ticket:
+                por_ticket[numero] = combinar_guardados(por_ticket[numero], pendiente)
+            else:
+                por_ticket[numero] = pendiente
+        combinados = list(por_ticket.values())
+        try:
+            ids = self.bd.escribir_guardados(combinados)
+            self.transacciones += 1
+            self.ultimo_error = None
+            durable = False
+            if any(pendiente.get('marca') is not None for pendiente in combinados):
+                try:
+                    durable = self.bd.consolidar()  # Recién entonces se puede acortar el diario
+                except Exception as e:
+                    print(f"⚠️ No se pudo consolidar la base: {e}")
+            for pendiente, ticket_id in zip(combinados, ids):
+                self._resultados.put((pendiente, ticket_id, None, durable))
+        except Exception as e:
+            self.ultimo_error = str(e)
+            print(f"❌ Error al guardar en segundo plano: {e}")
+            for pendiente in combinados:
+                self._resultados.put((pendiente, None, str(e), False))
+        with self._vacio:
+            self._sin_escribir -= len(lote)
+            self._vacio.notify_all()
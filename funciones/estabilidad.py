@@ -0,0 +1,63 @@
+from collections import deque
+from typing import Optional
+
+
+class DetectorEstabilidad:
+    """Detecta cuándo el peso de la balanza se asentó"""
+
+    def __init__(self, muestras: int = 10, tolerancia: float = 0.5,
+                 usar_indicador_balanza: bool = True):
+        self.tolerancia = tolerancia
+        self.usar_indicador_balanza = usar_indicador_balanza
+        self.ventana = deque(maxlen=max(2, muestras))
+
+        self.estable = False
+        self.estable_desde: Optional[float] = None
+        self.valor_estable: Optional[float] = None
+        self.asentamientos = 0  # Veces que un peso nuevo quedó estable
+
+    def agregar(self, peso: float, timestamp: float,
+                estable_balanza: Optional[bool] = None) -> bool:
+        """Agrega una lectura y devuelve si el peso está estable"""
+        ventana = self.ventana
+        ventana.append(peso)
+
+        if estable_balanza is not None and self.usar_indicador_balanza:
+            # La balanza informa ST/US: se confía en su propio indicador
+            estable = estable_balanza
+            valor = peso
+        elif len(ventana) == ventana.maxlen:
+            # Sin indicador: prueba pico a pico sobre las últimas N lecturas
+            estable = max(ventana) - min(ventana) <= self.tolerancia
+            valor = sum(ventana) / len(ventana)
+        else:
+            estable = False
+            valor = peso
+
+        if not estable:
+            self.estable = False
+            self.estable_desde = None
+            return False
+
+        # Un salto mayor a la tolerancia con la balanza "estable" es una carga nueva
+        if not self.estable or abs(valor - self.valor_estable) > self.tolerancia:
+            self.estable_desde = timestamp
+            self.asentamientos += 1
+        self.estable = True
+        self.valor_estable = valor
+        return True
+
+    def reiniciar(self):
+        """Descarta el historial (por ejemplo, al reconectar la balanza)"""
+        self.ventana.clear()
+        self.estable = False
+        self.estable_desde = None
+        self.valor_estable = None
+
+    def obtener_estado(self) -> dict:
+        """Devuelve el estado actual de estabilidad"""
+        return {
+            'estable': self.estable,
+            'estable_desde': self.estable_desde,
+            'valor_estable': self.valor_estable
+        }
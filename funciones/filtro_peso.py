@@ -0,0 +1,139 @@
+"""
+Filtro del peso en el lado de adquisición
+La vibración de la prensa hace bailar el último dígito. Cada lectura cruda pasa
+por una cadena de etapas configurable (BALANZA_CONFIG['filtro_etapas'], en orden):
+
+    mediana       mediana móvil de las últimas N lecturas: descarta picos sueltos
+    ema           promedio exponencial; un salto mayor a 'filtro_salto' (carga
+                  nueva) reinicia el promedio para no arrastrar el peso anterior
+    banda_muerta  lo mostrado cambia solo si el valor se mueve más que la banda
+    redondeo      al múltiplo de la división de la balanza
+
+El promedio y la banda muerta atrasan o retienen el valor: son solo para lo que
+se muestra. Para detectar estabilidad y capturar el fardo se usa `pesaje`, el
+valor de las etapas previas al promedio (la mediana, si va primero).
+
+Las muestras de la mediana viven en un anillo de tamaño fijo reservado al crear
+el filtro (sin listas que crecen por lectura). Con numpy instalado y ventanas
+grandes, la mediana se calcula vectorizada.
+"""
+import math
+from array import array
+from typing import Optional
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ETAPAS = ('mediana', 'ema', 'banda_muerta', 'redondeo')
+
+
+class FiltroPeso:
+    """Cadena de filtros para una balanza (la usa un solo hilo de adquisición)"""
+
+    def __init__(self, etapas=ETAPAS, ventana_mediana: int = 5, alfa_ema: float = 0.3,
+                 salto_ema: float = 2.0, banda_muerta: float = 0.02, division: float = 0.01,
+                 capacidad: int = 64, umbral_vectorizado: int = 32):
+        desconocidas = [etapa for etapa in etapas if etapa not in ETAPAS]
+        if desconocidas:
+            raise ValueError(f"Etapas de filtro desconocidas: {', '.join(desconocidas)} "
+                             f"(disponibles: {', '.join(ETAPAS)})")
+        self.etapas = tuple(etapas)
+        self.ventana_mediana = max(1, ventana_mediana)
+        self.alfa_ema = min(1.0, max(0.0, alfa_ema))
+        self.salto_ema = salto_ema
+        self.banda_muerta = banda_muerta
+        self.division = division
+        self.decimales = max(0, math.ceil(-math.log10(division))) if division > 0 else None
+        self.umbral_vectorizado = umbral_vectorizado
+
+        # Anillo preasignado: nunca más chico que la ventana de la mediana
+        self.capacidad = max(capacidad, self.ventana_mediana)
+        if numpy is not None:
+            self._anillo = numpy.zeros(self.capacidad, dtype=numpy.float64)
+        else:
+            self._anillo = array('d', bytes(8 * self.capacidad))
+        self._total = 0
+
+        self._promedio: Optional[float] = None
+        self._mostrado: Optional[float] = None
+        self._funciones = [getattr(self, '_' + etapa) for etapa in self.etapas]
+        # Etapas que no atrasan el peso: las anteriores al primer promedio o banda muerta
+        self._hasta_pesaje = next((i for i, etapa in enumerate(self.etapas)
+                                   if etapa in ('ema', 'banda_muerta')), len(self.etapas))
+        self.pesaje = 0.0
+
+    @classmethod
+    def desde_config(cls, config: dict) -> 'FiltroPeso':
+        """Filtro con las claves filtro_* de BALANZA_CONFIG (o de una balanza adicional)"""
+        return cls(etapas=config.get('filtro_etapas', ETAPAS),
+                   ventana_mediana=config.get('filtro_ventana_mediana', 5),
+                   alfa_ema=config.get('filtro_alfa_ema', 0.3),
+                   salto_ema=config.get('filtro_salto', 2.0),
+                   banda_muerta=config.get('filtro_banda_muerta', 0.02),
+                   division=config.get('division_balanza', 0.01),
+                   capacidad=config.get('filtro_muestras', 64))
+
+    def agregar(self, peso: float) -> float:
+        """Pasa una lectura cruda por la cadena y devuelve el peso a mostrar
+
+        Deja en `pesaje` el valor sin promedio ni banda muerta.
+        """
+        valor = peso
+        for i, etapa in enumerate(self._funciones):
+            if i == self._hasta_pesaje:
+                self.pesaje = valor
+            valor = etapa(valor)
+        if self._hasta_pesaje == len(self._funciones):
+            self.pesaje = valor
+        return valor
+
+    def reiniciar(self):
+        """Descarta el historial (al reconectar o cambiar de puerto)"""
+        self._total = 0
+        self._promedio = None
+        self._mostrado = None
+
+    # === ETAPAS ===
+
+    def _ultimas(self, cantidad: int):
+        """Las últimas `cantidad` muestras del anillo (vista o copia chica)"""
+        cantidad = min(cantidad, self._total, self.capacidad)
+        fin = self._total % self.capacidad
+        inicio = fin - cantidad
+        if inicio >= 0:
+            return self._anillo[inicio:fin]
+        if numpy is not None:
+            return numpy.concatenate((self._anillo[inicio:], self._anillo[:fin]))
+        return self._anillo[inicio:] + self._anillo[:fin]
+
+    def _mediana(self, valor: float) -> float:
+        self._anillo[self._total % self.capacidad] = valor
+        self._total += 1
+        ventana = self._ultimas(self.ventana_mediana)
+        cantidad = len(ventana)
+        if numpy is not None and cantidad >= self.umbral_vectorizado:
+            return float(numpy.median(ventana))
+        ordenada = sorted(ventana)
+        medio = cantidad // 2
+        if cantidad % 2:
+            return float(ordenada[medio])
+        return (ordenada[medio - 1] + ordenada[medio]) / 2
+
+    def _ema(self, valor: float) -> float:
+        if self._promedio is None or abs(valor - self._promedio) > self.salto_ema:
+            self._promedio = valor
+        else:
+            self._promedio += self.alfa_ema * (valor - self._promedio)
+        return self._promedio
+
+    def _banda_muerta(self, valor: float) -> float:
+        if self._mostrado is None or abs(valor - self._mostrado) > self.banda_muerta:
+            self._mostrado = valor
+        return self._mostrado
+
+    def _redondeo(self, valor: float) -> float:
+        if not self.division:
+            return valor
+        return round(round(valor / self.division) * self.division, self.decimales)
@@ -2,17 +2,32 @@ import os
 from datetime import datetime
 from typing import List, Optional
 from funciones.modelos import Ticket, Fardo
-from funciones.simulador_balanza import ConexionBalanza
+from funciones.conexion_balanza import ConexionBalanza
+from funciones.proceso_adquisicion import crear_balanza
 from funciones.exportador import Exportador
-from config.configuracion import CAMPOS_CONFIG, VALIDACIONES
+from funciones.diario_ticket import DiarioTicket, diarios_pendientes, leer_diario
+from config.configuracion import CAMPOS_CONFIG, VALIDACIONES, BALANZAS_ADICIONALES, BASE_DATOS_CONFIG
 
 class GestorFardos:
     """Clase principal para gestionar los fardos y tickets"""
     
     def __init__(self):
-        self.balanza = ConexionBalanza()
+        self.balanza = crear_balanza()
+        # Todas las balanzas del puesto por rol; comparten el hilo de E/S
+        self.balanzas = {self.balanza.rol: self.balanza}
+        for configuracion in BALANZAS_ADICIONALES:
+            if not configuracion.get('activa', True):
+                continue
+            balanza = crear_balanza(configuracion)
+            self.balanzas[balanza.rol] = balanza
         self.exportador = Exportador()
         self.tickets: List[Ticket] = []
+        # Diario local de cada ticket abierto (se rehace al arrancar si la app se cayó)
+        self.diarios = {}
+        self.carpeta_diario = None
+        if BASE_DATOS_CONFIG.get('diario', True):
+            self.carpeta_diario = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                               BASE_DATOS_CONFIG.get('carpeta_diario', 'diario'))
         self.tara_por_fardo = CAMPOS_CONFIG['tara_por_fardo']
         self.precision_decimal = CAMPOS_CONFIG['precision_decimal']
     
@@ -36,21 +51,56 @@ class GestorFardos:
         # Crear y agregar el ticket
         nuevo_ticket = Ticket(numero_ticket)
         self.tickets.append(nuevo_ticket)
+        self.abrir_diario(nuevo_ticket)
         
         print(f"✅ Ticket {numero_ticket} creado exitosamente")
         return nuevo_ticket
     
     def obtener_peso_balanza(self) -> float:
-        """Obtiene el peso actual de la balanza"""
+        """Obtiene el último peso publicado por el hilo de adquisición"""
         peso = self.balanza.obtener_peso()
         return round(peso, self.precision_decimal)
     
+    def obtener_lectura_balanza(self) -> dict:
+        """Obtiene la última lectura con su estado de estabilidad"""
+        lectura = self.balanza.obtener_lectura()
+        lectura['peso'] = round(lectura['peso'], self.precision_decimal)
+        if lectura['valor_estable'] is not None:
+            lectura['valor_estable'] = round(lectura['valor_estable'], self.precision_decimal)
+        return lectura
+    
+    def obtener_balanza(self, rol: str) -> Optional[ConexionBalanza]:
+        """Balanza configurada para un rol ('fardos', 'romaneo'...) o None"""
+        return self.balanzas.get(rol)
+    
+    def obtener_lectura_rol(self, rol: str) -> Optional[dict]:
+        """Última lectura de la balanza de un rol, con su estado de conexión"""
+        balanza = self.balanzas.get(rol)
+        if balanza is None:
+            return None
+        lectura = balanza.obtener_lectura()
+        lectura['peso'] = round(lectura['peso'], self.precision_decimal)
+        if lectura['valor_estable'] is not None:
+            lectura['valor_estable'] = round(lectura['valor_estable'], self.precision_decimal)
+        lectura['conectada'] = balanza.conectada
+        lectura['nombre'] = balanza.nombre
+        return lectura
+    
+    def marcar_lectura_mostrada(self, lectura: dict):
+        """Registra la latencia hasta que la lectura se dibujó en pantalla"""
+        self.balanza.latencia.marcar_mostrada(lectura.get('recibido_ns'))
+    
+    def marcar_lectura_capturada(self, lectura: dict):
+        """Registra la latencia hasta que la lectura se usó como peso de un fardo"""
+        self.balanza.latencia.marcar_capturada(lectura.get('recibido_ns'))
+    
     def obtener_hora_actual(self) -> datetime:
         """Obtiene la hora actual"""
         return datetime.now()
     
-    def agregar_fardo(self, ticket: Ticket, numero_fardo: int, peso: float) -> Fardo:
-        """Agrega un fardo al ticket"""
+    def agregar_fardo(self, ticket: Ticket, numero_fardo: int, peso: float,
+                      peso_crudo: Optional[float] = None) -> Fardo:
+        """Agrega un fardo al ticket (peso filtrado y, si vino de la balanza, el crudo)"""
         # Validar peso
         if peso < VALIDACIONES['peso_minimo']:
             raise ValueError(f"El peso debe ser mayor a {VALIDACIONES['peso_minimo']} kg")
@@ -63,14 +113,89 @@ class GestorFardos:
             raise ValueError(f"El número de fardo debe estar entre 1 y {VALIDACIONES['numero_fardo_maximo']}")
         
         # Crear y agregar el fardo
-        nuevo_fardo = Fardo(numero_fardo, peso)
+        nuevo_fardo = Fardo(numero_fardo, peso, peso_crudo)
         ticket.agregar_fardo(nuevo_fardo)
+        self._registrar_diario(ticket, 'registrar_fardo', nuevo_fardo)
         
         return nuevo_fardo
     
+    def repesar_fardo(self, ticket: Ticket, numero_fardo: int, peso: float,
+                      peso_crudo: Optional[float] = None) -> Fardo:
+        """Reemplaza el peso de un fardo del ticket"""
+        fardo = ticket.repesar_fardo(numero_fardo, peso, peso_crudo)
+        self._registrar_diario(ticket, 'registrar_repesaje', fardo)
+        return fardo
+    
     def eliminar_fardo(self, ticket: Ticket, numero_fardo: int) -> None:
         """Elimina un fardo del ticket"""
         ticket.eliminar_fardo(numero_fardo)
+        self._registrar_diario(ticket, 'registrar_baja', numero_fardo)
+    
+    # === DIARIO DEL TICKET ===
+    
+    def abrir_diario(self, ticket: Ticket, conservar: bool = False, ruta: str = None):
+        """Empieza el diario del ticket (conservar=True sigue uno recuperado, en `ruta`)"""
+        if self.carpeta_diario is None or ticket.numero in self.diarios:
+            return
+        try:
+            if not conservar:
+                # Un diario viejo con el mismo número no corresponde a este ticket
+                self.cerrar_diario(ticket, borrar=True)
+            self.diarios[ticket.numero] = DiarioTicket(self.carpeta_diario, ticket, ruta)
+        except OSError as e:
+            print(f"⚠️ No se pudo abrir el diario del ticket {ticket.numero}: {e}")
+    
+    def _registrar_diario(self, ticket: Ticket, metodo: str, dato):
+        diario = self.diarios.get(ticket.numero)
+        if diario is None:
+            return
+        try:
+            getattr(diario, metodo)(dato)
+        except OSError as e:
+            # Sin diario se sigue pesando: el auto-guardado en la base sigue andando
+            print(f"⚠️ Error al escribir el diario del ticket {ticket.numero}: {e}")
+    
+    def marca_diario(self, ticket: Ticket) -> Optional[int]:
+        """Posición del diario que cubre un guardado preparado ahora"""
+        diario = self.diarios.get(ticket.numero)
+        return diario.posicion if diario is not None else None
+    
+    def confirmar_diario(self, ticket: Ticket, marca: Optional[int]):
+        """El guardado con esa marca quedó firme en la base: se acorta el diario"""
+        diario = self.diarios.get(ticket.numero)
+        if diario is None or marca is None:
+            return
+        try:
+            diario.confirmar(marca)
+        except OSError as e:
+            print(f"⚠️ Error al acortar el diario del ticket {ticket.numero}: {e}")
+    
+    def cerrar_diario(self, ticket: Ticket, borrar: bool = True):
+        """Cierra el diario del ticket; borrar=False lo deja para recuperarlo al arrancar"""
+        diario = self.diarios.pop(ticket.numero, None)
+        if diario is not None:
+            diario.cerrar(borrar)
+        elif borrar and self.carpeta_diario is not None:
+            DiarioTicket.borrar(self.carpeta_diario, ticket.numero)
+    
+    def obtener_diarios_pendientes(self) -> List[tuple]:
+        """(ruta, numero, fecha_creacion, operaciones) de cada diario que quedó abierto
+
+        Del más reciente al más viejo; no incluye los de tickets abiertos ahora.
+        """
+        if self.carpeta_diario is None:
+            return []
+        abiertos = {os.path.abspath(diario.ruta) for diario in self.diarios.values()}
+        pendientes = []
+        for ruta in diarios_pendientes(self.carpeta_diario):
+            if os.path.abspath(ruta) in abiertos:
+                continue
+            try:
+                numero, fecha_creacion, operaciones, _ = leer_diario(ruta)
+                pendientes.append((ruta, numero, fecha_creacion, operaciones))
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Diario ilegible, se ignora: {ruta} ({e})")
+        return pendientes
     
     def calcular_tara_total(self, ticket: Ticket) -> float:
         """Calcula la tara total para un ticket"""
@@ -86,4 +211,9 @@ class GestorFardos:
     
     def cerrar(self):
         """Cierra las conexiones y libera recursos"""
-        self.balanza.cerrar()
+        for balanza in self.balanzas.values():
+            balanza.cerrar()
+        # Los diarios que sigan abiertos quedan para recuperarlos al arrancar
+        for diario in self.diarios.values():
+            diario.cerrar()
+        self.diarios = {}
@@ -0,0 +1,137 @@
+"""
+Medición de latencia de punta a punta del peso
+Cada lectura lleva la hora (time.monotonic_ns) en que llegaron sus bytes; cada
+etapa siguiente registra cuánto tardó desde ese instante:
+    armado       trama completa en el lector de tramas
+    decodificado trama convertida a Lectura
+    publicado    lectura visible en la instantánea de ConexionBalanza
+    mostrado     número dibujado por Tk
+    capturado    peso tomado para un Fardo
+"""
+import json
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from funciones import reloj
+
+ETAPAS = ('armado', 'decodificado', 'publicado', 'mostrado', 'capturado')
+
+
+def _percentil(ordenados: list, fraccion: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada"""
+    indice = min(len(ordenados) - 1, max(0, int(round(fraccion * len(ordenados))) - 1))
+    return ordenados[indice]
+
+
+class MedidorLatencia:
+    """Ventanas móviles de latencia por etapa y contadores de tramas por segundo"""
+
+    def __init__(self, muestras: int = 1000):
+        # Latencias en ns desde que llegaron los bytes
+        self.etapas = {etapa: deque(maxlen=muestras) for etapa in ETAPAS}
+        # Horas de llegada para calcular tasas (tramas, lecturas y refrescos por segundo)
+        self.horas_tramas = deque(maxlen=10000)
+        self.horas_lecturas = deque(maxlen=10000)
+        self.horas_mostradas = deque(maxlen=1000)
+        self._ultima_mostrada = None
+        self._lock = threading.Lock()  # Escriben el hilo de lectura y la interfaz
+
+    def registrar_trama(self, armado_ns: int):
+        """Cuenta una trama completa (decodificable o no)"""
+        self.horas_tramas.append(armado_ns)
+
+    def registrar_lectura(self, recibido_ns: int, armado_ns: int,
+                          decodificado_ns: int, publicado_ns: int):
+        """Registra las etapas de adquisición de una lectura"""
+        with self._lock:
+            self.etapas['armado'].append(armado_ns - recibido_ns)
+            self.etapas['decodificado'].append(decodificado_ns - recibido_ns)
+            self.etapas['publicado'].append(publicado_ns - recibido_ns)
+            self.horas_lecturas.append(publicado_ns)
+
+    def registrar_publicada(self, recibido_ns: int, publicado_ns: int):
+        """Lectura publicada por otro proceso (solo se conoce la etapa final de adquisición)"""
+        with self._lock:
+            self.etapas['publicado'].append(publicado_ns - recibido_ns)
+            self.horas_lecturas.append(publicado_ns)
+
+    def marcar_mostrada(self, recibido_ns: Optional[int]):
+        """La interfaz dibujó la lectura que llegó en recibido_ns (cuenta solo la primera vez)"""
+        if recibido_ns is None or recibido_ns == self._ultima_mostrada:
+            return
+        ahora = reloj.monotonic_ns()
+        with self._lock:
+            self._ultima_mostrada = recibido_ns
+            self.etapas['mostrado'].append(ahora - recibido_ns)
+            self.horas_mostradas.append(ahora)
+
+    def marcar_capturada(self, recibido_ns: Optional[int]):
+        """Se usó la lectura que llegó en recibido_ns como peso de un fardo"""
+        if recibido_ns is None:
+            return
+        with self._lock:
+            self.etapas['capturado'].append(reloj.monotonic_ns() - recibido_ns)
+
+    def reiniciar(self):
+        """Descarta todas las muestras"""
+        with self._lock:
+            for valores in self.etapas.values():
+                valores.clear()
+            self.horas_tramas.clear()
+            self.horas_lecturas.clear()
+            self.horas_mostradas.clear()
+            self._ultima_mostrada = None
+
+    @staticmethod
+    def _por_segundo(horas: list, ahora: int, ventana_s: float = 5.0) -> float:
+        """Eventos por segundo en los últimos ventana_s segundos"""
+        if not horas:
+            return 0.0
+        # Recién arrancado: se divide por el tiempo que realmente hay medido
+        ventana_s = max(min(ventana_s, (ahora - horas[0]) / 1e9), 1e-3)
+        limite = ahora - int(ventana_s * 1e9)
+        cantidad = 0
+        for hora in reversed(horas):
+            if hora < limite:
+                break
+            cantidad += 1
+        return cantidad / ventana_s
+
+    def obtener_resumen(self) -> dict:
+        """p50/p95/p99/máximo por etapa (en ms) y tasas por segundo"""
+        with self._lock:
+            copias = {etapa: sorted(valores) for etapa, valores in self.etapas.items()}
+            horas_tramas = list(self.horas_tramas)
+            horas_lecturas = list(self.horas_lecturas)
+            horas_mostradas = list(self.horas_mostradas)
+
+        resumen = {}
+        for etapa, valores in copias.items():
+            if not valores:
+                resumen[etapa] = {'muestras': 0}
+                continue
+            resumen[etapa] = {
+                'muestras': len(valores),
+                'p50_ms': _percentil(valores, 0.50) / 1e6,
+                'p95_ms': _percentil(valores, 0.95) / 1e6,
+                'p99_ms': _percentil(valores, 0.99) / 1e6,
+                'max_ms': valores[-1] / 1e6,
+            }
+
+        ahora = reloj.monotonic_ns()
+        return {
+            'etapas': resumen,
+            'tramas_por_segundo': self._por_segundo(horas_tramas, ahora),
+            'lecturas_por_segundo': self._por_segundo(horas_lecturas, ahora),
+            'refrescos_por_segundo': self._por_segundo(horas_mostradas, ahora),
+        }
+
+    def exportar_json(self, ruta: str) -> dict:
+        """Guarda el resumen en un archivo JSON (para comparar entre versiones o equipos)"""
+        resumen = self.obtener_resumen()
+        resumen['fecha'] = time.strftime('%Y-%m-%d %H:%M:%S')
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            json.dump(resumen, archivo, indent=2, ensure_ascii=False)
+        return resumen
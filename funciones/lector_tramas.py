@@ -0,0 +1,57 @@
+from typing import List
+
+
+class LectorTramas:
+    """Arma tramas completas (terminadas en CR o LF) a partir de bloques de bytes"""
+
+    def __init__(self, tamano_maximo: int = 4096):
+        # Buffer reutilizable: se agrega y se recorta en el lugar
+        self.buffer = bytearray()
+        self.tamano_maximo = tamano_maximo
+
+    def leer(self, conexion) -> List[bytes]:
+        """Lee de una sola vez todo lo pendiente en el puerto y devuelve las tramas completas"""
+        # Si no hay nada pendiente, read(1) bloquea hasta el timeout del puerto
+        datos = conexion.read(conexion.in_waiting or 1)
+        if not datos:
+            return []
+        return self.alimentar(datos)
+
+    def alimentar(self, datos) -> List[bytes]:
+        """Agrega bytes al buffer y devuelve las tramas que quedaron completas"""
+        buffer = self.buffer
+        buffer += datos
+
+        tramas = []
+        inicio = 0
+        pos_cr = buffer.find(b'\r')
+        pos_lf = buffer.find(b'\n')
+
+        while pos_cr != -1 or pos_lf != -1:
+            if pos_lf == -1 or (pos_cr != -1 and pos_cr < pos_lf):
+                fin = pos_cr
+            else:
+                fin = pos_lf
+
+            # CR+LF genera una trama vacía entre ambos: se descarta
+            if fin > inicio:
+                tramas.append(bytes(buffer[inicio:fin]))
+            inicio = fin + 1
+
+            if pos_cr != -1 and pos_cr < inicio:
+                pos_cr = buffer.find(b'\r', inicio)
+            if pos_lf != -1 and pos_lf < inicio:
+                pos_lf = buffer.find(b'\n', inicio)
+
+        if inicio:
+            del buffer[:inicio]
+
+        # Basura sin terminadores (baudrate equivocado): no dejar crecer el buffer
+        if len(buffer) > self.tamano_maximo:
+            del buffer[:-self.tamano_maximo]
+
+        return tramas
+
+    def limpiar(self):
+        """Descarta los bytes pendientes de una trama incompleta"""
+        self.buffer.clear()
@@ -0,0 +1,212 @@
+"""
+Instantánea de la balanza en memoria compartida (multiprocessing.shared_memory)
+El proceso de adquisición escribe y la interfaz lee sin llamadas al sistema ni
+pickle. La consistencia la da un seqlock: el escritor pone la secuencia en
+impar, escribe y la vuelve a par; el lector copia y reintenta si la secuencia
+era impar o cambió mientras copiaba. Un solo escritor por bloque. Si el
+escritor murió a mitad de una escritura, el lector deja de reintentar a los
+ESPERA_MAXIMA segundos y devuelve una lectura desconectada.
+
+Distribución (little endian):
+    cabecera  secuencia (Q) | latido_ns (q) | total muestras (Q)
+    lectura   peso (d) | peso_crudo (d) | timestamp (d) | recibido_ns (q) | estable_desde (d) |
+              valor_estable (d) | proximo_reintento (d) | tramas (Q) | inválidas (Q) |
+              asentamientos (Q) | banderas (I) | unidad (8s) | estado (16s) | error (96s)
+    muestras  anillo de MUESTRAS x (peso crudo (d) | recibido_ns (q) | publicado_ns (q) | banderas (I))
+    tramas    anillo de TRAMAS x (largo (H) | bytes (62s)) con contador (Q)
+"""
+import struct
+import time
+from typing import Optional
+
+MUESTRAS = 256
+TRAMAS = 50
+ESPERA_MAXIMA = 0.05  # Segundos que el lector reintenta una copia antes de rendirse
+
+_CABECERA = struct.Struct('<QqQ')
+_LECTURA = struct.Struct('<dddqddd' 'QQQ' 'I8s16s96s')
+_MUESTRA = struct.Struct('<dqqI')
+_TRAMA = struct.Struct('<H62s')
+_CONTADOR = struct.Struct('<Q')
+
+_INICIO_LECTURA = _CABECERA.size
+_INICIO_MUESTRAS = _INICIO_LECTURA + _LECTURA.size
+_INICIO_CONTADOR_TRAMAS = _INICIO_MUESTRAS + MUESTRAS * _MUESTRA.size
+_INICIO_TRAMAS = _INICIO_CONTADOR_TRAMAS + _CONTADOR.size
+TAMANO = _INICIO_TRAMAS + TRAMAS * _TRAMA.size
+
+# Banderas
+ESTABLE = 0x01
+NETO = 0x02
+CONECTADA = 0x04
+HAY_VALOR_ESTABLE = 0x08
+HAY_ESTABLE_DESDE = 0x10
+HAY_REINTENTO = 0x20
+HAY_LECTURA = 0x40
+
+
+def _texto(valor: bytes) -> str:
+    return valor.rstrip(b'\0').decode('utf-8', errors='replace')
+
+
+class EscritorMemoria:
+    """Lado del proceso de adquisición (único escritor)"""
+
+    def __init__(self, buffer):
+        self.buf = buffer
+        # Un proceso rearrancado sigue la secuencia del bloque (redondeada a par:
+        # el anterior pudo morir a mitad de una escritura) y sus contadores
+        secuencia, _, self._muestras = _CABECERA.unpack_from(self.buf, 0)
+        self._secuencia = secuencia + (secuencia & 1)
+        self._tramas = _CONTADOR.unpack_from(self.buf, _INICIO_CONTADOR_TRAMAS)[0]
+        _CABECERA.pack_into(self.buf, 0, self._secuencia, time.monotonic_ns(), self._muestras)
+
+    def _empezar(self):
+        self._secuencia += 1  # Impar: escritura en curso
+        _CABECERA.pack_into(self.buf, 0, self._secuencia, time.monotonic_ns(), self._muestras)
+
+    def _terminar(self):
+        self._secuencia += 1  # Par: datos consistentes
+        _CABECERA.pack_into(self.buf, 0, self._secuencia, time.monotonic_ns(), self._muestras)
+
+    def publicar(self, lectura: dict, estado: dict, asentamientos: int,
+                 muestra: Optional[tuple] = None, trama: Optional[bytes] = None):
+        """Escribe la lectura y el estado; opcionalmente agrega una muestra y una trama al anillo"""
+        banderas = 0
+        if lectura['estable']:
+            banderas |= ESTABLE
+        if lectura['neto']:
+            banderas |= NETO
+        if estado['conectada']:
+            banderas |= CONECTADA
+        if lectura['valor_estable'] is not None:
+            banderas |= HAY_VALOR_ESTABLE
+        if lectura['estable_desde'] is not None:
+            banderas |= HAY_ESTABLE_DESDE
+        if estado['proximo_reintento'] is not None:
+            banderas |= HAY_REINTENTO
+        if lectura['recibido_ns'] is not None:
+            banderas |= HAY_LECTURA
+
+        self._empezar()
+        try:
+            _LECTURA.pack_into(
+                self.buf, _INICIO_LECTURA,
+                lectura['peso'], lectura['peso_crudo'], lectura['timestamp'] or 0.0, lectura['recibido_ns'] or 0,
+                lectura['estable_desde'] or 0.0,
+                lectura['valor_estable'] if lectura['valor_estable'] is not None else 0.0,
+                estado['proximo_reintento'] or 0.0,
+                estado['tramas_recibidas'], estado['tramas_invalidas'], asentamientos, banderas,
+                (lectura['unidad'] or '').encode('utf-8')[:8],
+                (estado['estado'] or '').encode('utf-8')[:16],
+                (estado['ultimo_error'] or '').encode('utf-8', errors='replace')[:96])
+            if muestra is not None:
+                _MUESTRA.pack_into(self.buf, _INICIO_MUESTRAS + (self._muestras % MUESTRAS) * _MUESTRA.size,
+                                   *muestra)
+                self._muestras += 1
+            if trama is not None:
+                trama = trama[:62]
+                _TRAMA.pack_into(self.buf, _INICIO_TRAMAS + (self._tramas % TRAMAS) * _TRAMA.size,
+                                 len(trama), trama)
+                self._tramas += 1
+                _CONTADOR.pack_into(self.buf, _INICIO_CONTADOR_TRAMAS, self._tramas)
+        finally:
+            self._terminar()  # Aunque falle un pack_into, la secuencia vuelve a par
+
+    def limpiar_tramas(self):
+        """Vacía el anillo de tramas (log de la ventana de prueba)"""
+        self._empezar()
+        try:
+            self._tramas = 0
+            _CONTADOR.pack_into(self.buf, _INICIO_CONTADOR_TRAMAS, 0)
+        finally:
+            self._terminar()
+
+
+class LectorMemoria:
+    """Lado de la interfaz: copias consistentes sin bloquear al escritor"""
+
+    def __init__(self, buffer):
+        self.buf = buffer
+
+    def _copiar(self, funcion, si_falla):
+        """Ejecuta funcion() hasta obtener una copia sin escritura concurrente
+
+        Si no lo logra en ESPERA_MAXIMA (el escritor murió con la secuencia en
+        impar) devuelve si_falla(): la interfaz no se queda esperando.
+        """
+        limite = None
+        while True:
+            secuencia = _CABECERA.unpack_from(self.buf, 0)[0]
+            if not secuencia & 1:
+                resultado = funcion()
+                if _CABECERA.unpack_from(self.buf, 0)[0] == secuencia:
+                    return resultado
+            if limite is None:
+                limite = time.monotonic() + ESPERA_MAXIMA
+            elif time.monotonic() >= limite:
+                return si_falla()
+            time.sleep(0)  # El escritor está a mitad de camino
+
+    def cabecera(self) -> tuple:
+        """(secuencia, latido_ns, total de muestras)"""
+        return self._copiar(lambda: _CABECERA.unpack_from(self.buf, 0),
+                            lambda: _CABECERA.unpack_from(self.buf, 0))
+
+    def leer(self) -> dict:
+        """Última lectura y estado publicados"""
+        (peso, peso_crudo, timestamp, recibido_ns, estable_desde, valor_estable, proximo_reintento,
+         tramas, invalidas, asentamientos, banderas, unidad, estado, error), latido_ns = \
+            self._copiar(lambda: (_LECTURA.unpack_from(self.buf, _INICIO_LECTURA),
+                                  _CABECERA.unpack_from(self.buf, 0)[1]),
+                         self._desconectada)
+        hay_lectura = bool(banderas & HAY_LECTURA)
+        return {
+            'peso': peso,
+            'peso_crudo': peso_crudo,
+            'timestamp': timestamp if hay_lectura else None,
+            'recibido_ns': recibido_ns if hay_lectura else None,
+            'unidad': _texto(unidad) or 'kg',
+            'neto': bool(banderas & NETO),
+            'estable': bool(banderas & ESTABLE),
+            'estable_desde': estable_desde if banderas & HAY_ESTABLE_DESDE else None,
+            'valor_estable': valor_estable if banderas & HAY_VALOR_ESTABLE else None,
+            'conectada': bool(banderas & CONECTADA),
+            'estado': _texto(estado),
+            'proximo_reintento': proximo_reintento if banderas & HAY_REINTENTO else None,
+            'ultimo_error': _texto(error) or None,
+            'tramas_recibidas': tramas,
+            'tramas_invalidas': invalidas,
+            'asentamientos': asentamientos,
+            'latido_ns': latido_ns,
+        }
+
+    @staticmethod
+    def _desconectada() -> tuple:
+        """Lectura de reemplazo cuando el bloque quedó a mitad de una escritura"""
+        return ((0.0, 0.0, 0.0, 0, 0.0, 0.0, 0.0, 0, 0, 0, 0, b'kg', b'DESCONECTADA',
+                 'Memoria compartida sin actualizar'.encode('utf-8')), 0)
+
+    def muestras_desde(self, indice: int) -> tuple:
+        """Muestras (peso, recibido_ns, publicado_ns, banderas) posteriores a `indice`
+
+        Devuelve (muestras, nuevo índice). Si el lector se atrasó más que el anillo,
+        se pierden las más viejas.
+        """
+        def copiar():
+            total = _CABECERA.unpack_from(self.buf, 0)[2]
+            desde = max(indice, total - MUESTRAS)
+            return [_MUESTRA.unpack_from(self.buf, _INICIO_MUESTRAS + (i % MUESTRAS) * _MUESTRA.size)
+                    for i in range(desde, total)], total
+        return self._copiar(copiar, lambda: ([], indice))
+
+    def tramas(self) -> list:
+        """Tramas crudas recientes, de la más vieja a la más nueva"""
+        def copiar():
+            total = _CONTADOR.unpack_from(self.buf, _INICIO_CONTADOR_TRAMAS)[0]
+            resultado = []
+            for i in range(max(0, total - TRAMAS), total):
+                largo, datos = _TRAMA.unpack_from(self.buf, _INICIO_TRAMAS + (i % TRAMAS) * _TRAMA.size)
+                resultado.append(datos[:largo])
+            return resultado
+        return self._copiar(copiar, list)
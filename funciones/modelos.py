@@ -1,12 +1,13 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Set, Tuple
 
 class Fardo:
     """Modelo para representar un fardo"""
     
-    def __init__(self, numero: int, peso: float):
+    def __init__(self, numero: int, peso: float, peso_crudo: Optional[float] = None):
         self.numero = numero
-        self.peso = peso
+        self.peso = peso                # Peso filtrado (el que se registra)
+        self.peso_crudo = peso_crudo    # Lo que mandó la balanza al capturar (None si se tipeó)
         self.hora_pesaje = datetime.now()
     
     def __str__(self):
@@ -21,6 +22,11 @@ class Ticket:
         self.fardos: List[Fardo] = []
         self.observaciones: str = ""
         self.peso_bruto: Optional[float] = None
+        
+        # Cambios desde el último guardado (la base de datos escribe solo estos)
+        self.id_bd: Optional[int] = None     # tickets.id una vez guardado o cargado
+        self.fardos_modificados: Set[int] = set()
+        self.fardos_eliminados: Set[int] = set()
     
     def agregar_fardo(self, fardo: Fardo) -> None:
         """Agrega un fardo al ticket"""
@@ -30,16 +36,61 @@ class Ticket:
                 raise ValueError(f"Ya existe un fardo con el número {fardo.numero}")
         
         self.fardos.append(fardo)
+        self.fardos_modificados.add(fardo.numero)
+        self.fardos_eliminados.discard(fardo.numero)
+    
+    def repesar_fardo(self, numero_fardo: int, peso: float,
+                      peso_crudo: Optional[float] = None) -> Fardo:
+        """Reemplaza el peso de un fardo existente"""
+        fardo = self.obtener_fardo(numero_fardo)
+        if fardo is None:
+            raise ValueError(f"No se encontró un fardo con el número {numero_fardo}")
+        fardo.peso = peso
+        fardo.peso_crudo = peso_crudo
+        fardo.hora_pesaje = datetime.now()
+        self.fardos_modificados.add(numero_fardo)
+        return fardo
     
     def eliminar_fardo(self, numero_fardo: int) -> None:
         """Elimina un fardo del ticket por su número"""
         for i, fardo in enumerate(self.fardos):
             if fardo.numero == numero_fardo:
                 self.fardos.pop(i)
+                self.fardos_modificados.discard(numero_fardo)
+                self.fardos_eliminados.add(numero_fardo)
                 return
         
         raise ValueError(f"No se encontró un fardo con el número {numero_fardo}")
     
+    def obtener_fardo(self, numero_fardo: int) -> Optional[Fardo]:
+        """Fardo con ese número o None"""
+        for fardo in self.fardos:
+            if fardo.numero == numero_fardo:
+                return fardo
+        return None
+    
+    def tiene_cambios(self) -> bool:
+        """True si hay fardos sin guardar (o el ticket nunca se guardó)"""
+        return self.id_bd is None or bool(self.fardos_modificados or self.fardos_eliminados)
+    
+    def tomar_cambios(self) -> Tuple[Set[int], Set[int]]:
+        """Devuelve (modificados, eliminados) y los da por guardados
+
+        Si el guardado falla, devolver_cambios() los vuelve a marcar.
+        """
+        cambios = (self.fardos_modificados, self.fardos_eliminados)
+        self.fardos_modificados = set()
+        self.fardos_eliminados = set()
+        return cambios
+    
+    def devolver_cambios(self, cambios: Tuple[Set[int], Set[int]]) -> None:
+        """Vuelve a marcar los cambios de un guardado que falló"""
+        modificados, eliminados = cambios
+        presentes = {fardo.numero for fardo in self.fardos}
+        # Lo que cambió mientras tanto manda sobre lo devuelto
+        self.fardos_modificados |= (modificados | (eliminados & presentes)) - self.fardos_eliminados
+        self.fardos_eliminados |= (eliminados - presentes) - self.fardos_modificados
+    
     def obtener_peso_total(self) -> float:
         """Calcula el peso total de todos los fardos"""
         return sum(fardo.peso for fardo in self.fardos)
@@ -0,0 +1,169 @@
+"""
+Multiplexor de puertos serie
+Un único hilo atiende todas las balanzas configuradas: espera con `selectors`
+a que alguno de los descriptores tenga datos y entrega cada bloque a la
+ConexionBalanza dueña del puerto, que lo procesa y publica su propia
+instantánea. Así agregar una balanza (fardos, romaneo...) no agrega un hilo
+de lectura.
+
+Solo sirve para puertos con descriptor de archivo (Linux/macOS, pty del
+emulador). En Windows pyserial no expone fileno() y cada conexión sigue usando
+su propio hilo de lectura.
+"""
+import os
+import selectors
+import threading
+from typing import Callable, Optional
+
+
+class _Suscripcion:
+    """Puerto registrado y a quién avisarle"""
+
+    __slots__ = ('conexion', 'al_recibir', 'al_fallar')
+
+    def __init__(self, conexion, al_recibir, al_fallar):
+        self.conexion = conexion
+        self.al_recibir = al_recibir
+        self.al_fallar = al_fallar
+
+
+class MultiplexorSerie:
+    """Hilo único de E/S para varios puertos serie"""
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._operaciones = []           # Altas y bajas pendientes (las aplica el hilo de E/S)
+        self._hilo = None
+        self._activo = False
+
+        # Tubería para despertar al select() cuando cambian los puertos
+        self._despertar_r, self._despertar_w = os.pipe()
+        os.set_blocking(self._despertar_r, False)
+        os.set_blocking(self._despertar_w, False)
+        self._selector.register(self._despertar_r, selectors.EVENT_READ, None)
+
+    @staticmethod
+    def soporta(conexion) -> bool:
+        """True si el puerto tiene un descriptor que se puede vigilar con select"""
+        if os.name == 'nt':
+            return False
+        try:
+            return conexion.fileno() >= 0
+        except (AttributeError, OSError, ValueError):
+            return False
+
+    def registrar(self, conexion, al_recibir: Callable[[bytes], None],
+                  al_fallar: Callable[[Exception], None]):
+        """Empieza a vigilar el puerto; al_recibir corre en el hilo de E/S"""
+        self._encolar(('alta', conexion.fileno(), _Suscripcion(conexion, al_recibir, al_fallar)))
+        self.iniciar()
+
+    def quitar(self, conexion, esperar: bool = True):
+        """Deja de vigilar el puerto (esperando a que el hilo de E/S lo suelte)"""
+        try:
+            descriptor = conexion.fileno()
+        except (AttributeError, OSError, ValueError):
+            return
+        listo = threading.Event()
+        self._encolar(('baja', descriptor, listo))
+        if esperar and self._hilo is not threading.current_thread() and self._activo:
+            listo.wait(timeout=1.0)
+
+    def _encolar(self, operacion):
+        with self._lock:
+            self._operaciones.append(operacion)
+        try:
+            os.write(self._despertar_w, b'\0')
+        except BlockingIOError:
+            pass  # La tubería ya tiene avisos pendientes
+
+    def iniciar(self):
+        """Arranca el hilo de E/S si no está corriendo"""
+        with self._lock:
+            if self._activo:
+                return
+            self._activo = True
+            self._hilo = threading.Thread(target=self._bucle, name='multiplexor-serie')
+            self._hilo.daemon = True
+            self._hilo.start()
+
+    def detener(self):
+        """Detiene el hilo de E/S (los puertos quedan abiertos)"""
+        self._activo = False
+        self._encolar(('nada', None, None))
+        if self._hilo and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=2)
+        self._hilo = None
+
+    def _aplicar_operaciones(self):
+        with self._lock:
+            operaciones, self._operaciones = self._operaciones, []
+        for tipo, descriptor, dato in operaciones:
+            if tipo == 'alta':
+                try:
+                    self._selector.register(descriptor, selectors.EVENT_READ, dato)
+                except KeyError:
+                    self._selector.modify(descriptor, selectors.EVENT_READ, dato)
+                except (OSError, ValueError) as e:
+                    dato.al_fallar(e)
+            elif tipo == 'baja':
+                try:
+                    self._selector.unregister(descriptor)
+                except (KeyError, OSError, ValueError):
+                    pass
+                dato.set()
+
+    def _bucle(self):
+        while self._activo:
+            self._aplicar_operaciones()
+            try:
+                eventos = self._selector.select(timeout=1.0)
+            except OSError:
+                continue  # Un descriptor se cerró entre medio; la baja ya está en camino
+            for clave, _ in eventos:
+                suscripcion = clave.data
+                if suscripcion is None:
+                    try:
+                        while os.read(self._despertar_r, 512):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    conexion = suscripcion.conexion
+                    datos = conexion.read(conexion.in_waiting or 1)
+                except Exception as e:
+                    # Puerto caído: se suelta y la conexión decide si reconectar
+                    try:
+                        self._selector.unregister(clave.fd)
+                    except (KeyError, OSError, ValueError):
+                        pass
+                    suscripcion.al_fallar(e)
+                    continue
+                if datos:
+                    try:
+                        suscripcion.al_recibir(datos)
+                    except Exception as e:
+                        # Un error al procesar una balanza no puede dejar sin lectura a las otras
+                        print(f"⚠️ Error procesando datos de la balanza: {e}")
+        self._aplicar_operaciones()
+
+
+_multiplexor: Optional[MultiplexorSerie] = None
+_lock_global = threading.Lock()
+
+
+def obtener_multiplexor() -> Optional[MultiplexorSerie]:
+    """Multiplexor compartido por todas las balanzas del proceso (None en Windows)
+
+    En Windows select() no acepta puertos ni tuberías, y os.set_blocking() sobre
+    una tubería no existe antes de Python 3.12.
+    """
+    global _multiplexor
+    if os.name == 'nt':
+        return None
+    with _lock_global:
+        if _multiplexor is None:
+            _multiplexor = MultiplexorSerie()
+        return _multiplexor
@@ -0,0 +1,264 @@
+"""
+Adquisición de la balanza en un proceso aparte
+Con BALANZA_CONFIG['proceso_separado'] la ConexionBalanza corre en otro proceso
+(multiprocessing, arranque 'spawn' para que funcione igual en Windows). Ese
+proceso publica la última lectura, el estado de conexión, un anillo de muestras
+y las tramas recientes en memoria compartida (ver memoria_balanza.py); la
+interfaz los lee sin llamadas al sistema. Un guardado largo o una exportación
+a PDF ya no frenan la lectura del peso, ni el GIL ni el bucle de Tk.
+
+BalanzaProceso ofrece a la interfaz los mismos métodos que ConexionBalanza.
+Las órdenes (cambiar configuración, limpiar el log, cerrar) viajan por una cola.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Optional
+
+import serial.tools.list_ports
+
+from config.configuracion import BALANZA_CONFIG
+from funciones.latencia import MedidorLatencia
+from funciones.memoria_balanza import TAMANO, EscritorMemoria, LectorMemoria, ESTABLE
+
+try:
+    from multiprocessing import shared_memory  # Python 3.8+
+except ImportError:
+    shared_memory = None
+
+
+def crear_balanza(configuracion: dict = None):
+    """ConexionBalanza en este proceso o BalanzaProceso, según 'proceso_separado'"""
+    completa = dict(BALANZA_CONFIG)
+    if configuracion:
+        completa.update(configuracion)
+    if completa.get('proceso_separado', False):
+        if shared_memory is not None:
+            return BalanzaProceso(configuracion)
+        print("⚠️ Esta versión de Python no tiene memoria compartida: la balanza se lee en este proceso")
+    from funciones.conexion_balanza import ConexionBalanza
+    return ConexionBalanza(configuracion=configuracion)
+
+
+def _principal(nombre_memoria, configuracion, ordenes, respuestas):
+    """Cuerpo del proceso de adquisición"""
+    from funciones.conexion_balanza import ConexionBalanza
+
+    memoria = shared_memory.SharedMemory(name=nombre_memoria)
+    escritor = EscritorMemoria(memoria.buf)
+    lock = threading.Lock()  # Escriben el hilo de lectura y el bucle de órdenes: uno a la vez
+    balanza = ConexionBalanza(configuracion=configuracion)
+
+    def publicar(trama=None, lectura=None, timestamp=None):
+        with lock:
+            instantanea = balanza.obtener_lectura()
+            muestra = None
+            if lectura is not None:
+                banderas = ESTABLE if instantanea['estable'] else 0
+                muestra = (lectura.peso, instantanea['recibido_ns'] or 0,
+                           time.monotonic_ns(), banderas)
+            escritor.publicar(instantanea, balanza.obtener_estado(),
+                              balanza.estabilidad.asentamientos, muestra, trama)
+
+    balanza.observadores.append(publicar)
+    padre = multiprocessing.parent_process()
+    try:
+        while True:
+            try:
+                orden, argumentos = ordenes.get(timeout=0.1)
+            except queue.Empty:
+                orden = None
+            if orden == 'cerrar':
+                break
+            elif orden == 'configurar':
+                respuestas.put(balanza.cambiar_configuracion(**argumentos))
+            elif orden == 'limpiar_tramas':
+                balanza.limpiar_datos_recibidos()
+                with lock:
+                    escritor.limpiar_tramas()
+
+            # Latido y estado de conexión aunque no lleguen tramas
+            publicar()
+            if padre is not None and not padre.is_alive():
+                break  # La aplicación se cerró sin avisar
+    finally:
+        balanza.cerrar()
+        memoria.close()
+
+
+class BalanzaProceso:
+    """Interfaz de ConexionBalanza para una balanza leída en otro proceso"""
+
+    def __init__(self, configuracion: dict = None):
+        self.config = dict(BALANZA_CONFIG)
+        if configuracion:
+            self.config.update(configuracion)
+        # El proceso hijo abre la balanza en el mismo proceso (no vuelve a separar)
+        self.config['proceso_separado'] = False
+        self.nombre = self.config.get('nombre', 'Fardos')
+        self.rol = self.config.get('rol', 'fardos')
+        self.puerto = self.config.get('puerto_serie', 'COM1')
+        self.baudrate = self.config.get('baudrate', 9600)
+        self.timeout = self.config.get('timeout', 1)
+        self.protocolo = self.config.get('protocolo', 'CONTINUO')
+        self.activar_dtr = self.config.get('activar_dtr', True)
+        self.activar_rts = self.config.get('activar_rts', True)
+
+        # Latencias medidas del lado de la interfaz (publicado, mostrado, capturado)
+        self.latencia = MedidorLatencia()
+        self._indice_muestras = 0
+        self._ultimo_evento = None
+        self._cerrando = False
+
+        self._contexto = multiprocessing.get_context('spawn')
+        self.memoria = shared_memory.SharedMemory(create=True, size=TAMANO)
+        self.lector = LectorMemoria(self.memoria.buf)
+        self.proceso = None
+        self._iniciar_proceso()
+
+    def _iniciar_proceso(self):
+        """Arranca (o rearranca) el proceso de adquisición"""
+        self._ordenes = self._contexto.Queue()
+        self._respuestas = self._contexto.Queue()
+        self.proceso = self._contexto.Process(
+            target=_principal,
+            args=(self.memoria.name, self.config, self._ordenes, self._respuestas),
+            name=f"adquisicion-{self.rol}", daemon=True)
+        self.proceso.start()
+        print(f"⚙️ Adquisición de la balanza {self.nombre} en proceso aparte (pid {self.proceso.pid})")
+
+    def _vigilar_proceso(self):
+        """Rearranca el proceso de adquisición si murió (lo llama cualquier lectura)"""
+        if not self._cerrando and not self.proceso.is_alive():
+            print(f"⚠️ El proceso de adquisición terminó (código {self.proceso.exitcode}), reiniciando")
+            self._iniciar_proceso()
+
+    def _absorber_muestras(self):
+        """Pasa al medidor local las lecturas publicadas desde la última consulta"""
+        muestras, self._indice_muestras = self.lector.muestras_desde(self._indice_muestras)
+        for _, recibido_ns, publicado_ns, _ in muestras:
+            self.latencia.registrar_publicada(recibido_ns, publicado_ns)
+
+    @property
+    def conectada(self) -> bool:
+        self._vigilar_proceso()
+        return self.lector.leer()['conectada'] and self.proceso.is_alive()
+
+    def obtener_peso(self) -> float:
+        self._vigilar_proceso()
+        return self.lector.leer()['peso']
+
+    def obtener_lectura(self) -> dict:
+        """Última lectura publicada por el proceso de adquisición"""
+        self._vigilar_proceso()
+        datos = self.lector.leer()
+        self._absorber_muestras()
+        return {
+            'peso': datos['peso'],
+            'peso_crudo': datos['peso_crudo'],
+            'timestamp': datos['timestamp'],
+            'recibido_ns': datos['recibido_ns'],
+            'unidad': datos['unidad'],
+            'neto': datos['neto'],
+            'estable': datos['estable'] and datos['conectada'],
+            'estable_desde': datos['estable_desde'],
+            'valor_estable': datos['valor_estable'],
+        }
+
+    def esperar_lectura_nueva(self, timeout: float = 1.0) -> Optional[dict]:
+        """Como ConexionBalanza.esperar_lectura_nueva (consulta la memoria cada 5 ms)"""
+        total = self.lector.cabecera()[2]
+        limite = time.monotonic() + timeout
+        while self.lector.cabecera()[2] == total:
+            if time.monotonic() >= limite:
+                return None
+            time.sleep(0.005)
+        return self.obtener_lectura()
+
+    def obtener_estado(self) -> dict:
+        """Mismo formato que ConexionBalanza.obtener_estado"""
+        self._vigilar_proceso()
+        datos = self.lector.leer()
+        vivo = self.proceso is not None and self.proceso.is_alive()
+        estado = {
+            'conectada': datos['conectada'] and vivo,
+            'estado': (datos['estado'] or 'CONECTANDO') if vivo else 'DESCONECTADA',
+            'proximo_reintento': datos['proximo_reintento'],
+            'puerto': self.puerto,
+            'baudrate': self.baudrate,
+            'protocolo': self.protocolo,
+            'peso_actual': datos['peso'],
+            'ultimo_error': datos['ultimo_error'] if vivo else "Proceso de adquisición detenido",
+            'dtr': self.activar_dtr,
+            'rts': self.activar_rts,
+            'tramas_recibidas': datos['tramas_recibidas'],
+            'tramas_invalidas': datos['tramas_invalidas'],
+            'grabando': self.config.get('grabar_captura', False),
+            'sondeo': None,
+            'pid': self.proceso.pid if vivo else None,
+        }
+        if datos['latido_ns']:
+            estado['latido_s'] = (time.monotonic_ns() - datos['latido_ns']) / 1e9
+        return estado
+
+    def obtener_eventos_estado(self) -> list:
+        """Cambios de estado desde la última consulta (y rearranque si el proceso murió)"""
+        estado = self.obtener_estado()
+        clave = (estado['estado'], estado['proximo_reintento'])
+        if clave == self._ultimo_evento:
+            return []
+        self._ultimo_evento = clave
+        return [estado]
+
+    def obtener_datos_recibidos(self):
+        """Tramas recientes (log de la ventana de prueba)"""
+        return [trama.decode('ascii', errors='replace').strip() for trama in self.lector.tramas()]
+
+    def limpiar_datos_recibidos(self):
+        self._ordenes.put(('limpiar_tramas', None))
+
+    def obtener_puertos_disponibles(self):
+        """Obtiene puertos COM disponibles"""
+        try:
+            return [{
+                'puerto': port.device,
+                'descripcion': port.description,
+                'fabricante': port.manufacturer or 'Desconocido'
+            } for port in serial.tools.list_ports.comports()]
+        except Exception:
+            return []
+
+    def cambiar_configuracion(self, puerto=None, baudrate=None, protocolo=None,
+                              activar_dtr=None, activar_rts=None, timeout=None):
+        """Reconfigura la balanza en el proceso de adquisición y espera el resultado"""
+        argumentos = {'puerto': puerto, 'baudrate': baudrate, 'protocolo': protocolo,
+                      'activar_dtr': activar_dtr, 'activar_rts': activar_rts, 'timeout': timeout}
+        for nombre, valor in argumentos.items():
+            if valor is not None:
+                setattr(self, nombre, valor)
+        # Un rearranque del proceso debe conservar la nueva configuración
+        self.config.update({'puerto_serie': self.puerto, 'baudrate': self.baudrate,
+                            'protocolo': self.protocolo, 'activar_dtr': self.activar_dtr,
+                            'activar_rts': self.activar_rts, 'timeout': self.timeout})
+        self._ordenes.put(('configurar', argumentos))
+        try:
+            return self._respuestas.get(timeout=self.timeout + 5)
+        except queue.Empty:
+            return False
+
+    def cerrar(self):
+        """Detiene el proceso de adquisición y libera la memoria compartida"""
+        self._cerrando = True
+        if self.proceso and self.proceso.is_alive():
+            self._ordenes.put(('cerrar', None))
+            self.proceso.join(timeout=3)
+            if self.proceso.is_alive():
+                self.proceso.terminate()
+                self.proceso.join(timeout=1)
+        self.lector = None
+        try:
+            self.memoria.close()
+            self.memoria.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
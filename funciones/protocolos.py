@@ -0,0 +1,326 @@
+"""
+Decodificadores de protocolos de balanza
+Cada protocolo conocido por el detector tiene su clase; BALANZA_CONFIG['protocolo']
+elige cuál se usa, así no se corre una cadena genérica de expresiones en cada trama.
+codificar() hace el camino inverso y lo usa el emulador de balanza.
+"""
+import re
+from typing import Optional
+
+# Factores para llevar cada unidad a kg
+FACTORES_UNIDAD = {
+    b'kg': 1.0,
+    b'g': 0.001,
+    b'lb': 0.453592,
+    b't': 1000.0,
+}
+
+# Patrones precompilados (solo se usan cuando el formato no es de posición fija)
+_PATRON_PESO = re.compile(rb'([-+]?)\s*(\d*\.?\d+)\s*(kg|g|lb|t)?', re.IGNORECASE)
+_PATRON_OHAUS = re.compile(rb'([-+]?)\s*(\d*\.?\d+)\s*([a-zA-Z]+)?\s*(\?)?\s*([GNT])?')
+
+_LETRAS = b'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ '
+
+
+class Lectura:
+    """Lectura decodificada de una trama de balanza (peso siempre en kg)"""
+
+    __slots__ = ('peso', 'unidad', 'estable', 'neto')
+
+    def __init__(self, peso: float, unidad: str = 'kg',
+                 estable: Optional[bool] = None, neto: bool = False):
+        self.peso = peso
+        self.unidad = unidad        # Unidad tal como la informa la balanza
+        self.estable = estable      # None si el protocolo no informa estabilidad
+        self.neto = neto            # True = neto, False = bruto
+
+    def __repr__(self):
+        estado = {True: 'estable', False: 'movimiento', None: 'sin dato'}[self.estable]
+        tipo = 'neto' if self.neto else 'bruto'
+        return f"Lectura({self.peso} kg, {self.unidad}, {estado}, {tipo})"
+
+
+def _convertir(signo: bytes, numero: bytes, unidad: Optional[bytes]) -> Optional[tuple]:
+    """Convierte los grupos de un patrón de peso a (kg, unidad)"""
+    try:
+        valor = float(numero)
+    except ValueError:
+        return None
+    if signo == b'-':
+        valor = -valor
+    if unidad:
+        unidad = unidad.lower()
+        valor *= FACTORES_UNIDAD.get(unidad, 1.0)
+        return valor, unidad.decode('ascii')
+    return valor, 'kg'
+
+
+class DecodificadorBase:
+    """Decodificador genérico: primer número de la trama, con unidad opcional"""
+
+    nombre = 'BASE'
+    descripcion = 'Decodificador genérico'
+    comando = b''  # Comando de solicitud de peso (vacío = la balanza transmite sola)
+    firma = None   # Patrón que identifica las tramas del protocolo (detector pasivo)
+    en_cola = 1    # Pedidos que la balanza acepta sin haber respondido el anterior
+
+    def decodificar(self, trama: bytes) -> Optional[Lectura]:
+        """Devuelve la lectura contenida en la trama o None si no se reconoce"""
+        match = _PATRON_PESO.search(trama)
+        if not match:
+            return None
+        resultado = _convertir(match.group(1), match.group(2), match.group(3))
+        if resultado is None:
+            return None
+
+        # Muchas balanzas anteponen ST (estable) / US (inestable) aunque no sean A&D
+        cabecera = trama[:2]
+        if cabecera == b'ST':
+            estable = True
+        elif cabecera == b'US':
+            estable = False
+        else:
+            estable = None
+        return Lectura(resultado[0], resultado[1], estable)
+
+    def codificar(self, peso: float, estable: bool = True, neto: bool = False) -> bytes:
+        """Arma una trama (sin terminador) con el peso en kg"""
+        cabecera = 'ST' if estable else 'US'
+        return f"{cabecera},{peso:+09.2f}kg".encode('ascii')
+
+
+class DecodificadorContinuo(DecodificadorBase):
+    """Balanzas de salida continua sin formato conocido"""
+
+    nombre = 'CONTINUO'
+    descripcion = 'Lectura continua (sin comando)'
+
+
+class DecodificadorEstandar(DecodificadorBase):
+    """Balanzas que responden al comando P"""
+
+    nombre = 'ESTANDAR'
+    descripcion = 'Comando P estándar'
+    comando = b'P\r\n'
+
+
+class DecodificadorAND(DecodificadorBase):
+    """Formato A&D: 'ST,GS,+0012.34  kg' (cabecera, tipo, dato y unidad)"""
+
+    nombre = 'AND'
+    descripcion = 'Protocolo AND'
+    comando = b'Q\r\n'
+    firma = re.compile(rb'^\s*(ST|US|OL),(GS|NT|TR),[+-]')
+
+    def decodificar(self, trama: bytes) -> Optional[Lectura]:
+        trama = trama.strip()
+        if len(trama) < 7 or trama[2:3] != b',' or trama[5:6] != b',':
+            return DecodificadorBase.decodificar(self, trama)
+
+        cabecera = trama[:2]
+        if cabecera == b'OL':  # Sobrecarga: el dato no es un peso
+            return None
+
+        # El dato es el último campo (algunos equipos agregan un campo de ID)
+        cuerpo = trama[trama.rfind(b',') + 1:]
+        numero = cuerpo.rstrip(_LETRAS)
+        unidad = cuerpo[len(numero):].strip()
+        try:
+            valor = float(numero)
+        except ValueError:
+            try:
+                # Formato con espacios entre signo y número: '+   12.34'
+                valor = float(numero.replace(b' ', b''))
+            except ValueError:
+                return None
+
+        if unidad:
+            unidad = unidad.lower()
+            valor *= FACTORES_UNIDAD.get(unidad, 1.0)
+            unidad = unidad.decode('ascii')
+        else:
+            unidad = 'kg'
+
+        return Lectura(valor, unidad, cabecera == b'ST', trama[3:5] == b'NT')
+
+    def codificar(self, peso: float, estable: bool = True, neto: bool = False) -> bytes:
+        cabecera = 'ST' if estable else 'US'
+        tipo = 'NT' if neto else 'GS'
+        return f"{cabecera},{tipo},{peso:+08.2f}kg".encode('ascii')
+
+
+class DecodificadorGama(DecodificadorAND):
+    """Balanza GAMA D2002E: formato A&D en salida continua ('ST,GS,+000000' = sin peso)"""
+
+    nombre = 'GAMA'
+    descripcion = 'Protocolo GAMA'
+    comando = b'\r\n'
+
+    def __init__(self):
+        # Estado de la última trama reconocida: True con la plataforma vacía
+        self.sin_peso = False
+
+    def decodificar(self, trama: bytes) -> Optional[Lectura]:
+        lectura = DecodificadorAND.decodificar(self, trama)
+        if lectura is not None:
+            self.sin_peso = bool(lectura.estable) and not lectura.neto and lectura.peso == 0
+        return lectura
+
+
+class DecodificadorCAS(DecodificadorAND):
+    """CAS: mismo esquema de campos que A&D ('ST,GS,  12.34kg')"""
+
+    nombre = 'CAS'
+    descripcion = 'Protocolo CAS'
+    comando = b'R\r\n'
+    firma = re.compile(rb'^\s*(ST|US|OL),(GS|NT),[ \d]')
+
+    def codificar(self, peso: float, estable: bool = True, neto: bool = False) -> bytes:
+        cabecera = 'ST' if estable else 'US'
+        tipo = 'NT' if neto else 'GS'
+        return f"{cabecera},{tipo},{peso:8.2f}kg".encode('ascii')
+
+
+class DecodificadorToledo(DecodificadorBase):
+    """Mettler Toledo continuo: STX SWA SWB SWC PPPPPP TTTTTT"""
+
+    nombre = 'TOLEDO'
+    descripcion = 'Protocolo Toledo'
+    comando = b'W\r\n'
+    firma = re.compile(rb'\x02[\x20-\x7f]{3}[\d ]{6}')
+
+    def decodificar(self, trama: bytes) -> Optional[Lectura]:
+        inicio = trama.find(b'\x02')
+        if inicio == -1 or len(trama) - inicio < 10:
+            # Respuesta al comando W sin trama de estado
+            return DecodificadorBase.decodificar(self, trama)
+
+        swa = trama[inicio + 1]
+        swb = trama[inicio + 2]
+        try:
+            crudo = int(trama[inicio + 4:inicio + 10])
+        except ValueError:
+            return None
+
+        # SWA bits 0-2: posición del punto decimal (2 = sin decimales)
+        valor = crudo * (10.0 ** (2 - (swa & 0x07)))
+        if swb & 0x02:          # Bit 1: signo negativo
+            valor = -valor
+        if swb & 0x04:          # Bit 2: fuera de rango
+            return None
+
+        if swb & 0x10:          # Bit 4: kg (0 = lb)
+            unidad = 'kg'
+        else:
+            unidad = 'lb'
+            valor *= FACTORES_UNIDAD[b'lb']
+
+        return Lectura(valor, unidad, not (swb & 0x08), bool(swb & 0x01))
+
+    def codificar(self, peso: float, estable: bool = True, neto: bool = False) -> bytes:
+        swa = 0x20 | 0x04           # Dos decimales
+        swb = 0x20 | 0x10           # kg
+        if peso < 0:
+            swb |= 0x02
+        if not estable:
+            swb |= 0x08
+        if neto:
+            swb |= 0x01
+        crudo = min(round(abs(peso) * 100), 999999)
+        return bytes((0x02, swa, swb, 0x20)) + f"{crudo:06d}000000".encode('ascii')
+
+
+class DecodificadorMettler(DecodificadorBase):
+    """Mettler SICS: 'S S      12.34 kg' (S = estable, D = dinámico)"""
+
+    nombre = 'METTLER'
+    descripcion = 'Protocolo Mettler'
+    comando = b'S\r\n'
+    firma = re.compile(rb'^\s*S [SD] +[-+]?\d')
+    en_cola = 2    # MT-SICS encola los comandos y responde en orden
+
+    def decodificar(self, trama: bytes) -> Optional[Lectura]:
+        trama = trama.strip()
+        if trama[:1] != b'S' or trama[1:2] != b' ':
+            return DecodificadorBase.decodificar(self, trama)
+
+        estado = trama[2:3]
+        if estado not in (b'S', b'D'):  # I = ocupada, +/- = sobrecarga
+            return None
+
+        partes = trama[3:].split()
+        if not partes:
+            return None
+        try:
+            valor = float(partes[0])
+        except ValueError:
+            return None
+
+        unidad = partes[1].lower() if len(partes) > 1 else b'kg'
+        valor *= FACTORES_UNIDAD.get(unidad, 1.0)
+        return Lectura(valor, unidad.decode('ascii'), estado == b'S')
+
+    def codificar(self, peso: float, estable: bool = True, neto: bool = False) -> bytes:
+        estado = 'S' if estable else 'D'
+        return f"S {estado} {peso:10.2f} kg".encode('ascii')
+
+
+class DecodificadorOhaus(DecodificadorBase):
+    """Ohaus: '     12.34 kg ?  N' ('?' = inestable, N = neto)"""
+
+    nombre = 'OHAUS'
+    descripcion = 'Protocolo Ohaus'
+    comando = b'IP\r\n'
+    firma = re.compile(rb'^\s*[-+]?\d+\.\d+ +(kg|g|lb|t)( +\?)? +[GNT]\s*$', re.IGNORECASE)
+
+    def decodificar(self, trama: bytes) -> Optional[Lectura]:
+        match = _PATRON_OHAUS.search(trama)
+        if not match:
+            return None
+        resultado = _convertir(match.group(1), match.group(2), match.group(3))
+        if resultado is None:
+            return None
+        return Lectura(resultado[0], resultado[1],
+                       match.group(4) is None, match.group(5) == b'N')
+
+    def codificar(self, peso: float, estable: bool = True, neto: bool = False) -> bytes:
+        inestable = '' if estable else ' ?'
+        tipo = 'N' if neto else 'G'
+        return f"{peso:10.2f} kg{inestable} {tipo}".encode('ascii')
+
+
+class DecodificadorDibal(DecodificadorBase):
+    """Dibal: respuesta numérica al comando P"""
+
+    nombre = 'DIBAL'
+    descripcion = 'Protocolo Dibal'
+    comando = b'P\r'
+
+
+class DecodificadorDigi(DecodificadorBase):
+    """Digi: respuesta numérica al comando W"""
+
+    nombre = 'DIGI'
+    descripcion = 'Protocolo Digi'
+    comando = b'W'
+
+
+# Registro de protocolos disponibles (mismas claves que BALANZA_CONFIG['protocolo'])
+PROTOCOLOS = {
+    'CONTINUO': DecodificadorContinuo,
+    'ESTANDAR': DecodificadorEstandar,
+    'TOLEDO': DecodificadorToledo,
+    'AND': DecodificadorAND,
+    'OHAUS': DecodificadorOhaus,
+    'METTLER': DecodificadorMettler,
+    'CAS': DecodificadorCAS,
+    'DIBAL': DecodificadorDibal,
+    'DIGI': DecodificadorDigi,
+    'GAMA': DecodificadorGama,
+}
+
+
+def obtener_decodificador(protocolo: str) -> DecodificadorBase:
+    """Crea el decodificador del protocolo indicado (CONTINUO si no se conoce)"""
+    clase = PROTOCOLOS.get((protocolo or '').upper(), DecodificadorContinuo)
+    return clase()
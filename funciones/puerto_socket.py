@@ -0,0 +1,122 @@
+"""
+Puerto de balanza sobre un socket (tcp://host:puerto o unix:///ruta)
+Se comporta como serial.Serial en lo que usa ConexionBalanza (read, write,
+in_waiting, fileno, close) para leer la balanza a través del broker
+(utils/broker_balanza.py) en lugar de abrir el puerto serie directamente.
+"""
+import select
+import socket
+from urllib.parse import urlparse
+
+import serial
+
+ESQUEMAS = ('tcp://', 'unix://')
+
+
+def es_url_socket(puerto) -> bool:
+    """True si el puerto configurado apunta a un broker y no a un puerto serie"""
+    return isinstance(puerto, str) and puerto.lower().startswith(ESQUEMAS)
+
+
+def abrir_socket(url: str, timeout: float = None) -> socket.socket:
+    """Conecta al destino de una URL tcp:// o unix://"""
+    destino = urlparse(url)
+    if destino.scheme == 'tcp':
+        if not destino.hostname or not destino.port:
+            raise ValueError(f"URL inválida (se espera tcp://host:puerto): {url}")
+        sock = socket.create_connection((destino.hostname, destino.port), timeout=timeout or 5)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock
+    if destino.scheme == 'unix':
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout or 5)
+        sock.connect(destino.path)
+        return sock
+    raise ValueError(f"Esquema no soportado: {url}")
+
+
+class PuertoSocket:
+    """Conexión a un broker de balanza con la interfaz mínima de serial.Serial"""
+
+    def __init__(self, url: str, timeout: float = 1.0):
+        self.port = url
+        self.timeout = timeout
+        self._buffer = bytearray()
+        try:
+            self._sock = abrir_socket(url, timeout)
+        except OSError as e:
+            raise serial.SerialException(f"No se pudo conectar a {url}: {e}")
+        self._sock.setblocking(False)
+        self.is_open = True
+
+    def fileno(self) -> int:
+        return self._sock.fileno()
+
+    def _llenar(self, espera: float):
+        """Pasa al buffer lo que haya en el socket (esperando hasta `espera` segundos)"""
+        listos, _, _ = select.select([self._sock], [], [], espera)
+        if not listos:
+            return
+        try:
+            datos = self._sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            raise serial.SerialException(f"Conexión con el broker perdida: {e}")
+        if not datos:
+            raise serial.SerialException("El broker cerró la conexión")
+        self._buffer += datos
+
+    @property
+    def in_waiting(self) -> int:
+        if not self._buffer:
+            self._llenar(0)
+        return len(self._buffer)
+
+    def read(self, size: int = 1) -> bytes:
+        """Hasta `size` bytes; sin datos espera como mucho el timeout"""
+        if not self._buffer:
+            self._llenar(self.timeout if self.timeout is not None else None)
+        datos = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return datos
+
+    def write(self, datos: bytes) -> int:
+        try:
+            self._sock.sendall(datos)
+        except BlockingIOError:
+            # Buffer del socket lleno: un pedido perdido lo repite el sondeo
+            return 0
+        except OSError as e:
+            raise serial.SerialException(f"Conexión con el broker perdida: {e}")
+        return len(datos)
+
+    def reset_input_buffer(self):
+        self._buffer.clear()
+
+    def reset_output_buffer(self):
+        pass
+
+    # Un socket no tiene líneas de control
+    def setDTR(self, valor=True):
+        pass
+
+    def setRTS(self, valor=True):
+        pass
+
+    def cancel_read(self):
+        pass  # read() nunca bloquea más que el timeout
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
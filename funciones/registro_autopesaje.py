@@ -0,0 +1,64 @@
+import os
+import csv
+import time
+from collections import deque
+from datetime import datetime
+from config.configuracion import AUTOPESAJE_CONFIG, EXPORTACION_CONFIG
+
+class RegistroAutopesaje:
+    """Registro de capturas y rechazos del auto-pesaje para auditar el rendimiento"""
+
+    def __init__(self):
+        self.carpeta = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                    AUTOPESAJE_CONFIG['carpeta_registro'])
+        self.separador_csv = EXPORTACION_CONFIG['separador_csv']
+        self.encoding = EXPORTACION_CONFIG['encoding']
+        self.eventos = deque(maxlen=500)
+        self.capturas = deque()  # Horas (time.time) de las capturas de la última hora
+
+        if not os.path.exists(self.carpeta):
+            os.makedirs(self.carpeta)
+
+    def _ruta_archivo(self) -> str:
+        """Un archivo por día"""
+        return os.path.join(self.carpeta, f"autopesaje_{datetime.now().strftime('%Y%m%d')}.csv")
+
+    def registrar_captura(self, ticket: str, numero_fardo: int, peso: float):
+        """Registra un fardo capturado automáticamente"""
+        self.capturas.append(time.time())
+        self._registrar('CAPTURA', ticket, numero_fardo, peso, '')
+
+    def registrar_rechazo(self, ticket: str, numero_fardo, peso: float, motivo: str):
+        """Registra una carga que no se pudo capturar"""
+        self._registrar('RECHAZO', ticket, numero_fardo, peso, motivo)
+
+    def _registrar(self, evento, ticket, numero_fardo, peso, motivo):
+        """Agrega el evento a memoria y al archivo CSV del día"""
+        ahora = datetime.now()
+        fila = [ahora.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3], evento, ticket,
+                numero_fardo if numero_fardo is not None else '',
+                f"{peso:.2f}", motivo]
+        self.eventos.append(fila)
+
+        try:
+            ruta = self._ruta_archivo()
+            nuevo = not os.path.exists(ruta)
+            with open(ruta, 'a', newline='', encoding=self.encoding) as archivo:
+                writer = csv.writer(archivo, delimiter=self.separador_csv)
+                if nuevo:
+                    writer.writerow(['Fecha y hora', 'Evento', 'Ticket', 'N° Fardo',
+                                     'Peso (kg)', 'Motivo'])
+                writer.writerow(fila)
+        except Exception as e:
+            print(f"⚠️ Error al escribir registro de auto-pesaje: {e}")
+
+    def fardos_por_hora(self) -> int:
+        """Cantidad de capturas en la última hora"""
+        limite = time.time() - 3600
+        while self.capturas and self.capturas[0] < limite:
+            self.capturas.popleft()
+        return len(self.capturas)
+
+    def obtener_eventos(self) -> list:
+        """Devuelve los últimos eventos registrados"""
+        return list(self.eventos)
@@ -0,0 +1,17 @@
+"""
+Relojes en nanosegundos
+time.monotonic_ns() y time.time_ns() existen desde Python 3.7, y las PCs de
+pesaje pueden tener 3.6. Ahí se calculan desde los relojes en float (resolución
+de microsegundos, de sobra para las tramas de una balanza).
+"""
+import time
+
+try:
+    monotonic_ns = time.monotonic_ns
+    time_ns = time.time_ns
+except AttributeError:  # Python 3.6
+    def monotonic_ns() -> int:
+        return int(time.monotonic() * 1e9)
+
+    def time_ns() -> int:
+        return int(time.time() * 1e9)
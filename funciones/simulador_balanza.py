@@ -1,224 +1,279 @@
-import serial
-import serial.tools.list_ports
+"""
+Emulador de balanza sobre un pseudo-terminal (solo Linux)
+Crea un /dev/pts/N y transmite tramas del protocolo elegido a la velocidad real
+del cable, con ciclos de fardo (sube, se asienta, queda estable y se retira),
+ruido, deriva del cero y fallas inyectadas. La aplicación, el detector y las
+pruebas de rendimiento lo abren como si fuera el puerto de una balanza real.
+"""
+import os
+import random
+import select
+import threading
 import time
-import re
-from config.configuracion import BALANZA_CONFIG
-
-class ConexionBalanza:
-    """Clase modular para manejar cualquier balanza"""
-
-    def __init__(self):
-        self.conexion = None
-        self.peso_actual = 0.0
-        self.peso_anterior = None  # Para detectar cambios
-        self.conectada = False
-        self.ultimo_error = None
-        self.buffer = ""
-        self.datos_recibidos = []
-        self.max_datos_log = 50
-        
-        # Cargar configuración
-        self.cargar_configuracion()
-        
-        # Intentar conectar (sin tirar error si falla)
-        self.intentar_conexion()
-
-    def cargar_configuracion(self):
-        """Carga la configuración desde BALANZA_CONFIG"""
-        self.puerto = BALANZA_CONFIG.get('puerto_serie', 'COM1')
-        self.baudrate = BALANZA_CONFIG.get('baudrate', 9600)
-        self.timeout = BALANZA_CONFIG.get('timeout', 1)
-        self.protocolo = BALANZA_CONFIG.get('protocolo', 'CONTINUO')
-        self.activar_dtr = BALANZA_CONFIG.get('activar_dtr', True)
-        self.activar_rts = BALANZA_CONFIG.get('activar_rts', True)
-
-    def intentar_conexion(self):
-        """Intenta conectar con la balanza SIN tirar error si falla"""
-        try:
-            if self.conexion and self.conexion.is_open:
-                self.conexion.close()
-                
-            # EXACTAMENTE como tu función
-            self.conexion = serial.Serial(
-                port=self.puerto,
-                baudrate=self.baudrate,
-                bytesize=serial.EIGHTBITS,
-                parity=serial.PARITY_NONE,
-                stopbits=serial.STOPBITS_ONE,
-                timeout=self.timeout,
-                xonxoff=False,      # Soft handshake OFF
-                rtscts=False,       # RTS/CTS OFF (hardware handshake OFF)
-                dsrdtr=False        # DSR/DTR OFF
-            )
-
-            # Activar DTR y RTS manualmente - EXACTAMENTE como tu función
-            self.conexion.setDTR(True)
-            self.conexion.setRTS(True)
-            
-            self.conectada = True
-            self.ultimo_error = None
-            print(f"✅ Balanza conectada: {self.puerto} @ {self.baudrate} bps")
-            
-        except Exception as e:
-            self.conexion = None
-            self.conectada = False
-            self.ultimo_error = str(e)
-            print(f"⚠️ Balanza no disponible: {self.puerto} - {str(e)}")
-
-    def extraer_peso(self, texto):
-        """Extrae el valor numérico del peso del texto recibido - EXACTAMENTE tu función"""
-        # Buscar números con posibles decimales
-        match = re.search(r'[-+]?\d*\.?\d+', texto)
-        if match:
+from typing import Optional
+from funciones.protocolos import obtener_decodificador
+
+# Protocolos en los que la balanza transmite sola (los demás esperan un comando)
+PROTOCOLOS_CONTINUOS = ('CONTINUO', 'GAMA', 'TOLEDO')
+
+# Fases del ciclo de un fardo y si la balanza las informa como estables
+FASES = (
+    ('vacio', True),
+    ('subida', False),
+    ('asentando', False),
+    ('estable', True),
+    ('bajada', False),
+)
+
+
+class EscenarioFardos:
+    """Genera el peso de una balanza por la que pasan fardos uno tras otro"""
+
+    def __init__(self, peso_min: float = 15.0, peso_max: float = 45.0,
+                 ruido: float = 0.02, deriva: float = 0.0,
+                 tiempo_vacio: float = 2.0, tiempo_subida: float = 0.5,
+                 tiempo_asentamiento: float = 1.0, tiempo_estable: float = 3.0,
+                 tiempo_bajada: float = 0.5, semilla: Optional[int] = None):
+        self.peso_min = peso_min
+        self.peso_max = peso_max
+        self.ruido = ruido              # Desvío estándar en kg
+        self.deriva = deriva            # kg por minuto que se corre el cero
+        self.duraciones = {
+            'vacio': tiempo_vacio,
+            'subida': tiempo_subida,
+            'asentando': tiempo_asentamiento,
+            'estable': tiempo_estable,
+            'bajada': tiempo_bajada,
+        }
+        self.azar = random.Random(semilla)
+        self.reiniciar()
+
+    def reiniciar(self, ahora: Optional[float] = None):
+        """Arranca un ciclo nuevo con la balanza vacía"""
+        self.inicio = time.monotonic() if ahora is None else ahora
+        self.indice_fase = 0
+        self.inicio_fase = self.inicio
+        self.ciclos = 0
+        self.peso_objetivo = self._nuevo_objetivo()
+
+    def _nuevo_objetivo(self) -> float:
+        return round(self.azar.uniform(self.peso_min, self.peso_max), 2)
+
+    @property
+    def fase(self) -> str:
+        return FASES[self.indice_fase][0]
+
+    def _avanzar(self, ahora: float):
+        """Pasa a la fase que corresponde al instante indicado"""
+        while True:
+            duracion = self.duraciones[self.fase]
+            if ahora - self.inicio_fase < duracion:
+                return
+            self.inicio_fase += duracion
+            self.indice_fase = (self.indice_fase + 1) % len(FASES)
+            if self.indice_fase == 0:
+                self.ciclos += 1
+                self.peso_objetivo = self._nuevo_objetivo()
+
+    def muestra(self, ahora: Optional[float] = None) -> tuple:
+        """Devuelve (peso, estable) para el instante indicado"""
+        ahora = time.monotonic() if ahora is None else ahora
+        self._avanzar(ahora)
+
+        fase = self.fase
+        duracion = self.duraciones[fase] or 1.0
+        avance = min(1.0, (ahora - self.inicio_fase) / duracion)
+        objetivo = self.peso_objetivo
+
+        if fase == 'vacio':
+            peso = 0.0
+        elif fase == 'subida':
+            # El fardo cae: pasa un poco del valor final
+            peso = objetivo * 1.1 * avance
+        elif fase == 'asentando':
+            # Oscilación amortiguada alrededor del peso final
+            amplitud = objetivo * 0.1 * (1.0 - avance)
+            peso = objetivo + amplitud * (1 if int(avance * 12) % 2 else -1)
+        elif fase == 'estable':
+            peso = objetivo
+        else:
+            peso = objetivo * (1.0 - avance)
+
+        peso += self.deriva * (ahora - self.inicio) / 60.0
+        if self.ruido:
+            peso += self.azar.gauss(0.0, self.ruido)
+        return round(peso, 2), FASES[self.indice_fase][1]
+
+
+class EmuladorBalanza:
+    """Balanza virtual: escribe tramas en el extremo maestro de un pty"""
+
+    def __init__(self, protocolo: str = 'GAMA', baudrate: int = 9600,
+                 tramas_por_segundo: float = 10.0, escenario: EscenarioFardos = None,
+                 probabilidad_falla: float = 0.0, continuo: Optional[bool] = None,
+                 terminador: bytes = b'\r\n', semilla: Optional[int] = None):
+        self.protocolo = (protocolo or 'CONTINUO').upper()
+        self.decodificador = obtener_decodificador(self.protocolo)
+        self.baudrate = baudrate
+        self.tramas_por_segundo = tramas_por_segundo  # 0 = tan rápido como permita el cable
+        self.escenario = escenario or EscenarioFardos(semilla=semilla)
+        self.probabilidad_falla = probabilidad_falla
+        if continuo is None:
+            continuo = self.protocolo in PROTOCOLOS_CONTINUOS
+        self.continuo = continuo
+        self.terminador = terminador
+        self.azar = random.Random(semilla)
+
+        self.maestro = None
+        self.esclavo = None
+        self.puerto = None
+        self._hilo = None
+        self._activo = False
+
+        self.tramas_enviadas = 0
+        self.tramas_descartadas = 0     # El pty estaba lleno (nadie lee el puerto)
+        self.fallas_inyectadas = 0
+        self.comandos_recibidos = 0
+        self.comandos_ignorados = 0     # Líneas que no son el comando del protocolo
+
+    def iniciar(self) -> str:
+        """Crea el pseudo-terminal, arranca la transmisión y devuelve el puerto"""
+        import pty
+        import tty
+
+        self.maestro, self.esclavo = pty.openpty()
+        # Sin eco ni edición de línea aunque la aplicación todavía no abrió el puerto
+        tty.setraw(self.esclavo)
+        os.set_blocking(self.maestro, False)
+        self.puerto = os.ttyname(self.esclavo)
+
+        self.escenario.reiniciar()
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle, daemon=True)
+        self._hilo.start()
+        print(f"🧪 Emulador de balanza {self.protocolo} en {self.puerto} @ {self.baudrate} bps")
+        return self.puerto
+
+    def detener(self):
+        """Detiene la transmisión y libera el pty"""
+        self._activo = False
+        if self._hilo and self._hilo.is_alive():
+            self._hilo.join(timeout=2)
+        self._hilo = None
+        for descriptor in (self.maestro, self.esclavo):
+            if descriptor is not None:
+                try:
+                    os.close(descriptor)
+                except OSError:
+                    pass
+        self.maestro = self.esclavo = None
+
+    def _intervalo(self, largo_trama: int) -> float:
+        """Tiempo entre tramas: lo que pida la configuración, nunca menos que el cable (8N1)"""
+        tiempo_cable = largo_trama * 10.0 / self.baudrate
+        if not self.tramas_por_segundo:
+            return tiempo_cable
+        return max(1.0 / self.tramas_por_segundo, tiempo_cable)
+
+    def _bucle(self):
+        """Transmite tramas continuas o responde a los comandos recibidos"""
+        proxima = time.monotonic()
+        pendiente = b''
+        tras_cr = False  # El último terminador fue CR: un LF inmediato es parte de él
+        esperado = (self.decodificador.comando or b'').strip()
+        while self._activo:
+            ahora = time.monotonic()
+            espera = max(0.0, proxima - ahora) if self.continuo else 0.1
             try:
-                return float(match.group())
-            except ValueError:
-                return None
-        return None
+                listos, _, _ = select.select([self.maestro], [], [], min(espera, 0.1))
+            except (OSError, ValueError):
+                break
 
-    def obtener_peso(self) -> float:
-        """Obtiene el peso actual usando EXACTAMENTE tu lógica"""
-        # Si no está conectada, devolver peso actual
-        if not self.conectada or not self.conexion or not self.conexion.is_open:
-            return self.peso_actual
+            if listos:
+                try:
+                    recibido = os.read(self.maestro, 1024)
+                except BlockingIOError:
+                    recibido = b''
+                except OSError:
+                    recibido = b''   # EIO: nadie tiene abierto el esclavo todavía
+                if recibido and not self.continuo:
+                    pendiente += recibido
+                    # Solo el comando del protocolo pide una lectura (como la balanza real):
+                    # el detector no debe "reconocer" protocolos con comandos ajenos
+                    while True:
+                        if tras_cr and pendiente.startswith(b'\n'):
+                            pendiente = pendiente[1:]
+                        if pendiente:
+                            tras_cr = False
+                        fin = min((i for i in (pendiente.find(b'\r'), pendiente.find(b'\n'))
+                                   if i != -1), default=-1)
+                        if fin == -1:
+                            # Comandos sin terminador (Digi 'W'): se responde igual
+                            if esperado and pendiente == esperado:
+                                pendiente = b''
+                                self.comandos_recibidos += 1
+                                self._enviar_trama()
+                            break
+                        comando = pendiente[:fin]
+                        tras_cr = pendiente[fin:fin + 1] == b'\r'
+                        pendiente = pendiente[fin + 1:]
+                        if comando.strip() == esperado:
+                            self.comandos_recibidos += 1
+                            self._enviar_trama()
+                        else:
+                            self.comandos_ignorados += 1
+
+            if self.continuo and time.monotonic() >= proxima:
+                largo = self._enviar_trama()
+                proxima += self._intervalo(largo)
+                # Si el hilo se atrasó mucho no se intenta recuperar el tiempo perdido
+                if time.monotonic() - proxima > 1.0:
+                    proxima = time.monotonic()
+
+    def _enviar_trama(self) -> int:
+        """Escribe una trama (eventualmente fallada) y devuelve su largo"""
+        peso, estable = self.escenario.muestra()
+        trama = self.decodificador.codificar(peso, estable) + self.terminador
+
+        if self.probabilidad_falla and self.azar.random() < self.probabilidad_falla:
+            trama = self._fallar(trama, peso, estable)
+            self.fallas_inyectadas += 1
 
         try:
-            # EXACTAMENTE tu lógica de lectura
-            if self.conexion.in_waiting:
-                byte = self.conexion.read().decode('ascii', errors='ignore')
-                
-                if byte in ['\r', '\n']:  # Detectar fin de línea - EXACTAMENTE como tu función
-                    if self.buffer.strip():
-                        linea_completa = self.buffer.strip()
-                        
-                        # Agregar al log
-                        self._agregar_dato_recibido(linea_completa)
-                        
-                        # EXACTAMENTE tu función extraer_peso
-                        peso_actual = self.extraer_peso(linea_completa)
-                        
-                        # Solo actualizar si el peso cambió - EXACTAMENTE como tu función
-                        if peso_actual is not None and peso_actual != self.peso_anterior:
-                            print(f"Peso: {peso_actual} kg")
-                            self.peso_actual = peso_actual
-                            self.peso_anterior = peso_actual
-                            
-                    self.buffer = ""
-                else:
-                    self.buffer += byte
-            
-            return self.peso_actual
-            
-        except Exception as e:
-            print(f"⚠️ Error al leer peso: {str(e)}")
-            self.ultimo_error = str(e)
-            return self.peso_actual
-
-    def _agregar_dato_recibido(self, dato):
-        """Agrega dato al log"""
-        timestamp = time.strftime("%H:%M:%S")
-        entrada = f"{dato}"
-        
-        # Solo agregar si es diferente al último
-        if not self.datos_recibidos or self.datos_recibidos[-1] != entrada:
-            self.datos_recibidos.append(entrada)
-            
-            if len(self.datos_recibidos) > self.max_datos_log:
-                self.datos_recibidos.pop(0)
-
-    def obtener_datos_recibidos(self):
-        """Obtiene el log de datos"""
-        return self.datos_recibidos.copy()
-
-    def limpiar_datos_recibidos(self):
-        """Limpia el log"""
-        self.datos_recibidos.clear()
-
-    def obtener_puertos_disponibles(self):
-        """Obtiene puertos COM disponibles"""
-        try:
-            puertos = []
-            for port in serial.tools.list_ports.comports():
-                puertos.append({
-                    'puerto': port.device,
-                    'descripcion': port.description,
-                    'fabricante': port.manufacturer or 'Desconocido'
-                })
-            return puertos
-        except Exception:
-            return []
-
-    def cambiar_configuracion(self, puerto=None, baudrate=None, protocolo=None, 
-                            activar_dtr=None, activar_rts=None, timeout=None):
-        """Cambia configuración y reconecta"""
-        try:
-            if puerto is not None:
-                self.puerto = puerto
-            if baudrate is not None:
-                self.baudrate = baudrate
-            if protocolo is not None:
-                self.protocolo = protocolo
-            if activar_dtr is not None:
-                self.activar_dtr = activar_dtr
-            if activar_rts is not None:
-                self.activar_rts = activar_rts
-            if timeout is not None:
-                self.timeout = timeout
-
-            # Cerrar conexión actual
-            self.cerrar()
-            
-            # Intentar nueva conexión
-            self.intentar_conexion()
-            
-            return self.conectada
-                
-        except Exception as e:
-            print(f"Error al cambiar configuración: {e}")
-            return False
-
-    def probar_conexion(self):
-        """Prueba la conexión"""
-        if not self.conectada:
-            return {
-                'exito': False,
-                'mensaje': f'Balanza desconectada - Puerto: {self.puerto}',
-                'peso': self.peso_actual
-            }
-        
-        try:
-            peso = self.obtener_peso()
-            return {
-                'exito': True,
-                'peso': peso,
-                'mensaje': f'Conexión OK - Peso: {peso:.2f} kg'
-            }
-        except Exception as e:
-            return {
-                'exito': False,
-                'mensaje': f'Error: {str(e)}',
-                'peso': self.peso_actual
-            }
-
-    def obtener_estado(self):
-        """Obtiene estado actual"""
+            os.write(self.maestro, trama)
+            self.tramas_enviadas += 1
+        except BlockingIOError:
+            self.tramas_descartadas += 1
+        except OSError:
+            self.tramas_descartadas += 1
+        return len(trama)
+
+    def _fallar(self, trama: bytes, peso: float, estable: bool) -> bytes:
+        """Aplica una de las fallas que se ven en el cable"""
+        falla = self.azar.choice(('cortada', 'basura', 'pico', 'sin_terminador'))
+        if falla == 'cortada':
+            # Se pierde el final: la próxima trama llega pegada a esta
+            return trama[:len(trama) // 2]
+        if falla == 'basura':
+            # Baudrate cruzado o ruido eléctrico
+            return bytes(self.azar.randrange(0x80, 0x100) for _ in range(len(trama))) + self.terminador
+        if falla == 'pico':
+            return self.decodificador.codificar(peso * 10, estable) + self.terminador
+        return trama[:-len(self.terminador)]
+
+    def obtener_estado(self) -> dict:
+        """Estado del emulador y del ciclo de fardos"""
         return {
-            'conectada': self.conectada,
             'puerto': self.puerto,
-            'baudrate': self.baudrate,
             'protocolo': self.protocolo,
-            'peso_actual': self.peso_actual,
-            'ultimo_error': self.ultimo_error,
-            'dtr': self.activar_dtr,
-            'rts': self.activar_rts
+            'baudrate': self.baudrate,
+            'continuo': self.continuo,
+            'fase': self.escenario.fase,
+            'peso_objetivo': self.escenario.peso_objetivo,
+            'ciclos': self.escenario.ciclos,
+            'tramas_enviadas': self.tramas_enviadas,
+            'tramas_descartadas': self.tramas_descartadas,
+            'fallas_inyectadas': self.fallas_inyectadas,
+            'comandos_recibidos': self.comandos_recibidos,
+            'comandos_ignorados': self.comandos_ignorados,
         }
-
-    def cerrar(self):
-        """Cierra conexión"""
-        if self.conexion and self.conexion.is_open:
-            try:
-                self.conexion.close()
-            except Exception:
-                pass
-        self.conectada = False
-        self.conexion = None
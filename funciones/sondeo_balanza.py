@@ -0,0 +1,158 @@
+"""
+Sondeo de balanzas por comando (pedido/respuesta)
+Las balanzas que no transmiten solas (ESTANDAR, AND, OHAUS, METTLER...) mandan
+una lectura por cada comando recibido. SondeoBalanza envía el comando del
+protocolo, empareja cada respuesta con su pedido (en orden, como llegan por la
+línea serie) y vence los pedidos sin respuesta.
+
+La frecuencia se adapta al peso: rápida mientras cambia, y se va frenando hasta
+el intervalo lento cuando la balanza queda quieta, para no saturar la línea. Las
+respuestas las sigue procesando el hilo de lectura de ConexionBalanza, así que
+alimentan la misma instantánea que el camino continuo.
+"""
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from funciones import reloj
+
+
+class SondeoBalanza:
+    """Envía el comando de pedido de peso con ritmo adaptable"""
+
+    def __init__(self, comando: bytes, escribir: Callable[[bytes], None],
+                 en_cola: int = 1, intervalo_min: float = 0.05, intervalo_max: float = 0.5,
+                 timeout_respuesta: float = 0.5, tolerancia: float = 0.02,
+                 lecturas_reposo: int = 10, esperar_continuo: float = 0.0):
+        self.comando = comando
+        self.escribir = escribir                  # Escribe en el puerto (lanza si falla)
+        self.en_cola = max(1, en_cola)            # Pedidos sin responder permitidos a la vez
+        self.intervalo_min = intervalo_min        # Entre pedidos mientras el peso cambia
+        self.intervalo_max = intervalo_max        # Entre pedidos con la balanza quieta
+        self.timeout_respuesta = timeout_respuesta
+        self.tolerancia = tolerancia              # kg que cuentan como cambio de peso
+        self.lecturas_reposo = lecturas_reposo    # Lecturas iguales antes de frenar
+        self.esperar_continuo = esperar_continuo  # Modo auto: escuchar antes de sondear
+
+        self.intervalo = intervalo_min
+        self.modo = 'comando'
+        self._pendientes = deque()                # monotonic_ns de cada pedido en vuelo
+        self._ultimo_peso = None
+        self._quietas = 0
+        self._proximo_envio = 0
+        self._lock = threading.Lock()
+        self._evento = threading.Event()
+        self._hilo = None
+        self._activo = False
+
+        self.enviados = 0
+        self.respondidos = 0
+        self.vencidos = 0
+        self.no_solicitadas = 0
+        self.ida_y_vuelta = deque(maxlen=500)    # ns entre pedido y respuesta
+
+    def iniciar(self):
+        """Arranca el hilo de sondeo"""
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle)
+        self._hilo.daemon = True
+        self._hilo.start()
+
+    def detener(self):
+        """Detiene el sondeo (no cierra el puerto)"""
+        self._activo = False
+        self._evento.set()
+        if self._hilo and self._hilo.is_alive() and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=1.0)
+        self._hilo = None
+
+    def _bucle(self):
+        if self.esperar_continuo:
+            # Modo auto: si la balanza transmite sola no hace falta sondear
+            self.modo = 'escuchando'
+            limite = time.monotonic() + self.esperar_continuo
+            while self._activo and time.monotonic() < limite and not self.no_solicitadas:
+                self._evento.wait(0.05)
+                self._evento.clear()
+            if self.no_solicitadas:
+                self.modo = 'continuo'
+                return
+            self.modo = 'comando'
+
+        while self._activo:
+            ahora = reloj.monotonic_ns()
+            with self._lock:
+                self._vencer_pendientes(ahora)
+                enviar = len(self._pendientes) < self.en_cola and ahora >= self._proximo_envio
+                if enviar:
+                    self._pendientes.append(ahora)
+                    self._proximo_envio = ahora + int(self.intervalo * 1e9)
+                    self.enviados += 1
+
+            if enviar:
+                try:
+                    self.escribir(self.comando)
+                except Exception:
+                    # El hilo de lectura detecta el puerto caído y avisa al supervisor
+                    self._activo = False
+                    return
+
+            self._evento.wait(self._espera(reloj.monotonic_ns()))
+            self._evento.clear()
+
+    def _vencer_pendientes(self, ahora: int):
+        """Descarta los pedidos que superaron el timeout (requiere el lock)"""
+        limite = ahora - int(self.timeout_respuesta * 1e9)
+        while self._pendientes and self._pendientes[0] < limite:
+            self._pendientes.popleft()
+            self.vencidos += 1
+            # Sin respuesta: no insistir al ritmo rápido
+            self.intervalo = min(self.intervalo * 2, self.intervalo_max)
+
+    def _espera(self, ahora: int) -> float:
+        """Segundos hasta el próximo envío o el próximo vencimiento"""
+        with self._lock:
+            eventos = [self._proximo_envio]
+            if self._pendientes:
+                eventos.append(self._pendientes[0] + int(self.timeout_respuesta * 1e9))
+            if len(self._pendientes) >= self.en_cola:
+                eventos = eventos[1:]  # Cola llena: solo una respuesta o un vencimiento destraban
+        return max(0.001, (min(eventos) - ahora) / 1e9)
+
+    def trama_recibida(self, recibido_ns: int, peso: Optional[float]):
+        """Empareja una trama con el pedido más viejo y ajusta el ritmo"""
+        with self._lock:
+            if self._pendientes and self._pendientes[0] <= recibido_ns:
+                self.ida_y_vuelta.append(recibido_ns - self._pendientes.popleft())
+                self.respondidos += 1
+            else:
+                self.no_solicitadas += 1
+
+            if peso is not None:
+                if self._ultimo_peso is None or abs(peso - self._ultimo_peso) > self.tolerancia:
+                    # El peso se mueve: volver al ritmo rápido
+                    self.intervalo = self.intervalo_min
+                    self._quietas = 0
+                else:
+                    self._quietas += 1
+                    if self._quietas >= self.lecturas_reposo:
+                        self.intervalo = min(self.intervalo * 1.5, self.intervalo_max)
+                self._ultimo_peso = peso
+        self._evento.set()
+
+    def obtener_estado(self) -> dict:
+        """Contadores y tiempos de respuesta para diagnóstico"""
+        with self._lock:
+            tiempos = sorted(self.ida_y_vuelta)
+            return {
+                'modo': self.modo,
+                'intervalo_s': self.intervalo,
+                'enviados': self.enviados,
+                'respondidos': self.respondidos,
+                'vencidos': self.vencidos,
+                'no_solicitadas': self.no_solicitadas,
+                'en_vuelo': len(self._pendientes),
+                'respuesta_p50_ms': tiempos[len(tiempos) // 2] / 1e6 if tiempos else None,
+                'respuesta_max_ms': tiempos[-1] / 1e6 if tiempos else None,
+            }
@@ -0,0 +1,473 @@
+"""
+Telemetría continua del peso
+Con BALANZA_CONFIG['telemetria'] cada lectura decodificada (también las que caen
+entre fardo y fardo) se agrega a archivos binarios por columna: sirven para
+analizar tiempos de ciclo, deriva de la balanza y tiempos muertos sin tocar la
+base de datos de tickets.
+
+Estructura en disco (una carpeta por día, hora local; se conservan
+'telemetria_dias' días):
+    AAAAMMDD/crudo/tiempo.i64    ns (reloj monotónico anclado a la hora de pared)
+                   peso.f32      peso crudo en kg
+                   banderas.u8   ESTABLE | NETO
+    AAAAMMDD/1s/   tiempo.i64 (inicio del segundo), minimo.f32, maximo.f32,
+                   media.f32, cantidad.u32
+    AAAAMMDD/1m/   ídem por minuto
+    AAAAMMDD/compactado.json     hasta dónde llegó la compactación
+
+El hilo de adquisición solo agrega a arrays en memoria; un hilo aparte los
+vuelca a disco una vez por segundo y arma los resúmenes de 1 s y 1 min. Las
+consultas mapean los archivos (mmap) y ubican el rango por búsqueda binaria:
+devuelven vistas de memoria, no listas de objetos.
+"""
+import bisect
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterator, List, Optional
+
+from funciones import reloj
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+ESTABLE = 0x01
+NETO = 0x02
+
+COLUMNAS_CRUDO = (('tiempo', 'q'), ('peso', 'f'), ('banderas', 'B'))
+COLUMNAS_RESUMEN = (('tiempo', 'q'), ('minimo', 'f'), ('maximo', 'f'),
+                    ('media', 'f'), ('cantidad', 'I'))
+NIVELES = {'crudo': COLUMNAS_CRUDO, '1s': COLUMNAS_RESUMEN, '1m': COLUMNAS_RESUMEN}
+_ANCHO_NS = {'1s': 1_000_000_000, '1m': 60_000_000_000}
+_EXTENSION = {'q': 'i64', 'f': 'f32', 'B': 'u8', 'I': 'u32'}
+
+
+def _a_ns(instante) -> int:
+    """datetime o segundos epoch a ns epoch"""
+    if isinstance(instante, datetime):
+        instante = instante.timestamp()
+    return int(instante * 1e9)
+
+
+class TablaColumnar:
+    """Columnas de largo fijo en archivos separados (fila i = elemento i de cada una)"""
+
+    def __init__(self, carpeta: str, columnas):
+        self.carpeta = carpeta
+        self.columnas = columnas
+        self.rutas = {nombre: os.path.join(carpeta, f"{nombre}.{_EXTENSION[tipo]}")
+                      for nombre, tipo in columnas}
+        self.tamanos = {nombre: array(tipo).itemsize for nombre, tipo in columnas}
+
+    def largo(self) -> int:
+        """Filas completas (un corte a mitad de escritura deja columnas desparejas)"""
+        filas = None
+        for nombre, _ in self.columnas:
+            try:
+                cantidad = os.path.getsize(self.rutas[nombre]) // self.tamanos[nombre]
+            except OSError:
+                return 0
+            filas = cantidad if filas is None else min(filas, cantidad)
+        return filas or 0
+
+    def recortar(self, filas: Optional[int] = None) -> int:
+        """Deja todas las columnas con `filas` filas (default: las completas)"""
+        if filas is None:
+            filas = self.largo()
+        for nombre, _ in self.columnas:
+            ruta = self.rutas[nombre]
+            tamano = filas * self.tamanos[nombre]
+            if os.path.exists(ruta) and os.path.getsize(ruta) > tamano:
+                with open(ruta, 'r+b') as archivo:
+                    archivo.truncate(tamano)
+        return filas
+
+    def agregar(self, datos: dict):
+        """Agrega al final un array por columna (todos del mismo largo)"""
+        os.makedirs(self.carpeta, exist_ok=True)
+        for nombre, _ in self.columnas:
+            with open(self.rutas[nombre], 'ab') as archivo:
+                datos[nombre].tofile(archivo)
+
+
+class Segmento:
+    """Vista de solo lectura (mmap) de las filas de una TablaColumnar"""
+
+    def __init__(self, tabla: TablaColumnar):
+        self.tipos = dict(tabla.columnas)
+        self.columnas = {}
+        self._mapas = []
+        self._vistas = []
+        filas = tabla.largo()
+        for nombre, tipo in tabla.columnas:
+            if not filas:
+                # mmap no acepta archivos vacíos
+                self.columnas[nombre] = memoryview(array(tipo))
+                continue
+            with open(tabla.rutas[nombre], 'rb') as archivo:
+                mapa = mmap.mmap(archivo.fileno(), filas * tabla.tamanos[nombre],
+                                 access=mmap.ACCESS_READ)
+            self._mapas.append(mapa)
+            crudo = memoryview(mapa)
+            vista = crudo.cast(tipo)
+            self._vistas += [crudo, vista]
+            self.columnas[nombre] = vista
+
+    def __len__(self) -> int:
+        return len(self.columnas['tiempo'])
+
+    def limitar(self, desde_ns: int, hasta_ns: int):
+        """Se queda con las filas de tiempo en [desde_ns, hasta_ns) (búsqueda binaria)"""
+        tiempos = self.columnas['tiempo']
+        inicio = bisect.bisect_left(tiempos, desde_ns)
+        fin = bisect.bisect_left(tiempos, hasta_ns, inicio)
+        for nombre, vista in list(self.columnas.items()):
+            recorte = vista[inicio:fin]
+            self._vistas.append(recorte)
+            self.columnas[nombre] = recorte
+
+    def como_numpy(self, nombre: str):
+        """Columna como array de numpy sin copiar (requiere numpy)"""
+        return numpy.frombuffer(self.columnas[nombre], dtype=self.tipos[nombre])
+
+    def cerrar(self):
+        for vista in reversed(self._vistas):
+            try:
+                vista.release()
+            except BufferError:
+                pass  # Tomada por un array de numpy (como_numpy)
+        self._vistas = []
+        self.columnas = {}
+        for mapa in self._mapas:
+            try:
+                mapa.close()
+            except BufferError:
+                pass  # Alguien conserva una vista: el mapa se libera con ella
+        self._mapas = []
+
+
+class ResultadoConsulta:
+    """Filas de un rango de tiempo, un segmento por día"""
+
+    def __init__(self, nivel: str, segmentos: List[Segmento]):
+        self.nivel = nivel
+        self.nombres = [nombre for nombre, _ in NIVELES[nivel]]
+        self.segmentos = segmentos
+
+    def __len__(self) -> int:
+        return sum(len(segmento) for segmento in self.segmentos)
+
+    def filas(self) -> Iterator[tuple]:
+        """Recorre las filas como tuplas, de a una (sin armar la lista completa)"""
+        for segmento in self.segmentos:
+            yield from zip(*(segmento.columnas[nombre] for nombre in self.nombres))
+
+    def columna(self, nombre: str):
+        """Copia de una columna de todo el rango (numpy si está instalado, si no array)"""
+        tipo = dict(NIVELES[self.nivel])[nombre]
+        if numpy is not None:
+            partes = [segmento.como_numpy(nombre) for segmento in self.segmentos]
+            return numpy.concatenate(partes) if partes else numpy.empty(0, dtype=tipo)
+        resultado = array(tipo)
+        for segmento in self.segmentos:
+            resultado.frombytes(segmento.columnas[nombre].tobytes())
+        return resultado
+
+    def cerrar(self):
+        for segmento in self.segmentos:
+            segmento.cerrar()
+        self.segmentos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+
+class LectorTelemetria:
+    """Consultas sobre una carpeta de telemetría (la esté escribiendo o no la aplicación)"""
+
+    def __init__(self, carpeta: str):
+        self.carpeta = carpeta
+
+    def dias(self) -> List[str]:
+        """Días con datos (AAAAMMDD), del más viejo al más nuevo"""
+        if not os.path.isdir(self.carpeta):
+            return []
+        return sorted(nombre for nombre in os.listdir(self.carpeta)
+                      if len(nombre) == 8 and nombre.isdigit())
+
+    def consultar(self, desde, hasta, nivel: str = 'crudo') -> ResultadoConsulta:
+        """Filas con tiempo en [desde, hasta) (datetime o segundos epoch)
+
+        nivel: 'crudo' (cada lectura), '1s' o '1m' (mínimo, máximo y media por intervalo).
+        Cerrar el resultado (o usarlo con `with`) libera los mapas de memoria.
+        """
+        if nivel not in NIVELES:
+            raise ValueError(f"Nivel desconocido: {nivel} (use {', '.join(NIVELES)})")
+        desde_ns, hasta_ns = _a_ns(desde), _a_ns(hasta)
+        primero = datetime.fromtimestamp(desde_ns / 1e9).strftime('%Y%m%d')
+        ultimo = datetime.fromtimestamp(max(desde_ns, hasta_ns - 1) / 1e9).strftime('%Y%m%d')
+
+        segmentos = []
+        for dia in self.dias():
+            if not primero <= dia <= ultimo:
+                continue
+            segmento = Segmento(TablaColumnar(os.path.join(self.carpeta, dia, nivel),
+                                              NIVELES[nivel]))
+            segmento.limitar(desde_ns, hasta_ns)
+            if len(segmento):
+                segmentos.append(segmento)
+            else:
+                segmento.cerrar()
+        return ResultadoConsulta(nivel, segmentos)
+
+
+# === COMPACTACIÓN ===
+
+def _resumir(origen: TablaColumnar, destino: TablaColumnar, desde: int,
+             ancho_ns: int, final: bool) -> int:
+    """Agrega a `destino` los intervalos completos de `origen` a partir de la fila `desde`
+
+    Devuelve la primera fila del intervalo que quedó abierto (o el largo, si final).
+    """
+    segmento = Segmento(origen)
+    salida = {nombre: array(tipo) for nombre, tipo in COLUMNAS_RESUMEN}
+    try:
+        columnas = segmento.columnas
+        tiempos = columnas['tiempo']
+        filas = len(tiempos)
+        de_resumen = 'media' in columnas
+        i = desde
+        while i < filas:
+            inicio = tiempos[i] // ancho_ns * ancho_ns
+            j = bisect.bisect_left(tiempos, inicio + ancho_ns, i, filas)
+            if j == filas and not final:
+                break  # Todavía pueden llegar lecturas de este intervalo
+            if de_resumen:
+                cantidades = columnas['cantidad'][i:j]
+                cantidad = sum(cantidades)
+                minimo = min(columnas['minimo'][i:j])
+                maximo = max(columnas['maximo'][i:j])
+                media = sum(m * c for m, c in zip(columnas['media'][i:j], cantidades)) / cantidad
+            else:
+                pesos = columnas['peso'][i:j]
+                cantidad = j - i
+                minimo, maximo, media = min(pesos), max(pesos), sum(pesos) / cantidad
+            salida['tiempo'].append(inicio)
+            salida['minimo'].append(minimo)
+            salida['maximo'].append(maximo)
+            salida['media'].append(media)
+            salida['cantidad'].append(cantidad)
+            i = j
+    finally:
+        segmento.cerrar()
+    if salida['tiempo']:
+        destino.agregar(salida)
+    return i
+
+
+def compactar_dia(carpeta_dia: str, final: bool = False):
+    """Arma (o continúa) los resúmenes de 1 s y 1 min de un día
+
+    final=True cierra también el último intervalo: se usa cuando el día terminó.
+    """
+    ruta_estado = os.path.join(carpeta_dia, 'compactado.json')
+    estado = {'crudo': 0, '1s': 0, 'filas_1s': 0, 'filas_1m': 0, 'cerrado': False}
+    if os.path.exists(ruta_estado):
+        with open(ruta_estado, 'r', encoding='utf-8') as archivo:
+            estado.update(json.load(archivo))
+    if estado['cerrado']:
+        return
+
+    crudo = TablaColumnar(os.path.join(carpeta_dia, 'crudo'), COLUMNAS_CRUDO)
+    por_segundo = TablaColumnar(os.path.join(carpeta_dia, '1s'), COLUMNAS_RESUMEN)
+    por_minuto = TablaColumnar(os.path.join(carpeta_dia, '1m'), COLUMNAS_RESUMEN)
+    # Lo escrito después del último estado guardado se rehace (corte a mitad de camino)
+    por_segundo.recortar(estado['filas_1s'])
+    por_minuto.recortar(estado['filas_1m'])
+
+    estado['crudo'] = _resumir(crudo, por_segundo, estado['crudo'], _ANCHO_NS['1s'], final)
+    estado['1s'] = _resumir(por_segundo, por_minuto, estado['1s'], _ANCHO_NS['1m'], final)
+    estado['filas_1s'] = por_segundo.largo()
+    estado['filas_1m'] = por_minuto.largo()
+    estado['cerrado'] = final
+
+    temporal = ruta_estado + '.tmp'
+    with open(temporal, 'w', encoding='utf-8') as archivo:
+        json.dump(estado, archivo)
+    os.replace(temporal, ruta_estado)
+
+
+# === ESCRITURA ===
+
+class AlmacenTelemetria:
+    """Recibe las lecturas de una balanza y las guarda en segundo plano"""
+
+    def __init__(self, carpeta: str, dias_conservar: int = 90,
+                 intervalo_volcado: float = 1.0, intervalo_compactacion: float = 10.0):
+        self.carpeta = carpeta
+        self.lector = LectorTelemetria(carpeta)
+        self.dias_conservar = dias_conservar
+        self.intervalo_volcado = intervalo_volcado
+        self.intervalo_compactacion = intervalo_compactacion
+        self.registradas = 0
+
+        # ns epoch = monotonic_ns + ancla: no salta si se corrige la hora del sistema
+        self._ancla = reloj.time_ns() - reloj.monotonic_ns()
+        self._lock = threading.Lock()          # Lecturas pendientes (hilo de adquisición)
+        self._lock_disco = threading.Lock()    # Archivos (hilo de telemetría y consultas)
+        self._pendiente = self._nuevo_pendiente()
+        self._ultimo_tiempo = 0
+
+        self._dia = None
+        self._tabla = None
+        self._fin_dia_ns = 0
+        self._ultimo_escrito = 0
+
+        self._evento = threading.Event()
+        self._activo = False
+        self._hilo = None
+
+    @staticmethod
+    def _nuevo_pendiente() -> dict:
+        return {nombre: array(tipo) for nombre, tipo in COLUMNAS_CRUDO}
+
+    def iniciar(self):
+        """Cierra los días que quedaron a medias y arranca el hilo de volcado"""
+        os.makedirs(self.carpeta, exist_ok=True)
+        hoy = datetime.now().strftime('%Y%m%d')
+        for dia in self.lector.dias():
+            if dia < hoy:
+                try:
+                    TablaColumnar(os.path.join(self.carpeta, dia, 'crudo'), COLUMNAS_CRUDO).recortar()
+                    compactar_dia(os.path.join(self.carpeta, dia), final=True)
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ No se pudo compactar la telemetría del {dia}: {e}")
+        self._borrar_viejos()
+
+        self._activo = True
+        self._hilo = threading.Thread(target=self._bucle, name='telemetria')
+        self._hilo.daemon = True
+        self._hilo.start()
+
+    def detener(self):
+        """Vuelca lo pendiente y actualiza los resúmenes"""
+        self._activo = False
+        self._evento.set()
+        if self._hilo and self._hilo is not threading.current_thread():
+            self._hilo.join(timeout=5)
+        self._hilo = None
+        try:
+            self.volcar()
+            self.compactar()
+        except OSError as e:
+            print(f"⚠️ Error al cerrar la telemetría: {e}")
+
+    def registrar(self, peso: float, monotonic_ns: int, banderas: int = 0):
+        """Agrega una lectura (hilo de adquisición: solo memoria, sin E/S)"""
+        tiempo = monotonic_ns + self._ancla
+        with self._lock:
+            if tiempo < self._ultimo_tiempo:
+                tiempo = self._ultimo_tiempo  # Las columnas se consultan por búsqueda binaria
+            self._ultimo_tiempo = tiempo
+            pendiente = self._pendiente
+            pendiente['tiempo'].append(tiempo)
+            pendiente['peso'].append(peso)
+            pendiente['banderas'].append(banderas)
+            self.registradas += 1
+
+    def _bucle(self):
+        proxima_compactacion = time.monotonic() + self.intervalo_compactacion
+        while self._activo:
+            self._evento.wait(self.intervalo_volcado)
+            if not self._activo:
+                break
+            try:
+                self.volcar()
+                if time.monotonic() >= proxima_compactacion:
+                    self.compactar()
+                    proxima_compactacion = time.monotonic() + self.intervalo_compactacion
+            except OSError as e:
+                print(f"⚠️ Error al guardar la telemetría: {e}")
+
+    def volcar(self):
+        """Escribe las lecturas pendientes en el archivo del día que corresponda"""
+        with self._lock:
+            pendiente, self._pendiente = self._pendiente, self._nuevo_pendiente()
+        tiempos = pendiente['tiempo']
+        if not tiempos:
+            return
+        with self._lock_disco:
+            i = 0
+            while i < len(tiempos):
+                if self._tabla is None or tiempos[i] >= self._fin_dia_ns:
+                    self._abrir_dia(tiempos[i])
+                # Una tanda que cruza la medianoche se parte entre los dos días
+                j = bisect.bisect_left(tiempos, self._fin_dia_ns, i)
+                for k in range(i, j):
+                    if tiempos[k] >= self._ultimo_escrito:
+                        break
+                    tiempos[k] = self._ultimo_escrito  # Hora corrida hacia atrás entre ejecuciones
+                self._tabla.agregar({nombre: columna[i:j] for nombre, columna in pendiente.items()})
+                self._ultimo_escrito = tiempos[j - 1]
+                i = j
+
+    def _abrir_dia(self, tiempo_ns: int):
+        anterior = self._dia
+        fecha = datetime.fromtimestamp(tiempo_ns / 1e9)
+        self._dia = fecha.strftime('%Y%m%d')
+        medianoche = datetime(fecha.year, fecha.month, fecha.day) + timedelta(days=1)
+        self._fin_dia_ns = int(medianoche.timestamp() * 1e9)
+        self._tabla = TablaColumnar(os.path.join(self.carpeta, self._dia, 'crudo'), COLUMNAS_CRUDO)
+
+        # Una escritura cortada por un apagón deja columnas desparejas
+        filas = self._tabla.recortar()
+        if filas:
+            segmento = Segmento(self._tabla)
+            self._ultimo_escrito = max(self._ultimo_escrito, segmento.columnas['tiempo'][filas - 1])
+            segmento.cerrar()
+
+        if anterior is not None and anterior != self._dia:
+            compactar_dia(os.path.join(self.carpeta, anterior), final=True)
+            self._borrar_viejos()
+
+    def compactar(self):
+        """Actualiza los resúmenes de 1 s y 1 min del día en curso"""
+        with self._lock_disco:
+            if self._dia is not None:
+                compactar_dia(os.path.join(self.carpeta, self._dia))
+
+    def _borrar_viejos(self):
+        """Borra los días que pasaron el plazo de conservación"""
+        if not self.dias_conservar:
+            return
+        limite = (datetime.now() - timedelta(days=self.dias_conservar)).strftime('%Y%m%d')
+        for dia in self.lector.dias():
+            if dia < limite:
+                shutil.rmtree(os.path.join(self.carpeta, dia), ignore_errors=True)
+
+    def consultar(self, desde, hasta, nivel: str = 'crudo') -> ResultadoConsulta:
+        """Como LectorTelemetria.consultar, incluyendo las lecturas del último segundo
+
+        Los resúmenes se arman cada 'intervalo_compactacion' segundos y solo con
+        intervalos terminados.
+        """
+        self.volcar()
+        return self.lector.consultar(desde, hasta, nivel)
+
+    def obtener_estado(self) -> dict:
+        return {
+            'carpeta': self.carpeta,
+            'dia': self._dia,
+            'registradas': self.registradas,
+            'pendientes': len(self._pendiente['tiempo']),
+        }
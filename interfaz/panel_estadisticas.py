@@ -15,6 +15,10 @@ class PanelEstadisticas:
         self.entry_resto = None
         self.text_observaciones = None
         
+        # Kg Bruto Romaneo en vivo desde una segunda balanza (rol 'romaneo')
+        self.var_romaneo_vivo = None
+        self.label_romaneo = None
+        
         self.crear_interfaz()
     
     def crear_interfaz(self):
@@ -129,7 +133,10 @@ class PanelEstadisticas:
             campos_grid.grid_columnconfigure(i, weight=1)
         
         # Kg Bruto Romaneo
-        self.crear_campo_entrada(campos_grid, "Kg Bruto Romaneo:", 0, 0, 'kg_bruto_romaneo')
+        frame_romaneo = self.crear_campo_entrada(campos_grid, "Kg Bruto Romaneo:", 0, 0,
+                                                 'kg_bruto_romaneo')
+        if self.gestor.obtener_balanza('romaneo'):
+            self.crear_romaneo_en_vivo(frame_romaneo)
         
         # Agregado
         self.crear_campo_entrada(campos_grid, "Agregado:", 0, 1, 'agregado', valor_defecto="0")
@@ -164,6 +171,59 @@ class PanelEstadisticas:
             self.entry_agregado = entry
         elif nombre_campo == 'resto':
             self.entry_resto = entry
+        
+        return frame
+    
+    def crear_romaneo_en_vivo(self, frame):
+        """Agrega el control para tomar el Kg Bruto Romaneo de la balanza de camiones"""
+        self.var_romaneo_vivo = tk.BooleanVar(value=True)
+        ttk.Checkbutton(frame, text="⚖️ En vivo", variable=self.var_romaneo_vivo,
+                        command=self.cambiar_romaneo_vivo).pack(anchor='w', pady=(3, 0))
+        
+        self.label_romaneo = tk.Label(frame, text="",
+                                      bg=COLORES['fondo_panel'],
+                                      fg=COLORES['texto_secundario'],
+                                      font=FUENTES['pequena'])
+        self.label_romaneo.pack(anchor='w')
+        
+        self.cambiar_romaneo_vivo()
+        self.actualizar_romaneo()
+    
+    def cambiar_romaneo_vivo(self):
+        """En vivo el campo solo lo escribe la balanza; si no, se tipea a mano"""
+        if self.var_romaneo_vivo.get():
+            self.entry_kg_bruto_romaneo.configure(state='readonly')
+        else:
+            self.entry_kg_bruto_romaneo.configure(state='normal')
+            self.label_romaneo.configure(text="")
+    
+    def actualizar_romaneo(self):
+        """Copia el peso de la balanza de romaneo al campo mientras esté en vivo"""
+        try:
+            if self.var_romaneo_vivo.get():
+                lectura = self.gestor.obtener_lectura_rol('romaneo')
+                if not lectura['conectada']:
+                    self.label_romaneo.configure(text=f"🔴 {lectura['nombre']}: sin conexión")
+                else:
+                    # Con el camión asentado se usa el valor estable, no la última muestra
+                    if lectura['estable'] and lectura['valor_estable'] is not None:
+                        peso = lectura['valor_estable']
+                        estado = "🟢 estable"
+                    else:
+                        peso = lectura['peso']
+                        estado = "🟡 en movimiento"
+                    texto = f"{peso:.2f}"
+                    if self.entry_kg_bruto_romaneo.get() != texto:
+                        self.entry_kg_bruto_romaneo.configure(state='normal')
+                        self.entry_kg_bruto_romaneo.delete(0, tk.END)
+                        self.entry_kg_bruto_romaneo.insert(0, texto)
+                        self.entry_kg_bruto_romaneo.configure(state='readonly')
+                        self.actualizar_calculos()
+                    self.label_romaneo.configure(text=f"{lectura['nombre']}: {estado}")
+        except Exception as e:
+            print(f"Error al leer la balanza de romaneo: {e}")
+        finally:
+            self.parent.after(250, self.actualizar_romaneo)
     
     def crear_calculo_rinde(self):
         """Crea la sección de cálculo de rinde"""
@@ -355,6 +415,10 @@ class PanelEstadisticas:
         
         # Cargar kg bruto romaneo
         if hasattr(ticket, 'kg_bruto_romaneo') and ticket.kg_bruto_romaneo is not None:
+            if self.var_romaneo_vivo is not None and self.var_romaneo_vivo.get():
+                # Ticket ya pesado: el valor guardado no lo pisa la balanza
+                self.var_romaneo_vivo.set(False)
+                self.cambiar_romaneo_vivo()
             if self.entry_kg_bruto_romaneo:
                 self.entry_kg_bruto_romaneo.delete(0, tk.END)
                 self.entry_kg_bruto_romaneo.insert(0, str(ticket.kg_bruto_romaneo))
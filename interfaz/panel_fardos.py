@@ -1,8 +1,10 @@
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 from typing import TYPE_CHECKING
 from interfaz.estilos import EstilosModernos, WidgetsPersonalizados
-from config.configuracion import COLORES, FUENTES, DIMENSIONES, MENSAJES
+from config.configuracion import COLORES, FUENTES, DIMENSIONES, MENSAJES, BALANZA_CONFIG, AUTOPESAJE_CONFIG
+from funciones.registro_autopesaje import RegistroAutopesaje
 
 class PanelFardos:
     def __init__(self, parent, gestor, ventana_principal):
@@ -11,6 +13,12 @@ class PanelFardos:
         self.ventana_principal = ventana_principal
         self.modo_pesaje_activo = False
         self.primer_fardo_ingresado = False
+        self.esperando_estabilidad = False
+        
+        # Auto-pesaje: se rearma recién cuando la balanza vuelve a cero
+        self.autopesaje_armado = True
+        self.carga_en_balanza = False
+        self.registro_autopesaje = RegistroAutopesaje()
         
         self.crear_interfaz()
     
@@ -76,7 +84,14 @@ class PanelFardos:
                                         bg=COLORES['fondo_panel'],
                                         fg=COLORES['primario'],
                                         font=FUENTES['grande'])
-        self.label_peso_actual.pack(side='left', padx=(10, 20))
+        self.label_peso_actual.pack(side='left', padx=(10, 5))
+        
+        # Indicador de estabilidad del peso
+        self.label_estabilidad = tk.Label(controles_linea, text="",
+                                        bg=COLORES['fondo_panel'],
+                                        fg=COLORES['texto_secundario'],
+                                        font=FUENTES['pequena'])
+        self.label_estabilidad.pack(side='left', padx=(0, 20))
         
         # Frame para botones de pesaje
         botones_pesaje = tk.Frame(controles_linea, bg=COLORES['fondo_panel'])
@@ -104,6 +119,20 @@ class PanelFardos:
                                        fg=COLORES['texto_secundario'],
                                        font=FUENTES['normal'])
         self.indicador_estado.pack(side='left')
+        
+        # Modo auto-pesaje (sin botón ni confirmaciones)
+        self.var_autopesaje = tk.BooleanVar(value=False)
+        self.check_autopesaje = ttk.Checkbutton(self.estado_frame, text="🤖 Auto-pesaje",
+                                              variable=self.var_autopesaje,
+                                              command=self.cambiar_autopesaje,
+                                              state='disabled')
+        self.check_autopesaje.pack(side='right')
+        
+        self.label_rendimiento = tk.Label(self.estado_frame, text="",
+                                        bg=COLORES['fondo_panel'],
+                                        fg=COLORES['texto_secundario'],
+                                        font=FUENTES['pequena'])
+        self.label_rendimiento.pack(side='right', padx=(0, 10))
     
     def crear_tabla_fardos(self):
         """Crea la tabla para mostrar los fardos"""
@@ -187,6 +216,10 @@ class PanelFardos:
     
     def validar_numero_fardo(self, event=None):
         """Valida el número de fardo ingresado"""
+        if self.var_autopesaje.get():
+            # En auto-pesaje la captura no pasa por el botón
+            self.btn_pesar.configure(state='disabled')
+            return
         try:
             numero = self.entry_numero_fardo.get().strip()
             if numero and int(numero) > 0:
@@ -223,6 +256,7 @@ class PanelFardos:
         self.btn_nuevo_ticket.configure(state='normal')
         self.btn_export_csv.configure(state='normal')
         self.btn_export_pdf.configure(state='normal')
+        self.check_autopesaje.configure(state='normal')
         
         # Configurar primer fardo (editable)
         self.entry_numero_fardo.delete(0, tk.END)
@@ -248,9 +282,13 @@ class PanelFardos:
         self.btn_nuevo_ticket.configure(state='disabled')
         self.btn_export_csv.configure(state='disabled')
         self.btn_export_pdf.configure(state='disabled')
+        self.var_autopesaje.set(False)
+        self.check_autopesaje.configure(state='disabled')
+        self.label_rendimiento.configure(text="")
         
         self.entry_numero_fardo.delete(0, tk.END)
         self.label_peso_actual.configure(text="0.00 kg")
+        self.label_estabilidad.configure(text="")
         self.indicador_estado.configure(text="⏸️ Esperando ticket...",
                                       fg=COLORES['texto_secundario'])
         
@@ -262,27 +300,167 @@ class PanelFardos:
     def actualizar_peso_actual(self):
         """Actualiza el peso actual de la balanza"""
         if self.modo_pesaje_activo:
-            print("🔄 Actualizando peso en interfaz...")
             try:
-                peso = self.gestor.obtener_peso_balanza()
-                print(f"📊 Peso recibido en interfaz: {peso} kg")
-                self.label_peso_actual.configure(text=f"{peso:.2f} kg")
+                # Lectura de la instantánea: no toca el puerto serie
+                lectura = self.gestor.obtener_lectura_balanza()
+                self.label_peso_actual.configure(text=f"{lectura['peso']:.2f} kg")
+                if lectura['estable']:
+                    self.label_estabilidad.configure(text="● Estable", fg=COLORES['activo'])
+                else:
+                    self.label_estabilidad.configure(text="〰 Inestable", fg=COLORES['advertencia'])
+                # Tk dibuja en la próxima pasada ociosa: ahí se toma la latencia "mostrado"
+                self.parent.after_idle(self.gestor.marcar_lectura_mostrada, lectura)
+                
+                if self.var_autopesaje.get():
+                    self.evaluar_autopesaje(lectura)
             except Exception as e:
                 print(f"❌ Error al actualizar peso en interfaz: {e}")
                 self.label_peso_actual.configure(text="Error")
             
-            # Actualizar cada 1 segundo (cambiado de 500ms)
-            self.parent.after(1000, self.actualizar_peso_actual)
+            # Leer la instantánea es O(1), se puede refrescar más seguido
+            self.parent.after(100, self.actualizar_peso_actual)
+    
+    def cambiar_autopesaje(self):
+        """Activa o desactiva el modo auto-pesaje"""
+        if self.var_autopesaje.get():
+            # No capturar un fardo que ya estaba en la balanza al activar
+            lectura = self.gestor.obtener_lectura_balanza()
+            self.autopesaje_armado = lectura['peso'] <= AUTOPESAJE_CONFIG['umbral_cero']
+            self.carga_en_balanza = False
+            self.btn_pesar.configure(state='disabled')
+            if self.autopesaje_armado:
+                texto = "🤖 Auto-pesaje activo - Coloque el fardo"
+            else:
+                texto = "🤖 Auto-pesaje activo - Retire el peso de la balanza"
+            self.indicador_estado.configure(text=texto, fg=COLORES['primario'])
+            self.actualizar_rendimiento()
+        else:
+            self.validar_numero_fardo()
+            self.indicador_estado.configure(text="✅ Listo para pesar fardos",
+                                          fg=COLORES['exito'])
+    
+    def evaluar_autopesaje(self, lectura):
+        """Captura el fardo cuando la carga se asienta y rearma al volver a cero"""
+        peso = lectura['peso']
+        
+        if not self.autopesaje_armado:
+            if peso <= AUTOPESAJE_CONFIG['umbral_cero']:
+                self.autopesaje_armado = True
+                self.indicador_estado.configure(text="🤖 Auto-pesaje activo - Coloque el fardo",
+                                              fg=COLORES['primario'])
+            return
+        
+        if peso < AUTOPESAJE_CONFIG['umbral_carga']:
+            if self.carga_en_balanza:
+                # La carga se retiró antes de asentarse el tiempo mínimo
+                self.carga_en_balanza = False
+                self.registro_autopesaje.registrar_rechazo(
+                    self.ventana_principal.ticket_actual.numero, None, peso,
+                    "Carga retirada antes de estabilizarse")
+            return
+        
+        self.carga_en_balanza = True
+        if not lectura['estable'] or lectura['estable_desde'] is None:
+            return
+        if time.time() - lectura['estable_desde'] < AUTOPESAJE_CONFIG['permanencia_minima']:
+            return
+        
+        # Una sola captura por fardo: no se rearma hasta volver a cero
+        self.autopesaje_armado = False
+        self.carga_en_balanza = False
+        self.gestor.marcar_lectura_capturada(lectura)
+        self.capturar_automatico(lectura['valor_estable'], lectura['peso_crudo'])
+    
+    def capturar_automatico(self, peso, peso_crudo=None):
+        """Registra el fardo sin confirmaciones y avisa en pantalla y con sonido"""
+        ticket = self.ventana_principal.ticket_actual
+        try:
+            numero_fardo = int(self.entry_numero_fardo.get())
+            if any(f.numero == numero_fardo for f in ticket.fardos):
+                raise ValueError(f"Ya existe un fardo con el número {numero_fardo}")
+            
+            self.agregar_fardo(numero_fardo, peso, peso_crudo)
+            
+        except Exception as e:
+            numero = self.entry_numero_fardo.get().strip() or None
+            self.registro_autopesaje.registrar_rechazo(ticket.numero, numero, peso, str(e))
+            self.indicador_estado.configure(text=f"⚠️ Auto-pesaje rechazado: {e}",
+                                          fg=COLORES['peligro'])
+            self.parent.bell()
+            return
+        
+        self.registro_autopesaje.registrar_captura(ticket.numero, numero_fardo, peso)
+        self.indicador_estado.configure(
+            text=f"🤖 Fardo #{numero_fardo} capturado: {peso:.2f} kg - Retire el fardo",
+            fg=COLORES['activo'])
+        self.label_peso_actual.configure(fg=COLORES['activo'])
+        self.parent.after(800, lambda: self.label_peso_actual.configure(fg=COLORES['primario']))
+        if AUTOPESAJE_CONFIG['sonido']:
+            self.parent.bell()
+        self.actualizar_rendimiento()
+    
+    def actualizar_rendimiento(self):
+        """Muestra los fardos capturados en la última hora"""
+        self.label_rendimiento.configure(
+            text=f"{self.registro_autopesaje.fardos_por_hora()} fardos/h")
     
     def procesar_fardo(self):
         """Procesa un nuevo fardo"""
-        if not self.ventana_principal.ticket_actual:
+        if not self.ventana_principal.ticket_actual or self.esperando_estabilidad:
             return
         
         try:
-            peso = self.gestor.obtener_peso_balanza()
             numero_fardo = int(self.entry_numero_fardo.get())
-            
+        except ValueError:
+            messagebox.showerror("Error", "Ingrese un número de fardo válido")
+            return
+        
+        # Se registra con el valor estable, apenas la carga se asienta
+        self.esperar_peso_estable(self.registrar_fardo, numero_fardo)
+    
+    def esperar_peso_estable(self, callback, numero_fardo):
+        """Llama a callback(numero_fardo, peso, peso_crudo) cuando el peso de la balanza se estabiliza"""
+        lectura = self.gestor.obtener_lectura_balanza()
+        if lectura['estable']:
+            self.gestor.marcar_lectura_capturada(lectura)
+            callback(numero_fardo, lectura['valor_estable'], lectura['peso_crudo'])
+            return
+        
+        self.esperando_estabilidad = True
+        self._estado_previo = (self.indicador_estado.cget('text'),
+                               self.indicador_estado.cget('fg'))
+        self.indicador_estado.configure(text="⏳ Esperando que el peso se estabilice...",
+                                      fg=COLORES['advertencia'])
+        
+        limite = time.time() + BALANZA_CONFIG.get('estabilidad_espera_max', 5.0)
+        self._verificar_estabilidad(callback, numero_fardo, limite)
+    
+    def _verificar_estabilidad(self, callback, numero_fardo, limite):
+        """Consulta la instantánea hasta que el peso se estabilice o venza el límite"""
+        if not self.modo_pesaje_activo:
+            self.esperando_estabilidad = False
+            return
+        
+        lectura = self.gestor.obtener_lectura_balanza()
+        if not lectura['estable'] and time.time() < limite:
+            self.parent.after(50, self._verificar_estabilidad, callback, numero_fardo, limite)
+            return
+        
+        self.esperando_estabilidad = False
+        texto, color = self._estado_previo
+        self.indicador_estado.configure(text=texto, fg=color)
+        
+        if lectura['estable']:
+            self.gestor.marcar_lectura_capturada(lectura)
+            callback(numero_fardo, lectura['valor_estable'], lectura['peso_crudo'])
+        elif messagebox.askyesno("Peso Inestable",
+                                 f"El peso no se estabilizó ({lectura['peso']:.2f} kg).\n"
+                                 f"¿Desea usar este peso para el fardo #{numero_fardo}?"):
+            callback(numero_fardo, lectura['peso'], lectura['peso_crudo'])
+    
+    def registrar_fardo(self, numero_fardo, peso, peso_crudo=None):
+        """Registra el fardo con el peso capturado"""
+        try:
             # Verificar peso cero y confirmar
             if peso == 0.0:
                 if not messagebox.askyesno("Confirmar Peso Cero", 
@@ -303,48 +481,52 @@ class PanelFardos:
                                      f"¿Desea repesar el fardo #{numero_fardo}?\n"
                                      f"Peso anterior: {fardo_existente.peso:.2f} kg\n"
                                      f"Peso actual: {peso:.2f} kg"):
-                    self.repesar_fardo_existente(numero_fardo, peso)
+                    self.repesar_fardo_existente(numero_fardo, peso, peso_crudo)
                 return
             
-            # Agregar nuevo fardo
-            fardo = self.gestor.agregar_fardo(self.ventana_principal.ticket_actual, 
-                                            numero_fardo, peso)
-            
-            # Agregar a la tabla
-            self.tabla.insert('', 'end', values=(
-                fardo.numero,
-                f"{fardo.peso:.2f}",
-                fardo.hora_pesaje.strftime("%H:%M:%S")
-            ))
-            
-            # Actualizar contador
-            total_fardos = len(self.ventana_principal.ticket_actual.fardos)
-            self.label_contador.configure(text=f"({total_fardos} fardos)")
-            
-            # Preparar siguiente fardo
-            if not self.primer_fardo_ingresado:
-                self.primer_fardo_ingresado = True
-                self.indicador_estado.configure(text="✅ Listo para pesar fardos",
-                                              fg=COLORES['exito'])
-            
-            # Incrementar número automáticamente después del primer fardo
-            siguiente_numero = numero_fardo + 1
-            self.entry_numero_fardo.delete(0, tk.END)
-            self.entry_numero_fardo.insert(0, str(siguiente_numero))
-            
-            # Actualizar estadísticas
-            self.ventana_principal.panel_estadisticas.actualizar_datos(
-                self.ventana_principal.ticket_actual)
-            
-            # Actualizar estado
-            self.ventana_principal.actualizar_estado(MENSAJES['fardo_agregado'])
-            
-            # Agregar guardado automático
-            self.guardar_automatico()
+            self.agregar_fardo(numero_fardo, peso, peso_crudo)
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al procesar fardo: {str(e)}")
     
+    def agregar_fardo(self, numero_fardo, peso, peso_crudo=None):
+        """Agrega el fardo al ticket, la tabla y las estadísticas (sin confirmaciones)"""
+        # Agregar nuevo fardo
+        fardo = self.gestor.agregar_fardo(self.ventana_principal.ticket_actual, 
+                                        numero_fardo, peso, peso_crudo)
+        
+        # Agregar a la tabla
+        self.tabla.insert('', 'end', values=(
+            fardo.numero,
+            f"{fardo.peso:.2f}",
+            fardo.hora_pesaje.strftime("%H:%M:%S")
+        ))
+        
+        # Actualizar contador
+        total_fardos = len(self.ventana_principal.ticket_actual.fardos)
+        self.label_contador.configure(text=f"({total_fardos} fardos)")
+        
+        # Preparar siguiente fardo
+        if not self.primer_fardo_ingresado:
+            self.primer_fardo_ingresado = True
+            self.indicador_estado.configure(text="✅ Listo para pesar fardos",
+                                          fg=COLORES['exito'])
+        
+        # Incrementar número automáticamente después del primer fardo
+        siguiente_numero = numero_fardo + 1
+        self.entry_numero_fardo.delete(0, tk.END)
+        self.entry_numero_fardo.insert(0, str(siguiente_numero))
+        
+        # Actualizar estadísticas
+        self.ventana_principal.panel_estadisticas.actualizar_datos(
+            self.ventana_principal.ticket_actual)
+        
+        # Actualizar estado
+        self.ventana_principal.actualizar_estado(MENSAJES['fardo_agregado'])
+        
+        # Agregar guardado automático
+        self.guardar_automatico()
+    
     def repesar_fardo(self):
         """Repesa el fardo seleccionado"""
         seleccion = self.tabla.selection()
@@ -352,11 +534,16 @@ class PanelFardos:
             messagebox.showwarning("Advertencia", "Seleccione un fardo para repesar")
             return
         
+        if self.esperando_estabilidad:
+            return
+        
+        item = seleccion[0]
+        numero_fardo = int(self.tabla.item(item)['values'][0])
+        self.esperar_peso_estable(self.confirmar_repesaje, numero_fardo)
+    
+    def confirmar_repesaje(self, numero_fardo, peso_nuevo, peso_crudo=None):
+        """Confirma y aplica el repesaje con el peso capturado"""
         try:
-            item = seleccion[0]
-            numero_fardo = int(self.tabla.item(item)['values'][0])
-            peso_nuevo = self.gestor.obtener_peso_balanza()
-            
             # Verificar peso cero y confirmar
             if peso_nuevo == 0.0:
                 if not messagebox.askyesno("Confirmar Peso Cero", 
@@ -376,19 +563,16 @@ class PanelFardos:
                                      f"¿Confirma repesar el fardo #{numero_fardo}?\n"
                                      f"Peso anterior: {fardo_existente.peso:.2f} kg\n"
                                      f"Peso nuevo: {peso_nuevo:.2f} kg"):
-                    self.repesar_fardo_existente(numero_fardo, peso_nuevo)
+                    self.repesar_fardo_existente(numero_fardo, peso_nuevo, peso_crudo)
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al repesar fardo: {str(e)}")
     
-    def repesar_fardo_existente(self, numero_fardo, peso_nuevo):
+    def repesar_fardo_existente(self, numero_fardo, peso_nuevo, peso_crudo=None):
         """Actualiza el peso de un fardo existente"""
-        # Actualizar en el modelo
-        for fardo in self.ventana_principal.ticket_actual.fardos:
-            if fardo.numero == numero_fardo:
-                fardo.peso = peso_nuevo
-                fardo.hora_pesaje = self.gestor.obtener_hora_actual()
-                break
+        # Actualizar en el modelo (queda marcado para el próximo guardado)
+        fardo = self.gestor.repesar_fardo(self.ventana_principal.ticket_actual,
+                                          numero_fardo, peso_nuevo, peso_crudo)
         
         # Actualizar en la tabla
         for item in self.tabla.get_children():
@@ -522,7 +706,11 @@ class PanelFardos:
                                           fg=COLORES['primario'])
 
     def guardar_automatico(self):
-        """Guarda automáticamente el ticket después de cada fardo"""
+        """Encola el guardado del ticket después de cada fardo
+
+        Lo escribe el hilo del EscritorDiferido (varios fardos seguidos van en una
+        transacción); el "✅ Auto-guardado" aparece cuando llega el commit.
+        """
         if self.ventana_principal.ticket_actual:
             try:
                 # Obtener datos adicionales
@@ -530,15 +718,11 @@ class PanelFardos:
                 if self.ventana_principal.panel_estadisticas:
                     datos_adicionales = self.ventana_principal.panel_estadisticas.obtener_datos_adicionales()
             
-                # Guardar en base de datos
-                if self.ventana_principal.bd.guardar_ticket(self.ventana_principal.ticket_actual, datos_adicionales):
-                    self.ventana_principal.ticket_guardado = True
-                    # Actualizar botón guardar para mostrar que está guardado
-                    self.ventana_principal.btn_guardar.configure(text="✅ Auto-guardado")
-                    self.ventana_principal.root.after(2000, 
-                        lambda: self.ventana_principal.btn_guardar.configure(text="💾 Guardar"))
-                
-                    print(f"✅ Auto-guardado: Ticket {self.ventana_principal.ticket_actual.numero}")
+                # Encolar: no espera a la base de datos
+                ticket = self.ventana_principal.ticket_actual
+                self.ventana_principal.escritor.guardar(ticket, datos_adicionales,
+                                                        marca=self.gestor.marca_diario(ticket))
+                self.ventana_principal.ticket_guardado = False
             
             except Exception as e:
                 print(f"⚠️ Error en auto-guardado: {str(e)}")
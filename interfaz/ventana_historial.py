@@ -1,7 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from interfaz.estilos import EstilosModernos, WidgetsPersonalizados
-from config.configuracion import COLORES, FUENTES, DIMENSIONES
+from config.configuracion import COLORES, FUENTES, DIMENSIONES, BASE_DATOS_CONFIG
 from funciones.base_datos import BaseDatos
 from datetime import datetime
 
@@ -13,6 +13,8 @@ class VentanaHistorial:
         self.gestor = gestor
         self.callback_cargar_ticket = callback_cargar_ticket
         self.bd = BaseDatos()
+        self.pagina = BASE_DATOS_CONFIG.get('pagina_historial', 500) or None
+        self.cargados = 0
         
         self.ventana = tk.Toplevel(parent)
         self.configurar_ventana()
@@ -165,6 +167,11 @@ class VentanaHistorial:
             'Peligro.TButton', state='disabled')
         self.btn_eliminar.pack(side='left')
         
+        # Botón ver más (siguiente página del historial)
+        self.btn_mas = WidgetsPersonalizados.crear_boton_moderno(
+            botones_frame, "⬇️ Ver más", self.cargar_pagina, state='disabled')
+        self.btn_mas.pack(side='left', padx=(10, 0))
+        
         # Botón cerrar
         btn_cerrar = WidgetsPersonalizados.crear_boton_moderno(
             botones_frame, "❌ Cerrar", self.cerrar_ventana)
@@ -179,8 +186,15 @@ class VentanaHistorial:
         for item in self.tabla.get_children():
             self.tabla.delete(item)
         
-        # Obtener datos
-        historial = self.bd.obtener_historial_tickets()
+        self.cargados = 0
+        self.cargar_pagina()
+    
+    def cargar_pagina(self):
+        """Agrega a la tabla la siguiente página del historial"""
+        historial = self.bd.obtener_historial_tickets(self.pagina, self.cargados)
+        self.cargados += len(historial)
+        hay_mas = self.pagina is not None and len(historial) == self.pagina
+        self.btn_mas.configure(state='normal' if hay_mas else 'disabled')
         
         for ticket_data in historial:
             numero, fecha_creacion, cantidad_fardos, peso_total, fecha_guardado = ticket_data
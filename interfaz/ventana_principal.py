@@ -1,9 +1,13 @@
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
 from interfaz.estilos import EstilosModernos, WidgetsPersonalizados
 from config.configuracion import COLORES, FUENTES, DIMENSIONES, MENSAJES, BALANZA_CONFIG
 from funciones.gestor_fardos import GestorFardos
 from funciones.base_datos import BaseDatos
+from funciones.escritor_bd import EscritorDiferido
+from funciones.diario_ticket import aplicar_operaciones
+from funciones.modelos import Ticket
 from funciones.conexion_internet import VerificadorInternet
 
 class VentanaPrincipal:
@@ -11,9 +15,11 @@ class VentanaPrincipal:
         self.root = tk.Tk()
         self.gestor = GestorFardos()
         self.bd = BaseDatos()
+        self.escritor = EscritorDiferido(self.bd)  # Guardados fuera del hilo de Tk
         self.verificador_internet = VerificadorInternet(self.actualizar_estado_internet)
         self.ticket_actual = None
         self.ticket_guardado = False
+        self.esperando_guardados = False  # Cambio de ticket esperando al escritor
         
         # Inicializar atributos importantes
         self.panel_fardos = None
@@ -29,6 +35,12 @@ class VentanaPrincipal:
         # Iniciar verificación de internet
         self.verificador_internet.iniciar_verificacion_continua(30)
         
+        # Confirmaciones del escritor de la base de datos
+        self.procesar_resultados_guardado()
+        
+        # Ticket que quedó a medio pesar si la aplicación se cerró mal
+        self.root.after(100, self.recuperar_ticket_diario)
+        
     def configurar_ventana(self):
         """Configura la ventana principal"""
         self.root.title("Sistema de Pesaje de Fardos - v2.0")
@@ -181,8 +193,9 @@ class VentanaPrincipal:
         self.barra_estado.grid(row=2, column=0, columnspan=2, sticky='ew')
         self.barra_estado.grid_propagate(False)
         
-        # Estado de la balanza - MEJORADO para mostrar estado real
+        # Estado de la balanza: lo actualiza la cola del supervisor de conexión
         self.actualizar_indicador_balanza()
+        self.procesar_eventos_balanza()
         
         # Estado de internet
         self.indicador_internet = EstilosModernos.crear_indicador_estado(
@@ -215,17 +228,13 @@ class VentanaPrincipal:
                                 font=FUENTES['pequena'])
         self.label_estado.pack(side='right', padx=10, pady=8)
     
-    def actualizar_indicador_balanza(self):
+    def actualizar_indicador_balanza(self, estado=None):
         """Actualiza el indicador de estado de la balanza"""
         try:
-            estado = self.gestor.balanza.obtener_estado()
+            if estado is None:
+                estado = self.gestor.balanza.obtener_estado()
             
-            if estado['conectada']:
-                texto = f"Balanza: {estado['puerto']} OK"
-                color = COLORES['activo']
-            else:
-                texto = f"Balanza: {estado['puerto']} Desconectada"
-                color = COLORES['peligro']
+            texto, color = self.texto_estado_balanza(estado)
             
             # Si ya existe el indicador, actualizarlo
             if hasattr(self, 'indicador_balanza'):
@@ -248,9 +257,37 @@ class VentanaPrincipal:
                 self.indicador_balanza = EstilosModernos.crear_indicador_estado(
                     self.barra_estado, "Balanza: Error", COLORES['peligro'])
                 self.indicador_balanza.pack(side='left', padx=10, pady=8)
+    
+    def texto_estado_balanza(self, estado):
+        """Devuelve el texto y el color del indicador para un estado del supervisor"""
+        puerto = estado['puerto']
+        reintento = ""
+        if estado.get('proximo_reintento'):
+            segundos = max(0, estado['proximo_reintento'] - time.time())
+            reintento = f" (reintento en {segundos:.0f} s)"
+        
+        if estado.get('estado') == 'REPRODUCIENDO':
+            return "Balanza: Reproduciendo captura", COLORES['advertencia']
+        if estado['conectada']:
+            return f"Balanza: {puerto} OK", COLORES['activo']
+        if estado.get('estado') == 'CONECTANDO':
+            return f"Balanza: {puerto} Conectando...", COLORES['advertencia']
+        if estado.get('estado') == 'SIN_DATOS':
+            return f"Balanza: {puerto} Sin datos{reintento}", COLORES['advertencia']
+        return f"Balanza: {puerto} Desconectada{reintento}", COLORES['peligro']
+    
+    def procesar_eventos_balanza(self):
+        """Aplica los cambios de estado que publica el supervisor de la balanza"""
+        try:
+            eventos = self.gestor.balanza.obtener_eventos_estado()
+            if eventos:
+                # Solo importa el último estado de la tanda
+                self.actualizar_indicador_balanza(eventos[-1])
+        except Exception as e:
+            print(f"Error al procesar eventos de balanza: {e}")
         
-        # Programar próxima actualización
-        self.root.after(5000, self.actualizar_indicador_balanza)  # Cada 5 segundos
+        # Vaciar la cola es barato: no toca el puerto ni bloquea
+        self.root.after(200, self.procesar_eventos_balanza)
     
     def configurar_eventos(self):
         """Configura los eventos de teclado"""
@@ -350,28 +387,183 @@ class VentanaPrincipal:
             if self.panel_estadisticas:
                 datos_adicionales = self.panel_estadisticas.obtener_datos_adicionales()
             
-            # Guardar en base de datos
-            if self.bd.guardar_ticket(self.ticket_actual, datos_adicionales):
-                self.ticket_guardado = True
-                messagebox.showinfo("Éxito", f"Ticket {self.ticket_actual.numero} guardado correctamente")
-                self.actualizar_estado("Ticket guardado en base de datos")
-                
-                # Cambiar color del botón para indicar que está guardado
-                self.btn_guardar.configure(text="✅ Guardado")
-                self.root.after(2000, lambda: self.btn_guardar.configure(text="💾 Guardar"))
-            else:
-                messagebox.showerror("Error", "No se pudo guardar el ticket")
+            # Se escribe en segundo plano: la confirmación llega a procesar_resultados_guardado
+            self.escritor.guardar(self.ticket_actual, datos_adicionales, origen='manual',
+                                  marca=self.gestor.marca_diario(self.ticket_actual))
+            self.ticket_guardado = False
+            self.btn_guardar.configure(text="⏳ Guardando...")
                 
         except Exception as e:
             messagebox.showerror("Error", f"Error al guardar ticket: {str(e)}")
     
+    def procesar_resultados_guardado(self):
+        """Revisa cada 100 ms las confirmaciones del escritor de la base de datos"""
+        self.aplicar_resultados_guardado()
+        self.root.after(100, self.procesar_resultados_guardado)
+    
+    def aplicar_resultados_guardado(self, avisar: bool = True) -> list:
+        """Aplica los commits (o fallos) que informa el escritor de la base de datos
+
+        Devuelve los resultados aplicados; avisar=False no muestra ventanas (cierre).
+        """
+        resultados = []
+        try:
+            for resultado in self.escritor.obtener_resultados():
+                resultados.append(resultado)
+                ticket = resultado['ticket']
+                actual = ticket is self.ticket_actual
+                manual = resultado['origen'] == 'manual'
+                
+                if not resultado['ok']:
+                    if actual:
+                        self.ticket_guardado = False
+                        self.btn_guardar.configure(text="💾 Guardar")
+                    if manual and avisar:
+                        messagebox.showerror("Error", f"No se pudo guardar el ticket {ticket.numero}:\n"
+                                                      f"{resultado['error']}")
+                    else:
+                        # Sin ventana para no interrumpir el pesaje: se reintenta con el próximo fardo
+                        self.actualizar_estado(f"⚠️ Auto-guardado falló: {resultado['error']}")
+                    continue
+                
+                if resultado['durable']:
+                    # Lo guardado ya no hace falta en el diario
+                    self.gestor.confirmar_diario(ticket, resultado['marca'])
+                    otro_numero = self.ticket_actual is None or self.ticket_actual.numero != ticket.numero
+                    if (not actual and otro_numero and not self.escritor.pendiente(ticket)
+                            and not ticket.tiene_cambios()):
+                        # Ticket que no está en pantalla (recuperado) y ya quedó firme
+                        self.gestor.cerrar_diario(ticket, borrar=True)
+                if actual and not self.escritor.pendiente(ticket):
+                    self.ticket_guardado = True
+                    # El botón muestra el commit real, no el momento del clic
+                    self.btn_guardar.configure(text="✅ Guardado" if manual else "✅ Auto-guardado")
+                    self.root.after(2000, lambda: self.btn_guardar.configure(text="💾 Guardar"))
+                if manual:
+                    self.actualizar_estado("Ticket guardado en base de datos")
+                    if avisar:
+                        messagebox.showinfo("Éxito", f"Ticket {ticket.numero} guardado correctamente")
+                else:
+                    print(f"✅ Auto-guardado: Ticket {ticket.numero}")
+        except Exception as e:
+            print(f"Error al procesar resultados de guardado: {e}")
+        return resultados
+    
+    def esperar_guardados(self, continuar, limite=None):
+        """Llama a continuar() cuando el escritor terminó lo encolado (máximo 2 s)
+
+        Consulta con after() en lugar de bloquear: con la base en una carpeta de
+        red la pantalla no se congela mientras se escribe.
+        """
+        if limite is None:
+            limite = time.monotonic() + 2.0
+            self.esperando_guardados = True
+        if self.escritor.ocupado() and time.monotonic() < limite:
+            self.root.after(50, self.esperar_guardados, continuar, limite)
+            return
+        self.esperando_guardados = False
+        self.aplicar_resultados_guardado()
+        continuar()
+    
+    def soltar_ticket_actual(self):
+        """Cierra el diario del ticket que se deja de pesar
+
+        Se borra si el ticket está firme en la base o si el usuario lo descartó;
+        si quedó guardado pero sin consolidar, se conserva para recuperarlo.
+        """
+        if not self.ticket_actual:
+            return
+        firme = True
+        if self.ticket_guardado:
+            try:
+                firme = self.bd.consolidar()
+            except Exception as e:
+                print(f"⚠️ No se pudo consolidar la base: {e}")
+                firme = False
+        self.gestor.cerrar_diario(self.ticket_actual, borrar=firme)
+    
+    def recuperar_ticket_diario(self):
+        """Rehace los tickets que estaban abiertos cuando la aplicación se cayó
+
+        El más reciente vuelve a la pantalla; por cada uno de los demás se pregunta
+        si se recupera (se guarda en segundo plano). Los que no se recuperan quedan
+        en disco y se vuelven a ofrecer al próximo arranque.
+        """
+        for ruta, numero, fecha_creacion, operaciones in self.gestor.obtener_diarios_pendientes():
+            try:
+                if self.ticket_actual is None:
+                    self.recuperar_diario(ruta, numero, fecha_creacion, operaciones, mostrar=True)
+                elif messagebox.askyesno("Recuperar ticket",
+                                         f"El ticket {numero} quedó sin guardar "
+                                         f"({len(operaciones)} operaciones en el diario).\n"
+                                         f"¿Desea recuperarlo y guardarlo en la base de datos?"):
+                    self.recuperar_diario(ruta, numero, fecha_creacion, operaciones, mostrar=False)
+            except Exception as e:
+                print(f"⚠️ No se pudo recuperar el ticket {numero} del diario: {e}")
+    
+    def recuperar_diario(self, ruta, numero, fecha_creacion, operaciones, mostrar: bool):
+        """Rehace un ticket desde su diario; mostrar=False solo lo guarda"""
+        inicio = time.perf_counter()
+        
+        # Lo que ya estaba en la base más lo registrado en el diario
+        ticket = self.bd.cargar_ticket(numero)
+        if ticket is None:
+            ticket = Ticket(numero)
+            ticket.fecha_creacion = fecha_creacion
+        aplicadas = aplicar_operaciones(ticket, operaciones)
+        self.gestor.abrir_diario(ticket, conservar=True, ruta=ruta)
+        
+        if mostrar:
+            self.mostrar_ticket(ticket)
+            if ticket.tiene_cambios():
+                self.ticket_guardado = False
+                self.panel_fardos.guardar_automatico()
+        elif ticket.tiene_cambios():
+            # Con los datos del propio ticket: el panel muestra otro
+            self.escritor.guardar(ticket, self.datos_adicionales_ticket(ticket), origen='recuperado',
+                                  marca=self.gestor.marca_diario(ticket))
+        else:
+            self.gestor.cerrar_diario(ticket, borrar=True)  # Ya estaba todo en la base
+        
+        milisegundos = (time.perf_counter() - inicio) * 1000
+        print(f"♻️ Ticket {numero} recuperado del diario: {aplicadas} operaciones en {milisegundos:.1f} ms")
+        self.actualizar_estado(f"♻️ Ticket {numero} recuperado ({len(ticket.fardos)} fardos)")
+    
+    @staticmethod
+    def datos_adicionales_ticket(ticket) -> dict:
+        """Los datos adicionales de un ticket como los entrega el panel de estadísticas"""
+        kg_bruto_romaneo = getattr(ticket, 'kg_bruto_romaneo', None)
+        return {
+            'kg_bruto_romaneo': '' if kg_bruto_romaneo is None else str(kg_bruto_romaneo),
+            'agregado': str(getattr(ticket, 'agregado', 0.0) or 0.0),
+            'resto': str(getattr(ticket, 'resto', 0.0) or 0.0),
+            'observaciones': ticket.observaciones or '',
+        }
+    
     def abrir_historial(self):
         """Abre la ventana de historial"""
         from interfaz.ventana_historial import VentanaHistorial
-        VentanaHistorial(self.root, self.gestor, self.cargar_ticket_desde_historial)
+        historial = VentanaHistorial(self.root, self.gestor, self.cargar_ticket_desde_historial)
+        if self.escritor.ocupado():
+            # Se abre ya; cuando llega el último auto-guardado se refresca la lista
+            self.root.after(50, self.refrescar_historial, historial, time.monotonic() + 10.0)
+    
+    def refrescar_historial(self, historial, limite):
+        """Recarga el historial abierto cuando el escritor terminó lo encolado"""
+        if not historial.ventana.winfo_exists():
+            return
+        if self.escritor.ocupado() and time.monotonic() < limite:
+            self.root.after(100, self.refrescar_historial, historial, limite)
+            return
+        historial.cargar_historial()
     
     def cargar_ticket_desde_historial(self, numero_ticket: str):
-        """Carga un ticket desde el historial"""
+        """Carga un ticket desde el historial (cuando se escribió lo encolado)"""
+        if not self.esperando_guardados:
+            self.esperar_guardados(lambda: self.cambiar_a_ticket_historial(numero_ticket))
+    
+    def cambiar_a_ticket_historial(self, numero_ticket: str):
+        """Deja el ticket actual y pone en pantalla uno guardado"""
         try:
             # Verificar si hay un ticket actual sin guardar
             if self.ticket_actual and not self.ticket_guardado:
@@ -386,39 +578,51 @@ class VentanaPrincipal:
                 return
             
             # Configurar ticket actual
-            self.ticket_actual = ticket_cargado
-            self.ticket_guardado = True
-            
-            # Actualizar interfaz
-            self.entry_ticket.configure(state='normal')
-            self.entry_ticket.delete(0, tk.END)
-            self.entry_ticket.insert(0, ticket_cargado.numero)
-            self.entry_ticket.configure(state='disabled')
-            self.btn_crear_ticket.configure(state='disabled')
-            self.btn_guardar.configure(state='normal', text="💾 Actualizar")
-            
-            # Activar modo pesaje y cargar datos
-            if self.panel_fardos:
-                self.panel_fardos.activar_modo_pesaje()
-                self.panel_fardos.cargar_fardos_desde_ticket(ticket_cargado)
-            
-            if self.panel_estadisticas:
-                self.panel_estadisticas.actualizar_datos(ticket_cargado)
-                self.panel_estadisticas.cargar_datos_adicionales(ticket_cargado)
+            self.soltar_ticket_actual()
+            self.gestor.abrir_diario(ticket_cargado)
+            self.mostrar_ticket(ticket_cargado)
             
             self.actualizar_estado(f"Ticket {numero_ticket} cargado desde base de datos")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error al cargar ticket: {str(e)}")
     
+    def mostrar_ticket(self, ticket):
+        """Pone en pantalla un ticket ya guardado (cargado o recuperado)"""
+        self.ticket_actual = ticket
+        self.ticket_guardado = True
+        
+        # Actualizar interfaz
+        self.entry_ticket.configure(state='normal')
+        self.entry_ticket.delete(0, tk.END)
+        self.entry_ticket.insert(0, ticket.numero)
+        self.entry_ticket.configure(state='disabled')
+        self.btn_crear_ticket.configure(state='disabled')
+        self.btn_guardar.configure(state='normal', text="💾 Actualizar")
+        
+        # Activar modo pesaje y cargar datos
+        if self.panel_fardos:
+            self.panel_fardos.activar_modo_pesaje()
+            self.panel_fardos.cargar_fardos_desde_ticket(ticket)
+        
+        if self.panel_estadisticas:
+            self.panel_estadisticas.actualizar_datos(ticket)
+            self.panel_estadisticas.cargar_datos_adicionales(ticket)
+    
     def reiniciar_ticket(self):
-        """Reinicia para crear un nuevo ticket"""
+        """Reinicia para crear un nuevo ticket (cuando se escribió lo encolado)"""
+        if not self.esperando_guardados:
+            self.esperar_guardados(self.limpiar_ticket_actual)
+    
+    def limpiar_ticket_actual(self):
+        """Deja el ticket actual y prepara la pantalla para uno nuevo"""
         # Verificar si hay cambios sin guardar
         if self.ticket_actual and not self.ticket_guardado:
             if not messagebox.askyesno("Confirmar", 
                                      "Hay cambios sin guardar. ¿Desea continuar sin guardarlos?"):
                 return
         
+        self.soltar_ticket_actual()
         self.ticket_actual = None
         self.ticket_guardado = False
         self.entry_ticket.configure(state='normal')
@@ -443,20 +647,42 @@ class VentanaPrincipal:
     
     def cerrar_aplicacion(self):
         """Cierra la aplicación"""
-        # Verificar si hay cambios sin guardar
-        if self.ticket_actual and not self.ticket_guardado:
+        # Verificar si hay cambios sin guardar (lo que ya está encolado se escribe abajo)
+        if (self.ticket_actual and not self.ticket_guardado
+                and not self.escritor.pendiente(self.ticket_actual)):
             respuesta = messagebox.askyesnocancel("Confirmar Cierre", 
                                                 "Hay cambios sin guardar. ¿Desea guardar antes de salir?")
             if respuesta is None:  # Cancelar
                 return
             elif respuesta:  # Sí, guardar
                 self.guardar_ticket()
+            else:  # No: se descarta, tampoco se recupera al volver a abrir
+                self.gestor.cerrar_diario(self.ticket_actual, borrar=True)
         
         # Detener verificación de internet
         self.verificador_internet.detener_verificacion()
         
-        # Cerrar conexiones
+        # Escribir lo encolado, con tiempo máximo
+        escrito = self.escritor.cerrar()
+        # Los commits logrados también se aplican (diario, estado del ticket) por si se
+        # cancela el cierre; las ventanas las reemplaza la pregunta de abajo
+        fallidos = [r for r in self.aplicar_resultados_guardado(avisar=False) if not r['ok']]
+        if not escrito or fallidos:
+            if not messagebox.askyesno("Confirmar Cierre",
+                                       "No se pudieron guardar los últimos cambios del ticket.\n"
+                                       "¿Desea salir de todos modos?"):
+                if escrito:
+                    # El hilo ya terminó: otro escritor para los próximos guardados
+                    self.escritor = EscritorDiferido(self.bd)
+                return
+        elif self.ticket_actual:
+            # Todo escrito: el diario ya no hace falta (si la base está consolidada)
+            self.ticket_guardado = True
+            self.soltar_ticket_actual()
+        
+        # Cerrar conexiones (un diario que siga abierto se recupera al arrancar)
         self.gestor.cerrar()
+        self.bd.cerrar()
         
         # Cerrar ventana
         self.root.destroy()
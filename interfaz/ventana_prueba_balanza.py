@@ -1,10 +1,12 @@
+import os
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
 import time
 import serial.tools.list_ports
 from interfaz.estilos import EstilosModernos, WidgetsPersonalizados
-from config.configuracion import COLORES, FUENTES, DIMENSIONES, config_manager
+from config.configuracion import COLORES, FUENTES, DIMENSIONES, EXPORTACION_CONFIG, config_manager
+from funciones.protocolos import PROTOCOLOS
 
 class VentanaPruebaBalanza:
     """Ventana para probar la conexión con la balanza"""
@@ -69,6 +71,9 @@ class VentanaPruebaBalanza:
         # Panel de monitoreo
         self.crear_panel_monitoreo(main_frame)
         
+        # Panel de latencia
+        self.crear_panel_latencia(main_frame)
+        
         # Panel de datos recibidos
         self.crear_panel_datos_recibidos(main_frame)
         
@@ -123,8 +128,7 @@ class VentanaPruebaBalanza:
         
         # Combobox para protocolo
         self.combo_protocolo = ttk.Combobox(grid_frame, width=15, state='readonly',
-                                          values=["CONTINUO", "ESTANDAR", "TOLEDO", "AND", "OHAUS", 
-                                                 "METTLER", "CAS", "DIBAL", "DIGI", "GAMA"])
+                                          values=list(PROTOCOLOS))
         self.combo_protocolo.grid(row=1, column=1, sticky='ew', padx=(0, 20), pady=5)
         
         tk.Label(grid_frame, text="Timeout:", 
@@ -226,6 +230,32 @@ class VentanaPruebaBalanza:
                                        fg=COLORES['peligro'])
         self.lbl_ultimo_error.pack(side='left')
     
+    def crear_panel_latencia(self, parent):
+        """Crea el panel de latencia (desde que llegan los bytes hasta la pantalla)"""
+        latencia_frame = tk.LabelFrame(parent, 
+                                     text="⏱️ Latencia (p50 / p95 / p99 en ms)",
+                                     font=FUENTES['subtitulo'],
+                                     bg=COLORES['fondo_panel'],
+                                     fg=COLORES['texto_principal'])
+        latencia_frame.pack(fill='x', pady=(0, 15))
+        
+        contenido_frame = tk.Frame(latencia_frame, bg=COLORES['fondo_panel'])
+        contenido_frame.pack(fill='x', padx=15, pady=10)
+        
+        self.lbl_latencia = tk.Label(contenido_frame, 
+                                   text="Sin lecturas",
+                                   font=FUENTES['monospace'],
+                                   bg=COLORES['fondo_panel'],
+                                   fg=COLORES['texto_principal'],
+                                   justify='left', anchor='w')
+        self.lbl_latencia.pack(side='left', fill='x', expand=True)
+        
+        btn_exportar = tk.Button(contenido_frame, text="💾 Exportar", 
+                               command=self.exportar_latencia,
+                               bg=COLORES['secundario'], fg=COLORES['texto_blanco'],
+                               font=FUENTES['normal'], relief='flat', padx=10)
+        btn_exportar.pack(side='right')
+    
     def crear_panel_datos_recibidos(self, parent):
         """Crea el panel de datos recibidos"""
         # Frame con borde
@@ -366,13 +396,14 @@ class VentanaPruebaBalanza:
         """Monitorea la balanza en un hilo separado"""
         while self.monitoreo_activo and not self.ventana_cerrada:
             try:
-                # Obtener peso FRESCO
-                peso = self.balanza.obtener_peso()
+                # Última lectura publicada por el hilo de adquisición
+                lectura = self.balanza.obtener_lectura()
                 
                 # Actualizar interfaz solo si la ventana no está cerrada
                 if not self.ventana_cerrada:
-                    self.ventana.after(0, self.actualizar_peso, peso)
+                    self.ventana.after(0, self.actualizar_peso, lectura)
                     self.ventana.after(0, self.actualizar_estado_conexion)
+                    self.ventana.after(0, self.actualizar_latencia)
                     
                     # Actualizar datos recibidos
                     datos = self.balanza.obtener_datos_recibidos()
@@ -386,14 +417,54 @@ class VentanaPruebaBalanza:
             # Esperar menos tiempo para más responsividad
             time.sleep(0.3)
     
-    def actualizar_peso(self, peso):
-        """Actualiza el peso mostrado"""
+    def actualizar_peso(self, lectura):
+        """Actualiza el peso mostrado y la antigüedad de la lectura"""
         if not self.ventana_cerrada:
             try:
-                self.lbl_peso.config(text=f"{peso:.2f} kg")
+                self.lbl_peso.config(text=f"{lectura['peso']:.2f} kg")
+                if lectura['timestamp']:
+                    antiguedad = time.time() - lectura['timestamp']
+                    self.lbl_peso_titulo.config(
+                        text=f"Peso Actual (hace {antiguedad:.1f} s, "
+                             f"crudo {lectura['peso_crudo']:.2f} kg):")
+                else:
+                    self.lbl_peso_titulo.config(text="Peso Actual (sin lecturas):")
+                self.ventana.after_idle(self.gestor.marcar_lectura_mostrada, lectura)
             except:
                 pass
     
+    def actualizar_latencia(self):
+        """Muestra los percentiles de latencia y las tasas de tramas"""
+        if self.ventana_cerrada:
+            return
+        try:
+            resumen = self.balanza.latencia.obtener_resumen()
+            lineas = [f"Tramas/s: {resumen['tramas_por_segundo']:.1f}   "
+                      f"Lecturas/s: {resumen['lecturas_por_segundo']:.1f}   "
+                      f"Refrescos/s: {resumen['refrescos_por_segundo']:.1f}"]
+            for etapa, datos in resumen['etapas'].items():
+                if datos['muestras']:
+                    lineas.append(f"{etapa:<13}{datos['p50_ms']:8.2f} {datos['p95_ms']:8.2f} "
+                                  f"{datos['p99_ms']:8.2f}   (máx {datos['max_ms']:.2f}, "
+                                  f"n={datos['muestras']})")
+                else:
+                    lineas.append(f"{etapa:<13}{'-':>8} {'-':>8} {'-':>8}")
+            self.lbl_latencia.config(text="\n".join(lineas))
+        except:
+            pass
+    
+    def exportar_latencia(self):
+        """Guarda el resumen de latencia en un JSON de la carpeta de exportaciones"""
+        try:
+            carpeta = EXPORTACION_CONFIG['carpeta_destino']
+            if not os.path.exists(carpeta):
+                os.makedirs(carpeta)
+            ruta = os.path.join(carpeta, f"latencia_balanza_{time.strftime(EXPORTACION_CONFIG['formato_fecha'])}.json")
+            self.balanza.latencia.exportar_json(ruta)
+            messagebox.showinfo("Éxito", f"Métricas exportadas a:\n{ruta}", parent=self.ventana)
+        except Exception as e:
+            messagebox.showerror("Error", f"Error al exportar métricas: {str(e)}", parent=self.ventana)
+    
     def actualizar_estado_conexion(self):
         """Actualiza el estado de la conexión"""
         if self.ventana_cerrada:
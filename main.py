@@ -11,6 +11,7 @@ Compatibilidad: Windows 7+, Python 3.6+
 
 import sys
 import os
+import multiprocessing
 import tkinter as tk
 from tkinter import messagebox
 
@@ -117,4 +118,6 @@ Estructura de archivos requerida:
         input("Presione Enter para salir...")
 
 if __name__ == "__main__":
+    # Necesario para el proceso de adquisición en el ejecutable de PyInstaller
+    multiprocessing.freeze_support()
     main()
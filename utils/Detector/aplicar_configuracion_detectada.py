@@ -10,9 +10,14 @@ Fecha: 2024
 
 import json
 import os
+import sys
 import shutil
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from cache_deteccion import CacheDeteccion
+
 def mostrar_banner():
     """Muestra el banner del programa"""
     print("=" * 70)
@@ -152,6 +157,26 @@ def aplicar_configuracion(config_actual, config_detectada):
         print(f"❌ Error al aplicar configuración: {e}")
         return False
 
+def registrar_en_cache(config_detectada, info_deteccion):
+    """Registra la configuración aplicada para el adaptador en el cache del detector"""
+    hardware = (info_deteccion or {}).get('hardware')
+    if not hardware:
+        return False
+    try:
+        CacheDeteccion().guardar(hardware, {
+            'baudrate': config_detectada['baudrate'],
+            'protocolo': config_detectada['protocolo'],
+            'dtr': config_detectada.get('activar_dtr', True),
+            'rts': config_detectada.get('activar_rts', True),
+            'calidad': info_deteccion.get('calidad')
+        }, origen='aplicador')
+        print("💾 Adaptador registrado en el cache de detección")
+        return True
+        
+    except Exception as e:
+        print(f"⚠️ No se pudo registrar el adaptador en el cache: {e}")
+        return False
+
 def main():
     """Función principal"""
     mostrar_banner()
@@ -195,6 +220,7 @@ def main():
     respuesta = input("¿Desea continuar? (s/N): ").lower()
     if respuesta == 's':
         if aplicar_configuracion(config_actual, config_detectada):
+            registrar_en_cache(config_detectada, info_deteccion)
             print("\n🎉 ¡CONFIGURACIÓN APLICADA EXITOSAMENTE!")
             print("\n📋 PRÓXIMOS PASOS:")
             print("1. Reinicie el sistema principal de pesaje")
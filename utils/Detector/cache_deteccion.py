@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de Detección - Sistema de Pesaje de Fardos
+Guarda las configuraciones de balanza que funcionaron, identificadas por el
+hardware del puerto (VID/PID, número de serie y descripción del adaptador USB).
+Lo usan el detector (verifica la configuración guardada antes de barrer) y el
+aplicador de configuración (registra la configuración aplicada).
+
+Autor: Sistema de Pesaje
+Fecha: 2024
+"""
+
+import json
+import os
+from datetime import datetime
+
+# config/cache_deteccion.json en la raíz del proyecto
+RUTA_CACHE = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                          'config', 'cache_deteccion.json')
+
+
+def huella_hardware(puerto_info):
+    """Datos que identifican al adaptador, sin importar el nombre del puerto (COM3, ttyUSB0...)"""
+    if hasattr(puerto_info, 'device'):
+        # Entrada de serial.tools.list_ports
+        return {
+            'vid': puerto_info.vid,
+            'pid': puerto_info.pid,
+            'serie': puerto_info.serial_number,
+            'descripcion': puerto_info.description,
+            'puerto': puerto_info.device,
+        }
+    return {
+        'vid': puerto_info.get('vid'),
+        'pid': puerto_info.get('pid'),
+        'serie': puerto_info.get('serie'),
+        'descripcion': puerto_info.get('descripcion'),
+        'puerto': puerto_info.get('puerto'),
+    }
+
+
+def clave_hardware(huella):
+    """Clave del cache: VID:PID:serie para USB; nombre y descripción para puertos nativos"""
+    if huella.get('vid') is not None:
+        return f"{huella['vid']:04X}:{huella['pid'] or 0:04X}:{huella.get('serie') or '-'}"
+    # Puerto integrado en la placa: no tiene identificador propio
+    return f"{huella.get('puerto')}:{huella.get('descripcion') or '-'}"
+
+
+class CacheDeteccion:
+    """Configuraciones que funcionaron, por adaptador"""
+
+    def __init__(self, ruta=RUTA_CACHE):
+        self.ruta = ruta
+        self.entradas = {}
+        self.cargar()
+
+    def cargar(self):
+        """Lee el archivo de cache (vacío si no existe o está dañado)"""
+        try:
+            if os.path.exists(self.ruta):
+                with open(self.ruta, 'r', encoding='utf-8') as f:
+                    self.entradas = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Cache de detección ilegible, se ignora: {e}")
+            self.entradas = {}
+
+    def guardar_archivo(self):
+        """Escribe el cache (a un temporal y luego reemplaza, para no dejarlo a medias)"""
+        os.makedirs(os.path.dirname(self.ruta), exist_ok=True)
+        temporal = self.ruta + '.tmp'
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump(self.entradas, f, indent=4, ensure_ascii=False)
+        os.replace(temporal, self.ruta)
+
+    def buscar(self, huella):
+        """Configuración guardada para el adaptador o None"""
+        return self.entradas.get(clave_hardware(huella))
+
+    def guardar(self, huella, configuracion, origen='detector'):
+        """Registra (o actualiza) la configuración que funcionó con el adaptador"""
+        clave = clave_hardware(huella)
+        anterior = self.entradas.get(clave, {})
+        self.entradas[clave] = {
+            'vid': huella.get('vid'),
+            'pid': huella.get('pid'),
+            'serie': huella.get('serie'),
+            'descripcion': huella.get('descripcion'),
+            'ultimo_puerto': huella.get('puerto'),
+            'baudrate': configuracion['baudrate'],
+            'protocolo': configuracion['protocolo'],
+            'dtr': configuracion['dtr'],
+            'rts': configuracion['rts'],
+            'calidad': configuracion.get('calidad'),
+            'origen': origen,
+            'fecha': datetime.now().isoformat(),
+            'verificaciones': anterior.get('verificaciones', 0),
+        }
+        self.guardar_archivo()
+
+    def marcar_verificada(self, huella, puerto):
+        """Cuenta una verificación exitosa y recuerda el puerto donde apareció"""
+        entrada = self.buscar(huella)
+        if entrada is None:
+            return
+        entrada['verificaciones'] = entrada.get('verificaciones', 0) + 1
+        entrada['ultimo_puerto'] = puerto
+        entrada['ultima_verificacion'] = datetime.now().isoformat()
+        self.guardar_archivo()
+
+    def eliminar(self, huella):
+        """Olvida la configuración de un adaptador (dejó de funcionar)"""
+        if self.entradas.pop(clave_hardware(huella), None) is not None:
+            self.guardar_archivo()
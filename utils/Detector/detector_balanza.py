@@ -11,11 +11,27 @@ Fecha: 2024
 import serial
 import serial.tools.list_ports
 import time
-import re
 import json
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+# Permitir importar los módulos del sistema principal (raíz del proyecto)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from funciones.lector_tramas import LectorTramas
+from funciones.protocolos import PROTOCOLOS, obtener_decodificador
+from cache_deteccion import CacheDeteccion, huella_hardware
+
+# Bytes que puede mandar una balanza bien configurada (ASCII imprimible, CR, LF, STX, ETX)
+_BYTES_VALIDOS = bytes(range(0x20, 0x7f)) + b'\r\n\x02\x03\t'
+
+# Orden de desempate entre protocolos con la misma firma (GAMA D2002E usa el formato A&D)
+PREFERENCIA_HUELLA = ['GAMA', 'AND', 'CAS', 'TOLEDO', 'METTLER', 'OHAUS']
+
 
 class DetectorBalanza:
     """Detector automático de configuración de balanza"""
@@ -26,18 +42,12 @@ class DetectorBalanza:
 
         # Configuraciones a probar
         self.puertos_disponibles = []
-        self.baudrates = [1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200]
+        # Ordenados por probabilidad: las balanzas de plataforma casi siempre vienen a 9600
+        self.baudrates = [9600, 19200, 4800, 2400, 1200, 38400, 57600, 115200]
+        # Protocolos registrados en funciones/protocolos.py (comando y decodificador)
         self.protocolos = {
-            'CONTINUO': {'comando': b'', 'descripcion': 'Lectura continua (sin comando)'},
-            'ESTANDAR': {'comando': b'P\r\n', 'descripcion': 'Comando P estándar'},
-            'TOLEDO': {'comando': b'W\r\n', 'descripcion': 'Protocolo Toledo'},
-            'AND': {'comando': b'Q\r\n', 'descripcion': 'Protocolo AND'},
-            'OHAUS': {'comando': b'IP\r\n', 'descripcion': 'Protocolo Ohaus'},
-            'METTLER': {'comando': b'S\r\n', 'descripcion': 'Protocolo Mettler'},
-            'CAS': {'comando': b'R\r\n', 'descripcion': 'Protocolo CAS'},
-            'DIBAL': {'comando': b'P\r', 'descripcion': 'Protocolo Dibal'},
-            'DIGI': {'comando': b'W', 'descripcion': 'Protocolo Digi'},
-            'GAMA': {'comando': b'\r\n', 'descripcion': 'Protocolo GAMA'}
+            nombre: {'comando': clase.comando, 'descripcion': clase.descripcion}
+            for nombre, clase in PROTOCOLOS.items()
         }
 
         self.configuraciones_dtr_rts = [
@@ -47,6 +57,31 @@ class DetectorBalanza:
             {'dtr': False, 'rts': False, 'descripcion': 'DTR y RTS desactivados'}
         ]
 
+        # Límites del barrido
+        self.calidad_objetivo = 90        # Cortar al encontrar una configuración con esta calidad
+        self.presupuesto_segundos = 300   # Tiempo máximo del barrido completo
+        self.hilos_maximos = 8            # Puertos probados en paralelo
+        self.tiempo_estabilizacion = 0.2  # Espera tras abrir el puerto
+        self.tiempo_respuesta = 1.0       # Espera máxima de la respuesta a un comando
+        self.ventana_huella = 0.8         # Escucha pasiva por baudrate antes de enviar comandos
+        self.tramas_huella = 5            # Tramas suficientes para identificar el protocolo
+        self.basura_maxima = 0.15         # Proporción de bytes inválidos que descarta un baudrate
+        self.detallado = True             # Mostrar cada línea recibida (se apaga en el barrido)
+
+        # Configuraciones que ya funcionaron con cada adaptador USB
+        self.cache = CacheDeteccion()
+        self.usar_cache = True
+
+        # Estado del barrido (compartido entre hilos)
+        self._lock = threading.Lock()
+        self._cortar = threading.Event()
+        self.pruebas_totales = 0
+        self.pruebas_hechas = 0
+        self.inicio_barrido = None
+        self.fin_barrido = None
+        self.pruebas = []                 # Registro de cada prueba (para el reporte JSON)
+        self._ultima_prueba = {}          # Fin de la última prueba de cada puerto
+
     def mostrar_banner(self):
         """Muestra el banner del programa"""
         print("=" * 80)
@@ -70,7 +105,10 @@ class DetectorBalanza:
                 self.puertos_disponibles.append({
                     'puerto': puerto.device,
                     'descripcion': puerto.description,
-                    'fabricante': puerto.manufacturer or 'Desconocido'
+                    'fabricante': puerto.manufacturer or 'Desconocido',
+                    'vid': puerto.vid,
+                    'pid': puerto.pid,
+                    'serie': puerto.serial_number
                 })
 
             if self.puertos_disponibles:
@@ -106,16 +144,19 @@ class DetectorBalanza:
                 dsrdtr=False
             ) as ser:
 
-                # Configurar DTR y RTS
-                ser.setDTR(dtr_rts['dtr'])
-                ser.setRTS(dtr_rts['rts'])
+                # Configurar DTR y RTS (un pty o un socket no tienen estas líneas)
+                try:
+                    ser.setDTR(dtr_rts['dtr'])
+                    ser.setRTS(dtr_rts['rts'])
+                except (serial.SerialException, OSError):
+                    pass
 
                 # Limpiar buffers
                 ser.reset_input_buffer()
                 ser.reset_output_buffer()
 
                 # Esperar un momento para estabilizar
-                time.sleep(0.5)
+                time.sleep(self.tiempo_estabilizacion)
 
                 # Probar protocolo
                 resultado = self.probar_protocolo(ser, protocolo)
@@ -133,7 +174,8 @@ class DetectorBalanza:
                         'timestamp': datetime.now().isoformat()
                     }
 
-                    self.configuraciones_detectadas.append(configuracion)
+                    with self._lock:
+                        self.configuraciones_detectadas.append(configuracion)
                     return configuracion
 
                 return None
@@ -158,45 +200,52 @@ class DetectorBalanza:
 
     def escuchar_datos_continuos(self, conexion):
         """Escucha datos de balanzas que envían continuamente - MEJORADO"""
-        buffer = ""
+        lector = LectorTramas()
+        decodificador = obtener_decodificador('CONTINUO')
+        tramas = []
         datos_recibidos = []
         tiempo_inicio = time.time()
 
-        print("🔍 Escuchando datos continuos...")
+        bytes_recibidos = 0
+
+        if self.detallado:
+            print("🔍 Escuchando datos continuos...")
 
         while time.time() - tiempo_inicio < 4:  # Escuchar por 4 segundos
             if conexion.in_waiting:
                 try:
-                    byte = conexion.read().decode('ascii', errors='ignore')
-
-                    if byte in ['\r', '\n']:
-                        if buffer.strip():
-                            linea = buffer.strip()
+                    bytes_recibidos += conexion.in_waiting
+                    for trama in lector.leer(conexion):
+                        if trama.strip():
+                            tramas.append(trama)
+                            linea = trama.decode('ascii', errors='ignore').strip()
                             datos_recibidos.append(linea)
-                            print(f"📡 Recibido: '{linea}'")
+                            if self.detallado:
+                                print(f"📡 Recibido: '{linea}'")
 
-                            # Si tenemos suficientes muestras, analizar
-                            if len(datos_recibidos) >= 3:
-                                break
-                        buffer = ""
-                    else:
-                        buffer += byte
+                    # Si tenemos suficientes muestras, analizar
+                    if len(datos_recibidos) >= 3:
+                        break
 
                 except Exception as e:
-                    print(f"⚠️ Error leyendo byte: {e}")
+                    print(f"⚠️ Error leyendo datos: {e}")
                     continue
+            elif not bytes_recibidos and time.time() - tiempo_inicio > 1.5:
+                # Una balanza continua transmite varias veces por segundo: puerto mudo
+                break
             else:
                 time.sleep(0.01)
 
         if datos_recibidos:
-            print(f"📊 Analizando {len(datos_recibidos)} líneas recibidas...")
+            if self.detallado:
+                print(f"📊 Analizando {len(datos_recibidos)} líneas recibidas...")
 
             # Analizar todos los datos
             pesos_detectados = []
-            for dato in datos_recibidos:
-                peso = self._extraer_peso_de_cadena(dato)
-                if peso >= 0:  # Incluir peso 0 como válido
-                    pesos_detectados.append(peso)
+            for trama in tramas:
+                lectura = decodificador.decodificar(trama)
+                if lectura and lectura.peso >= 0:  # Incluir peso 0 como válido
+                    pesos_detectados.append(lectura.peso)
 
             if pesos_detectados:
                 # Calcular estadísticas
@@ -204,9 +253,10 @@ class DetectorBalanza:
                 peso_min = min(pesos_detectados)
                 peso_max = max(pesos_detectados)
 
-                print(f"✅ Pesos detectados: {pesos_detectados}")
-                print(
-                    f"📈 Promedio: {peso_promedio:.2f}, Min: {peso_min:.2f}, Max: {peso_max:.2f}")
+                if self.detallado:
+                    print(f"✅ Pesos detectados: {pesos_detectados}")
+                    print(
+                        f"📈 Promedio: {peso_promedio:.2f}, Min: {peso_min:.2f}, Max: {peso_max:.2f}")
 
                 calidad = self.calcular_calidad_lectura(
                     pesos_detectados, datos_recibidos)
@@ -224,31 +274,39 @@ class DetectorBalanza:
                     }
                 }
 
-        print("❌ No se recibieron datos válidos")
+        if self.detallado:
+            print("❌ No se recibieron datos válidos")
         return {'exito': False}
 
     def enviar_comando_y_leer(self, conexion, comando, protocolo):
         """Envía comando y lee respuesta"""
         try:
-            # Enviar comando
-            conexion.write(comando)
-            time.sleep(0.5)
-
-            # Leer respuesta
-            respuestas = []
+            decodificador = obtener_decodificador(protocolo)
+            lector = LectorTramas()
+            tramas = []
             for _ in range(3):  # Intentar 3 veces
-                respuesta = conexion.readline().decode('ascii', errors='ignore').strip()
-                if respuesta:
-                    respuestas.append(respuesta)
-                time.sleep(0.2)
+                # Enviar comando
+                conexion.write(comando)
+                limite = time.time() + self.tiempo_respuesta
+                recibidas = []
+                while not recibidas and time.time() < limite:
+                    if conexion.in_waiting:
+                        recibidas = [t.strip() for t in lector.leer(conexion) if t.strip()]
+                    else:
+                        time.sleep(0.01)
+                if not recibidas:
+                    break  # Sin respuesta al comando: no tiene sentido insistir
+                tramas.extend(recibidas)
+
+            if tramas:
+                respuestas = [t.decode('ascii', errors='ignore') for t in tramas]
 
-            if respuestas:
-                # Analizar respuestas
+                # Analizar respuestas con el decodificador del protocolo
                 pesos_detectados = []
-                for respuesta in respuestas:
-                    peso = self.extraer_peso_de_cadena(respuesta)
-                    if peso > 0:
-                        pesos_detectados.append(peso)
+                for trama in tramas:
+                    lectura = decodificador.decodificar(trama)
+                    if lectura and lectura.peso > 0:
+                        pesos_detectados.append(lectura.peso)
 
                 if pesos_detectados:
                     peso_promedio = sum(pesos_detectados) / \
@@ -268,107 +326,6 @@ class DetectorBalanza:
         except Exception as e:
             return {'exito': False, 'error': str(e)}
 
-    def extraer_peso_de_cadena(self, cadena):
-        """Extrae el peso de una cadena"""
-        try:
-            # Buscar números con punto decimal
-            patron_decimal = r'[-+]?\s*\d+\.\d+'
-            match = re.search(patron_decimal, cadena)
-            if match:
-                return float(match.group().replace(' ', ''))
-
-            # Buscar números enteros
-            patron_entero = r'[-+]?\s*\d+'
-            match = re.search(patron_entero, cadena)
-            if match:
-                return float(match.group().replace(' ', ''))
-
-            return 0.0
-
-        except:
-            return 0.0
-
-    def _extraer_peso_de_cadena(self, cadena):
-        """Extrae el peso de una cadena - MEJORADO para todas las balanzas"""
-        try:
-            print(f"🔍 Analizando: '{cadena}' (len: {len(cadena)})")
-
-            # Limpiar la cadena
-            cadena_limpia = cadena.strip()
-
-            # Patrones específicos para diferentes balanzas
-
-            # 1. Balanza GAMA - Formato: ST,GS,+000000
-            if "ST,GS," in cadena_limpia:
-                match = re.search(r'ST,GS,([+-]?\d+)', cadena_limpia)
-                if match:
-                    numero = int(match.group(1))
-                    # Convertir según el formato de tu balanza
-                    peso = numero / 100.0  # Ajustar divisor según necesidad
-                    print(f"✅ GAMA detectado: {numero} -> {peso:.2f} kg")
-                    return peso
-
-            # 2. Detectar mensajes de peso cero
-            patrones_cero = ["000000", "0000000", "+000000",
-                             "+0000000", "no weight", "sin peso"]
-            if any(patron in cadena_limpia.lower() for patron in patrones_cero):
-                print("🔄 Peso cero detectado")
-                return 0.0
-
-            # 3. Formato con unidades explícitas (ej: "25.34 kg", "1234 g")
-            patron_con_unidad = r'([-+]?\s*\d+\.?\d*)\s*(kg|g|lb)'
-            match = re.search(patron_con_unidad, cadena_limpia.lower())
-            if match:
-                numero = float(match.group(1).replace(' ', ''))
-                unidad = match.group(2)
-                if unidad == 'g':
-                    numero = numero / 1000.0  # Convertir gramos a kg
-                elif unidad == 'lb':
-                    numero = numero * 0.453592  # Convertir libras a kg
-                print(f"✅ Con unidad {unidad}: {numero:.2f} kg")
-                return numero
-
-            # 4. Números con punto decimal
-            patron_decimal = r'[-+]?\s*\d+\.\d+'
-            match = re.search(patron_decimal, cadena_limpia)
-            if match:
-                numero_str = match.group().replace(' ', '')
-                peso = float(numero_str)
-                print(f"✅ Decimal: '{numero_str}' -> {peso:.2f} kg")
-                return peso
-
-            # 5. Números enteros grandes (probablemente en gramos)
-            patron_entero_grande = r'[-+]?\s*\d{4,}'
-            match = re.search(patron_entero_grande, cadena_limpia)
-            if match:
-                numero_str = match.group().replace(' ', '')
-                numero = float(numero_str)
-                if numero > 1000:
-                    peso = numero / 1000.0  # Asumir gramos
-                    print(
-                        f"✅ Entero grande (g->kg): '{numero_str}' -> {peso:.2f} kg")
-                    return peso
-                else:
-                    print(
-                        f"✅ Entero grande: '{numero_str}' -> {numero:.2f} kg")
-                    return numero
-
-            # 6. Cualquier número
-            patron_numero = r'[-+]?\s*\d+'
-            match = re.search(patron_numero, cadena_limpia)
-            if match:
-                numero_str = match.group().replace(' ', '')
-                peso = float(numero_str)
-                print(f"✅ Número: '{numero_str}' -> {peso:.2f} kg")
-                return peso
-
-            print(f"❌ No se extrajo peso de: '{cadena}'")
-            return 0.0
-
-        except Exception as e:
-            print(f"⚠️ Error extrayendo peso: {e}")
-            return 0.0
-
     def calcular_calidad_lectura(self, pesos, respuestas_crudas):
         """Calcula la calidad de la lectura - MEJORADO"""
         if not pesos:
@@ -429,41 +386,393 @@ class DetectorBalanza:
 
         return round(calidad_total)
 
-    def ejecutar_deteccion_completa(self):
-        """Ejecuta la detección completa"""
-        print("🔍 Iniciando detección automática de balanza...")
-        print()
+    # === IDENTIFICACIÓN PASIVA (HUELLA) ===
 
-        total_pruebas = len(self.puertos_disponibles) * len(self.baudrates) * \
-            len(self.protocolos) * len(self.configuraciones_dtr_rts)
-        prueba_actual = 0
-
-        for puerto_info in self.puertos_disponibles:
-            puerto = puerto_info['puerto']
-            print(f"📡 Probando puerto {puerto}...")
-
-            for baudrate in self.baudrates:
-                for protocolo in self.protocolos:
-                    for dtr_rts in self.configuraciones_dtr_rts:
-                        prueba_actual += 1
-                        progreso = (prueba_actual / total_pruebas) * 100
+    @staticmethod
+    def tasa_basura(datos):
+        """Proporción de bytes que una balanza bien configurada nunca manda"""
+        if not datos:
+            return 0.0
+        # Con el baudrate equivocado aparecen bytes altos y de control (errores de trama)
+        return len(datos.translate(None, _BYTES_VALIDOS)) / len(datos)
+
+    def identificar_protocolo(self, tramas):
+        """Clasifica tramas contra las firmas conocidas y devuelve candidatos ordenados"""
+        if not tramas:
+            return []
+
+        candidatos = []
+        for nombre, clase in PROTOCOLOS.items():
+            if clase.firma is None:
+                continue
+            decodificador = clase()
+            coinciden = sum(1 for trama in tramas
+                            if clase.firma.search(trama) and decodificador.decodificar(trama))
+            if coinciden:
+                candidatos.append({'protocolo': nombre, 'puntaje': coinciden / len(tramas)})
+
+        # Sin firma conocida: si hay números, sirve la lectura continua genérica
+        continuo = obtener_decodificador('CONTINUO')
+        decodificadas = sum(1 for trama in tramas if continuo.decodificar(trama))
+        if decodificadas:
+            candidatos.append({'protocolo': 'CONTINUO',
+                               'puntaje': decodificadas / len(tramas) * 0.5})
+
+        orden = {nombre: i for i, nombre in enumerate(PREFERENCIA_HUELLA)}
+        candidatos.sort(key=lambda c: (-c['puntaje'], orden.get(c['protocolo'], 99)))
+        return candidatos
+
+    def escuchar_huella(self, puerto, baudrate, dtr_rts=None):
+        """Escucha un puerto sin mandar nada; corta apenas sabe si el baudrate sirve"""
+        if dtr_rts is None:
+            dtr_rts = self.configuraciones_dtr_rts[0]
+        resultado = {'estado': 'silencio', 'tramas': [], 'basura': 0.0, 'bytes': 0}
+        try:
+            with serial.Serial(port=puerto, baudrate=baudrate, timeout=0.05) as ser:
+                try:
+                    ser.setDTR(dtr_rts['dtr'])
+                    ser.setRTS(dtr_rts['rts'])
+                except (serial.SerialException, OSError):
+                    pass
+                ser.reset_input_buffer()
 
-                        print(
-                            f"\r   Progreso: {progreso:.1f}% - {baudrate} bps, {protocolo}, {dtr_rts['descripcion']}", end='', flush=True)
+                lector = LectorTramas()
+                crudo = bytearray()
+                limite = time.time() + self.ventana_huella
+                while time.time() < limite:
+                    datos = ser.read(ser.in_waiting or 1)
+                    if not datos:
+                        continue
+                    crudo += datos
+                    resultado['tramas'].extend(t for t in lector.alimentar(datos) if t.strip())
+
+                    # Errores de trama: con 32 bytes ya se nota un baudrate equivocado
+                    if len(crudo) >= 32 and self.tasa_basura(crudo) > self.basura_maxima:
+                        resultado['estado'] = 'basura'
+                        break
+                    if len(resultado['tramas']) >= self.tramas_huella:
+                        break
+                else:
+                    if crudo and not resultado['tramas']:
+                        # Bytes sin terminadores: tampoco es este baudrate
+                        resultado['estado'] = 'basura'
+
+                resultado['bytes'] = len(crudo)
+                resultado['basura'] = self.tasa_basura(crudo)
+                if resultado['estado'] != 'basura' and resultado['tramas']:
+                    resultado['estado'] = 'datos'
+        except Exception as e:
+            resultado['estado'] = 'error'
+            resultado['error'] = str(e)
+        return resultado
+
+    def huella_puerto(self, puerto):
+        """Identifica una balanza continua solo escuchando. Devuelve (configuración, estado)"""
+        for baudrate in self.ordenar_baudrates():
+            if self._debe_cortar():
+                return None, 'cortado'
+            escucha = self.escuchar_huella(puerto, baudrate)
+
+            if escucha['estado'] in ('silencio', 'error'):
+                # Una balanza que transmite manda bytes a cualquier baudrate: el puerto está mudo
+                return None, escucha['estado']
+            if escucha['estado'] == 'basura':
+                continue
+
+            candidatos = [c for c in self.identificar_protocolo(escucha['tramas'])
+                          if c['protocolo'] in self.protocolos]
+            if not candidatos:
+                continue
+
+            mejor = candidatos[0]['protocolo']
+            decodificador = obtener_decodificador(mejor)
+            pesos = []
+            for trama in escucha['tramas']:
+                lectura = decodificador.decodificar(trama)
+                if lectura:
+                    pesos.append(lectura.peso)
+            lineas = [t.decode('ascii', errors='ignore').strip() for t in escucha['tramas']]
+            dtr_rts = self.configuraciones_dtr_rts[0]
+
+            configuracion = {
+                'puerto': puerto,
+                'baudrate': baudrate,
+                'protocolo': mejor,
+                'dtr': dtr_rts['dtr'],
+                'rts': dtr_rts['rts'],
+                'peso_detectado': sum(pesos) / len(pesos) if pesos else 0.0,
+                'respuesta_cruda': lineas,
+                'calidad': self.calcular_calidad_lectura(pesos, lineas),
+                'candidatos': candidatos,
+                'metodo': 'huella',
+                'timestamp': datetime.now().isoformat()
+            }
+            with self._lock:
+                self.configuraciones_detectadas.append(configuracion)
+            return configuracion, 'identificado'
+
+        return None, 'desconocido'
+
+    # === CACHE POR ADAPTADOR ===
+
+    def huella_de(self, puerto):
+        """Huella de hardware de un puerto de la lista detectada"""
+        for info in self.puertos_disponibles:
+            if info['puerto'] == puerto:
+                return huella_hardware(info)
+        return huella_hardware({'puerto': puerto})
+
+    def verificar_configuracion_guardada(self, puerto, entrada):
+        """Una sola prueba corta de la configuración guardada para el adaptador"""
+        dtr_rts = {'dtr': entrada['dtr'], 'rts': entrada['rts']}
+        protocolo = entrada['protocolo']
+        clase = PROTOCOLOS.get(protocolo)
+
+        if protocolo == 'CONTINUO' or (clase is not None and clase.firma is not None):
+            # Balanza continua: alcanza con escuchar y reconocer el formato
+            escucha = self.escuchar_huella(puerto, entrada['baudrate'], dtr_rts)
+            if escucha['estado'] == 'datos':
+                candidatos = self.identificar_protocolo(escucha['tramas'])
+                puntajes = {c['protocolo']: c['puntaje'] for c in candidatos}
+                minimo = 0.4 if protocolo == 'CONTINUO' else 0.8
+                if puntajes.get(protocolo, 0) >= minimo:
+                    decodificador = obtener_decodificador(protocolo)
+                    pesos = [l.peso for l in map(decodificador.decodificar, escucha['tramas']) if l]
+                    lineas = [t.decode('ascii', errors='ignore').strip() for t in escucha['tramas']]
+                    configuracion = {
+                        'puerto': puerto,
+                        'baudrate': entrada['baudrate'],
+                        'protocolo': protocolo,
+                        'dtr': entrada['dtr'],
+                        'rts': entrada['rts'],
+                        'peso_detectado': sum(pesos) / len(pesos) if pesos else 0.0,
+                        'respuesta_cruda': lineas,
+                        'calidad': self.calcular_calidad_lectura(pesos, lineas),
+                        'timestamp': datetime.now().isoformat()
+                    }
+                    with self._lock:
+                        self.configuraciones_detectadas.append(configuracion)
+                    return configuracion
+            # Puede ser una balanza por comando que también tiene firma: se prueba el comando
+        return self.probar_configuracion(puerto, entrada['baudrate'], protocolo, dtr_rts)
+
+    def verificar_cache(self):
+        """Prueba la configuración guardada de cada puerto conocido. Devuelve las que funcionan"""
+        verificadas = []
+        for info in self.puertos_disponibles:
+            huella = huella_hardware(info)
+            entrada = self.cache.buscar(huella)
+            if not entrada or entrada['protocolo'] not in self.protocolos or \
+                    entrada['baudrate'] not in self.baudrates:
+                continue
+
+            print(f"💾 {info['puerto']}: configuración guardada para este adaptador "
+                  f"({entrada['baudrate']} bps, {entrada['protocolo']}) - verificando...")
+            inicio = time.time()
+            config = self.verificar_configuracion_guardada(info['puerto'], entrada)
+            self._anotar_prueba(info['puerto'], entrada['baudrate'], entrada['protocolo'],
+                                config, time.time() - inicio, 'cache')
+            if config:
+                config['metodo'] = 'cache'
+                self.cache.marcar_verificada(huella, info['puerto'])
+                verificadas.append(config)
+                print(f"   ✅ Verificada: {config['peso_detectado']:.2f} kg "
+                      f"(calidad {config['calidad']}%)")
+            else:
+                print("   ⚠️ No respondió con la configuración guardada")
+        return verificadas
+
+    def guardar_en_cache(self):
+        """Guarda la mejor configuración encontrada en cada puerto"""
+        mejores = {}
+        for config in self.configuraciones_detectadas:
+            actual = mejores.get(config['puerto'])
+            if actual is None or config['calidad'] > actual['calidad']:
+                mejores[config['puerto']] = config
+        for puerto, config in mejores.items():
+            try:
+                self.cache.guardar(self.huella_de(puerto), config)
+            except Exception as e:
+                print(f"⚠️ No se pudo guardar en el cache de detección: {e}")
 
-                        config = self.probar_configuracion(
-                            puerto, baudrate, protocolo, dtr_rts)
-                        if config:
-                            print(f"\n   ✅ Configuración válida encontrada!")
-                            print(
-                                f"      Peso detectado: {config['peso_detectado']:.2f} kg")
-                            print(f"      Calidad: {config['calidad']}%")
+    def ordenar_baudrates(self):
+        """Baudrates a probar, empezando por el configurado actualmente"""
+        try:
+            from config.configuracion import BALANZA_CONFIG
+            actual = BALANZA_CONFIG.get('baudrate')
+        except Exception:
+            actual = None
+        if actual in self.baudrates:
+            return [actual] + [b for b in self.baudrates if b != actual]
+        return list(self.baudrates)
+
+    def ejecutar_deteccion_completa(self, presupuesto_segundos=None, calidad_objetivo=None):
+        """Ejecuta la detección completa probando los puertos en paralelo"""
+        if presupuesto_segundos is not None:
+            self.presupuesto_segundos = presupuesto_segundos
+        if calidad_objetivo is not None:
+            self.calidad_objetivo = calidad_objetivo
 
-            print()  # Nueva línea después de cada puerto
+        print("🔍 Iniciando detección automática de balanza...")
+        self.inicio_barrido = time.time()
+        self.pruebas = []
+
+        # Adaptadores conocidos: una prueba corta evita todo el barrido
+        if self.usar_cache:
+            if self.verificar_cache():
+                self.fin_barrido = time.time()
+                print("\n🎯 Detección completada con la configuración guardada "
+                      f"({len(self.configuraciones_detectadas)} puerto(s) verificados).")
+                return
+
+        print(f"   Presupuesto: {self.presupuesto_segundos} s - "
+              f"Calidad objetivo: {self.calidad_objetivo}%")
+        print()
 
+        self.pruebas_totales = len(self.puertos_disponibles) * len(self.baudrates) * \
+            len(self.protocolos) * len(self.configuraciones_dtr_rts)
+        self.pruebas_hechas = 0
+        self.inicio_barrido = time.time()
+        self._ultima_prueba = {}
+        self._cortar.clear()
+
+        # Cada puerto se barre en su propio hilo; dentro de un puerto las pruebas son secuenciales
+        detallado = self.detallado
+        self.detallado = False
+        hilos = max(1, min(self.hilos_maximos, len(self.puertos_disponibles)))
+        try:
+            with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+                list(ejecutor.map(self._barrer_puerto,
+                                  [p['puerto'] for p in self.puertos_disponibles]))
+        finally:
+            self.detallado = detallado
+
+        self.fin_barrido = time.time()
+        duracion = self.fin_barrido - self.inicio_barrido
+        print()
+        if self._cortar.is_set() and self.configuraciones_detectadas and \
+                max(c['calidad'] for c in self.configuraciones_detectadas) >= self.calidad_objetivo:
+            print(f"🎯 Calidad objetivo alcanzada en {duracion:.1f} s")
+        elif self._cortar.is_set():
+            print(f"⏱️ Se agotó el presupuesto de {self.presupuesto_segundos} s")
         print(
             f"\n🎯 Detección completada. Encontradas {len(self.configuraciones_detectadas)} configuraciones válidas.")
 
+        if self.configuraciones_detectadas and self.usar_cache:
+            self.guardar_en_cache()
+
+    def _barrer_puerto(self, puerto):
+        """Prueba baudrates, protocolos y DTR/RTS de un puerto, en orden de probabilidad"""
+        baudrates = self.ordenar_baudrates()
+        combinaciones = self.configuraciones_dtr_rts
+        protocolos_comando = [p for p in self.protocolos if p != 'CONTINUO']
+        pruebas_por_baudrate = len(self.protocolos) * len(combinaciones)
+        self._ultima_prueba[puerto] = time.time()
+
+        # 0. Huella pasiva: una balanza continua se reconoce en las primeras tramas
+        estado = None
+        if self.protocolos_pasivos():
+            config, estado = self.huella_puerto(puerto)
+            if config:
+                self._descontar_pruebas(len(baudrates) * pruebas_por_baudrate - 1)
+                self._registrar_prueba(puerto, config['baudrate'], config['protocolo'], config)
+                return
+        # Mudo con DTR/RTS activados: la escucha solo se repite con las otras combinaciones
+        combinaciones_escucha = combinaciones[1:] if estado == 'silencio' else combinaciones
+        if estado == 'silencio':
+            self._descontar_pruebas(len(baudrates))
+        if 'CONTINUO' not in self.protocolos:
+            combinaciones_escucha = []
+
+        for i, baudrate in enumerate(baudrates):
+            # 1. Escuchar: una balanza continua no necesita comandos
+            for j, dtr_rts in enumerate(combinaciones_escucha):
+                if self._debe_cortar():
+                    return
+                config = self.probar_configuracion(puerto, baudrate, 'CONTINUO', dtr_rts)
+                self._registrar_prueba(puerto, baudrate, 'CONTINUO', config)
+                if config:
+                    # Flujo continuo decodificado: los comandos y otros baudrates sobran
+                    restantes = (len(combinaciones_escucha) - j - 1) + \
+                        len(protocolos_comando) * len(combinaciones) + \
+                        (len(baudrates) - i - 1) * pruebas_por_baudrate
+                    self._descontar_pruebas(restantes)
+                    return
+
+            # 2. Protocolos por comando
+            for protocolo in protocolos_comando:
+                for dtr_rts in combinaciones:
+                    if self._debe_cortar():
+                        return
+                    config = self.probar_configuracion(puerto, baudrate, protocolo, dtr_rts)
+                    self._registrar_prueba(puerto, baudrate, protocolo, config)
+
+    def _debe_cortar(self):
+        """True si se alcanzó la calidad objetivo o se agotó el presupuesto"""
+        if self._cortar.is_set():
+            return True
+        if time.time() - self.inicio_barrido >= self.presupuesto_segundos:
+            self._cortar.set()
+            return True
+        return False
+
+    def _descontar_pruebas(self, cantidad):
+        """Saca del total las pruebas que ya no hace falta correr"""
+        with self._lock:
+            self.pruebas_totales -= cantidad
+
+    def protocolos_pasivos(self):
+        """Protocolos seleccionados que se pueden reconocer solo escuchando"""
+        return [nombre for nombre in self.protocolos
+                if nombre == 'CONTINUO' or PROTOCOLOS[nombre].firma is not None]
+
+    def _anotar_prueba(self, puerto, baudrate, protocolo, config, duracion, metodo):
+        """Guarda una prueba en el registro del barrido"""
+        with self._lock:
+            self.pruebas.append({
+                'puerto': puerto,
+                'baudrate': baudrate,
+                'protocolo': protocolo,
+                'metodo': metodo,
+                'exito': config is not None,
+                'calidad': config['calidad'] if config else 0,
+                'duracion_s': round(duracion, 3),
+                'inicio_s': round(time.time() - duracion - self.inicio_barrido, 3),
+            })
+
+    def _registrar_prueba(self, puerto, baudrate, protocolo, config):
+        """Actualiza el progreso, estima el tiempo restante y avisa de los hallazgos"""
+        # Las pruebas de un puerto son secuenciales: dura desde el fin de la anterior
+        ahora = time.time()
+        duracion = ahora - self._ultima_prueba.get(puerto, self.inicio_barrido)
+        self._ultima_prueba[puerto] = ahora
+        metodo = (config or {}).get('metodo') or ('escucha' if protocolo == 'CONTINUO' else 'comando')
+        self._anotar_prueba(puerto, baudrate, protocolo, config, duracion, metodo)
+
+        with self._lock:
+            self.pruebas_hechas += 1
+            hechas = self.pruebas_hechas
+            totales = max(self.pruebas_totales, hechas)
+
+        transcurrido = time.time() - self.inicio_barrido
+        restante = transcurrido / hechas * (totales - hechas)
+        restante = min(restante, max(0.0, self.presupuesto_segundos - transcurrido))
+        progreso = hechas / totales * 100
+
+        if config:
+            print(f"\n   ✅ {puerto} @ {baudrate} bps, {protocolo}: "
+                  f"{config['peso_detectado']:.2f} kg (calidad {config['calidad']}%)")
+            if config.get('candidatos'):
+                ranking = ", ".join(f"{c['protocolo']} {c['puntaje']:.0%}"
+                                    for c in config['candidatos'][:4])
+                print(f"      Identificada por huella: {ranking}")
+            if config['calidad'] >= self.calidad_objetivo:
+                self._cortar.set()
+
+        print(f"\r   Progreso: {progreso:5.1f}% ({hechas}/{totales}) - "
+              f"ETA {restante:4.0f} s - {puerto} {baudrate} bps {protocolo:<9}",
+              end='', flush=True)
+
     def seleccionar_mejor_configuracion(self):
         """Selecciona la mejor configuración basada en calidad"""
         if not self.configuraciones_detectadas:
@@ -476,6 +785,61 @@ class DetectorBalanza:
 
         return self.mejor_configuracion
 
+    def clasificar_resultado(self, margen=10):
+        """'encontrada', 'ambigua' o 'nada'
+
+        Es ambigua si otra configuración con distinto puerto o baudrate queda a menos
+        de `margen` puntos de calidad de la mejor (dos balanzas, o un eco dudoso).
+        """
+        mejor = self.seleccionar_mejor_configuracion()
+        if mejor is None:
+            return 'nada'
+        for config in self.configuraciones_detectadas[1:]:
+            distinta = (config['puerto'], config['baudrate']) != (mejor['puerto'], mejor['baudrate'])
+            if distinta and mejor['calidad'] - config['calidad'] < margen:
+                return 'ambigua'
+        return 'encontrada'
+
+    def generar_reporte(self, margen=10):
+        """Resultado del barrido como diccionario serializable a JSON"""
+        resultado = self.clasificar_resultado(margen)
+
+        def resumir(config):
+            return {
+                'puerto': config['puerto'],
+                'baudrate': config['baudrate'],
+                'protocolo': config['protocolo'],
+                'dtr': config['dtr'],
+                'rts': config['rts'],
+                'calidad': config['calidad'],
+                'peso_detectado': round(config['peso_detectado'], 3),
+                'metodo': config.get('metodo', 'escucha' if config['protocolo'] == 'CONTINUO'
+                                      else 'comando'),
+                'respuesta_cruda': config['respuesta_cruda'][:3],
+                'hardware': self.huella_de(config['puerto']),
+            }
+
+        fin = self.fin_barrido or time.time()
+        return {
+            'resultado': resultado,
+            'ganador': resumir(self.mejor_configuracion) if resultado != 'nada' else None,
+            'candidatos': [resumir(c) for c in self.configuraciones_detectadas],
+            'pruebas': sorted(self.pruebas, key=lambda p: p['inicio_s']),
+            'puertos': self.puertos_disponibles,
+            'parametros': {
+                'baudrates': self.baudrates,
+                'protocolos': list(self.protocolos),
+                'presupuesto_segundos': self.presupuesto_segundos,
+                'calidad_objetivo': self.calidad_objetivo,
+                'margen_ambiguedad': margen,
+                'cache': self.usar_cache,
+            },
+            'duracion_s': round(fin - self.inicio_barrido, 3) if self.inicio_barrido else 0.0,
+            'presupuesto_agotado': bool(self._cortar.is_set() and not any(
+                c['calidad'] >= self.calidad_objetivo for c in self.configuraciones_detectadas)),
+            'fecha': datetime.now().isoformat(),
+        }
+
     def mostrar_resultados(self):
         """Muestra los resultados de la detección"""
         if not self.configuraciones_detectadas:
@@ -530,7 +894,9 @@ class DetectorBalanza:
                     'peso_detectado': self.mejor_configuracion['peso_detectado'],
                     'calidad': self.mejor_configuracion['calidad'],
                     # Solo primeras 3 respuestas
-                    'respuesta_cruda': self.mejor_configuracion['respuesta_cruda'][:3]
+                    'respuesta_cruda': self.mejor_configuracion['respuesta_cruda'][:3],
+                    # Para que el aplicador registre el adaptador en el cache
+                    'hardware': self.huella_de(self.mejor_configuracion['puerto'])
                 }
             }
 
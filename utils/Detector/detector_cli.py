@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Detector de Balanza sin interfaz - Sistema de Pesaje de Fardos
+Corre el barrido de DetectorBalanza sin preguntar nada y entrega un reporte JSON
+(pruebas con sus tiempos, calidad de cada candidato y la configuración ganadora).
+Pensado para instalar muchas PCs de pesaje con un script y para pruebas de
+regresión contra el emulador.
+
+El progreso va a stderr (o a ningún lado con --silencioso); stdout queda solo
+para el JSON. Códigos de salida:
+    0  configuración encontrada
+    3  resultado ambiguo (más de un candidato con calidad parecida)
+    4  no se encontró nada
+    1  error inesperado          (2 lo usa argparse para argumentos inválidos)
+
+Ejemplos:
+    python detector_cli.py --presupuesto 60 --salida reporte.json
+    python detector_cli.py --puerto /dev/pts/3 --protocolos GAMA,CONTINUO --sin-cache
+
+Autor: Sistema de Pesaje
+Fecha: 2024
+"""
+
+import os
+import sys
+import json
+import fnmatch
+import argparse
+import contextlib
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from detector_balanza import DetectorBalanza
+from funciones.protocolos import PROTOCOLOS
+
+SALIDA_ENCONTRADA = 0
+SALIDA_ERROR = 1
+SALIDA_AMBIGUA = 3
+SALIDA_NADA = 4
+
+CODIGOS_SALIDA = {
+    'encontrada': SALIDA_ENCONTRADA,
+    'ambigua': SALIDA_AMBIGUA,
+    'nada': SALIDA_NADA,
+}
+
+
+def lista_enteros(texto):
+    """'9600,19200' -> [9600, 19200]"""
+    try:
+        return [int(valor) for valor in texto.split(',') if valor.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"lista de números inválida: '{texto}'")
+
+
+def lista_protocolos(texto):
+    """'GAMA,and' -> ['GAMA', 'AND'] (solo protocolos registrados)"""
+    nombres = [valor.strip().upper() for valor in texto.split(',') if valor.strip()]
+    desconocidos = [n for n in nombres if n not in PROTOCOLOS]
+    if desconocidos:
+        raise argparse.ArgumentTypeError(
+            f"protocolo(s) desconocido(s): {', '.join(desconocidos)} "
+            f"(disponibles: {', '.join(PROTOCOLOS)})")
+    return nombres
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        description="Detección de balanza sin interfaz, con reporte JSON y códigos de salida")
+    parser.add_argument('--puerto', action='append', default=[],
+                        help="Puerto a probar aunque no aparezca en la lista del sistema "
+                             "(repetible; ej. un pty del emulador)")
+    parser.add_argument('--filtro', action='append', default=[],
+                        help="Patrón de los puertos a probar, ej. 'COM*' o '/dev/ttyUSB*' (repetible)")
+    parser.add_argument('--baudrates', type=lista_enteros,
+                        help="Baudrates a probar, separados por coma (default: todos)")
+    parser.add_argument('--protocolos', type=lista_protocolos,
+                        help=f"Protocolos a probar, separados por coma (default: {','.join(PROTOCOLOS)})")
+    parser.add_argument('--presupuesto', type=float, default=120.0,
+                        help="Tiempo máximo del barrido en segundos (default: 120)")
+    parser.add_argument('--calidad', type=int, default=90,
+                        help="Calidad que corta el barrido (default: 90)")
+    parser.add_argument('--margen', type=int, default=10,
+                        help="Puntos de calidad por debajo de la mejor que la vuelven ambigua (default: 10)")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="No usar ni actualizar el cache de configuraciones por adaptador")
+    parser.add_argument('--exportar', action='store_true',
+                        help="Generar también balanza_config_detectada.json/.py para el aplicador")
+    parser.add_argument('--salida', help="Archivo donde guardar el reporte (además de stdout)")
+    parser.add_argument('--silencioso', action='store_true',
+                        help="No mostrar el progreso en stderr")
+    return parser
+
+
+def seleccionar_puertos(detector, args):
+    """Aplica --filtro a los puertos del sistema y agrega los de --puerto"""
+    if args.filtro:
+        detector.puertos_disponibles = [
+            p for p in detector.puertos_disponibles
+            if any(fnmatch.fnmatch(p['puerto'], patron) for patron in args.filtro)
+        ]
+    conocidos = {p['puerto'] for p in detector.puertos_disponibles}
+    for puerto in args.puerto:
+        if puerto not in conocidos:
+            detector.puertos_disponibles.append({
+                'puerto': puerto, 'descripcion': 'Indicado por línea de comandos',
+                'fabricante': 'Desconocido', 'vid': None, 'pid': None, 'serie': None
+            })
+
+
+def ejecutar(args):
+    """Corre la detección y devuelve el reporte"""
+    detector = DetectorBalanza()
+    detector.detallado = False
+    detector.usar_cache = not args.sin_cache
+    if args.baudrates:
+        detector.baudrates = args.baudrates
+    if args.protocolos:
+        detector.protocolos = {nombre: detector.protocolos[nombre] for nombre in args.protocolos}
+
+    # Con --puerto solo se prueban los puertos indicados (salvo que haya --filtro)
+    if not args.puerto or args.filtro:
+        detector.detectar_puertos()
+    seleccionar_puertos(detector, args)
+
+    if detector.puertos_disponibles:
+        detector.ejecutar_deteccion_completa(args.presupuesto, args.calidad)
+    else:
+        print("❌ Ningún puerto para probar")
+
+    reporte = detector.generar_reporte(args.margen)
+    if args.exportar and reporte['ganador']:
+        detector.exportar_configuracion()
+    return reporte
+
+
+def main(argv=None):
+    """Función principal"""
+    args = crear_parser().parse_args(argv)
+
+    # Todo lo que imprime el detector va a stderr: stdout es solo el JSON
+    destino = open(os.devnull, 'w') if args.silencioso else sys.stderr
+    try:
+        with contextlib.redirect_stdout(destino):
+            reporte = ejecutar(args)
+    except KeyboardInterrupt:
+        print("👋 Detección interrumpida", file=sys.stderr)
+        return SALIDA_ERROR
+    except Exception as e:
+        print(json.dumps({'resultado': 'error', 'error': str(e)}, ensure_ascii=False))
+        return SALIDA_ERROR
+    finally:
+        if args.silencioso:
+            destino.close()
+
+    texto = json.dumps(reporte, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, 'w', encoding='utf-8') as f:
+            f.write(texto)
+    print(texto)
+    return CODIGOS_SALIDA[reporte['resultado']]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
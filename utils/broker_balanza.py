@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Broker de balanza - Sistema de Pesaje de Fardos
+Abre el puerto serie de la balanza una sola vez y lo comparte por TCP y/o
+socket Unix. En la aplicación (y en la ventana de prueba, o en otra PC) se
+configura como puerto 'tcp://127.0.0.1:7700' o 'unix:///tmp/balanza.sock'.
+
+Ejemplos:
+    python utils/broker_balanza.py                         # puerto de BALANZA_CONFIG, tcp://127.0.0.1:7700
+    python utils/broker_balanza.py --puerto COM3 --escuchar tcp://0.0.0.0:7700
+    python utils/broker_balanza.py --escuchar unix:///tmp/balanza.sock --escuchar tcp://127.0.0.1:7700
+
+Con 0.0.0.0 cualquier PC de la red puede leer el peso: abrir el puerto en el firewall.
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.configuracion import BALANZA_CONFIG
+from funciones.broker_balanza import BrokerBalanza
+from funciones.conexion_balanza import ConexionBalanza
+from funciones.puerto_socket import es_url_socket
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Comparte la balanza por TCP / socket Unix")
+    parser.add_argument('--puerto', help="Puerto serie (default: puerto_serie de BALANZA_CONFIG)")
+    parser.add_argument('--escuchar', action='append', default=[],
+                        help="Dirección de escucha tcp://host:puerto o unix:///ruta (repetible; "
+                             "default: tcp://127.0.0.1:7700)")
+    parser.add_argument('--cola', type=int, default=256,
+                        help="Tramas en cola por cliente antes de descartar las viejas (default: 256)")
+    args = parser.parse_args()
+
+    puerto = args.puerto or BALANZA_CONFIG.get('puerto_serie')
+    if es_url_socket(puerto):
+        print(f"❌ El broker necesita el puerto serie real, no '{puerto}' (use --puerto)")
+        return 1
+    BALANZA_CONFIG['puerto_serie'] = puerto
+
+    balanza = ConexionBalanza()
+    broker = BrokerBalanza(balanza, args.escuchar or ['tcp://127.0.0.1:7700'], args.cola)
+    try:
+        broker.iniciar()
+    except (OSError, ValueError) as e:
+        print(f"❌ No se pudo iniciar el broker: {e}")
+        balanza.cerrar()
+        return 1
+    print("👉 Ctrl+C para terminar")
+
+    try:
+        while True:
+            time.sleep(10)
+            estado = broker.obtener_estado()
+            clientes = ", ".join(f"{c['direccion']} ({c['modo']}, {c['descartados']} descartadas)"
+                                 for c in estado['clientes']) or "ninguno"
+            print(f"📊 {estado['balanza']['estado']} - {estado['balanza']['tramas_recibidas']} tramas "
+                  f"- clientes: {clientes}")
+    except KeyboardInterrupt:
+        print("\n👋 Broker detenido")
+    finally:
+        broker.detener()
+        balanza.cerrar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consulta de telemetría - Sistema de Pesaje de Fardos
+Resume o exporta a CSV un rango de la telemetría de la balanza
+(BALANZA_CONFIG['telemetria']). Ejemplos:
+    python utils/consultar_telemetria.py --desde "2024-05-02 08:00" --hasta "2024-05-02 12:00"
+    python utils/consultar_telemetria.py --desde 2024-05-02 --nivel 1m --csv turno.csv
+"""
+
+import os
+import sys
+import csv
+import argparse
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config.configuracion import BALANZA_CONFIG
+from funciones.telemetria import LectorTelemetria, NIVELES
+
+
+def leer_fecha(texto):
+    """'AAAA-MM-DD' o 'AAAA-MM-DD HH:MM[:SS]'"""
+    for formato in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(texto, formato)
+        except ValueError:
+            continue
+    raise argparse.ArgumentTypeError(f"Fecha inválida: {texto}")
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Consulta la telemetría de la balanza")
+    parser.add_argument('--desde', type=leer_fecha, required=True)
+    parser.add_argument('--hasta', type=leer_fecha,
+                        help="Fin del rango (default: un día después de --desde)")
+    parser.add_argument('--nivel', choices=list(NIVELES), default='1s')
+    parser.add_argument('--rol', default='fardos', help="Balanza (rol) a consultar")
+    parser.add_argument('--carpeta', help="Carpeta de telemetría (default: la configurada)")
+    parser.add_argument('--csv', help="Exportar las filas a este archivo")
+    args = parser.parse_args()
+
+    carpeta = args.carpeta or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        BALANZA_CONFIG.get('carpeta_telemetria', 'telemetria'), args.rol)
+    hasta = args.hasta or args.desde + timedelta(days=1)
+
+    with LectorTelemetria(carpeta).consultar(args.desde, hasta, args.nivel) as resultado:
+        filas = len(resultado)
+        print(f"📈 {filas} filas ({args.nivel}) entre {args.desde} y {hasta}")
+        if not filas:
+            return 1
+
+        if args.csv:
+            with open(args.csv, 'w', newline='', encoding='utf-8') as archivo:
+                escritor = csv.writer(archivo)
+                escritor.writerow(['hora'] + resultado.nombres[1:])
+                for fila in resultado.filas():
+                    hora = datetime.fromtimestamp(fila[0] / 1e9).isoformat(timespec='milliseconds')
+                    escritor.writerow([hora] + [round(v, 3) if isinstance(v, float) else v
+                                                for v in fila[1:]])
+            print(f"✅ Exportado a {args.csv}")
+        else:
+            columna = 'peso' if args.nivel == 'crudo' else 'media'
+            valores = resultado.columna(columna)
+            print(f"   Peso: mínimo {min(valores):.2f} kg, máximo {max(valores):.2f} kg, "
+                  f"promedio {sum(valores) / len(valores):.2f} kg")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Emulador de balanza - Sistema de Pesaje de Fardos
+Crea un pseudo-terminal que transmite como una balanza real, para probar la
+aplicación, el detector o el rendimiento sin hardware conectado.
+
+Solo Linux. Ejemplo:
+    python utils/emular_balanza.py --protocolo TOLEDO --baudrate 115200 --tramas 200 --fallas 0.01
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from funciones.protocolos import PROTOCOLOS
+from funciones.simulador_balanza import EmuladorBalanza, EscenarioFardos
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Emulador de balanza sobre pty")
+    parser.add_argument('--protocolo', default='GAMA', choices=list(PROTOCOLOS),
+                        help="Formato de las tramas (default: GAMA)")
+    parser.add_argument('--baudrate', type=int, default=9600)
+    parser.add_argument('--tramas', type=float, default=10.0,
+                        help="Tramas por segundo (0 = lo que permita el cable)")
+    parser.add_argument('--peso-min', type=float, default=15.0)
+    parser.add_argument('--peso-max', type=float, default=45.0)
+    parser.add_argument('--ruido', type=float, default=0.02, help="Desvío estándar en kg")
+    parser.add_argument('--deriva', type=float, default=0.0, help="Corrimiento del cero en kg/min")
+    parser.add_argument('--fallas', type=float, default=0.0,
+                        help="Probabilidad de falla por trama (0 a 1)")
+    parser.add_argument('--estable', type=float, default=3.0,
+                        help="Segundos que cada fardo queda estable")
+    parser.add_argument('--semilla', type=int, default=None)
+    args = parser.parse_args()
+
+    escenario = EscenarioFardos(args.peso_min, args.peso_max, args.ruido, args.deriva,
+                                tiempo_estable=args.estable, semilla=args.semilla)
+    emulador = EmuladorBalanza(args.protocolo, args.baudrate, args.tramas, escenario,
+                               args.fallas, semilla=args.semilla)
+    puerto = emulador.iniciar()
+    print(f"👉 Configure el puerto '{puerto}' en la aplicación (Ctrl+C para terminar)")
+
+    try:
+        while True:
+            time.sleep(5)
+            estado = emulador.obtener_estado()
+            print(f"📊 {estado['tramas_enviadas']} tramas, {estado['ciclos']} fardos, "
+                  f"{estado['fallas_inyectadas']} fallas, "
+                  f"{estado['tramas_descartadas']} descartadas - fase: {estado['fase']}")
+    except KeyboardInterrupt:
+        print("\n👋 Emulador detenido")
+    finally:
+        emulador.detener()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
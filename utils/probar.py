@@ -1,7 +1,13 @@
 # leer_balanza_cambios.py
+import os
+import sys
 import serial
 import re
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from funciones.lector_tramas import LectorTramas
+
 ser = serial.Serial(
     port='COM1',
     baudrate=9600,
@@ -21,7 +27,7 @@ ser.setRTS(True)
 print("Esperando datos de la balanza en COM1...")
 print("Solo se mostrarán los cambios de peso...\n")
 
-buffer = ""
+lector = LectorTramas()
 peso_anterior = None
 
 def extraer_peso(texto):
@@ -37,20 +43,16 @@ def extraer_peso(texto):
 
 try:
     while True:
-        if ser.in_waiting:
-            byte = ser.read().decode('ascii', errors='ignore')
-            if byte in ['\r', '\n']:  # Detectar fin de línea
-                if buffer.strip():
-                    peso_actual = extraer_peso(buffer.strip())
-                    
-                    # Solo mostrar si el peso cambió
-                    if peso_actual is not None and peso_actual != peso_anterior:
-                        print(f"Peso: {peso_actual} kg")
-                        peso_anterior = peso_actual
-                        
-                buffer = ""
-            else:
-                buffer += byte
+        # Lee todo lo pendiente de una vez (o espera hasta el timeout)
+        for trama in lector.leer(ser):
+            linea = trama.decode('ascii', errors='ignore').strip()
+            if linea:
+                peso_actual = extraer_peso(linea)
+                
+                # Solo mostrar si el peso cambió
+                if peso_actual is not None and peso_actual != peso_anterior:
+                    print(f"Peso: {peso_actual} kg")
+                    peso_anterior = peso_actual
 
 except KeyboardInterrupt:
     print("\nFinalizado por el usuario.")
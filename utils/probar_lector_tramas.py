@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de rendimiento del lector de tramas - Sistema de Pesaje de Fardos
+Mide cuántas tramas por segundo se pueden leer de un pseudo-terminal a 115200 bps
+y compara la lectura por bloques contra la lectura byte a byte.
+
+Solo Linux (usa pty). Devuelve código de salida 1 si no se alcanza el objetivo.
+"""
+
+import os
+import sys
+import pty
+import threading
+import time
+import serial
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from funciones.lector_tramas import LectorTramas
+
+BAUDRATE = 115200
+CANTIDAD_TRAMAS = 20000
+TRAMA = b"ST,GS,+0012.34kg\r\n"
+
+# 8N1: 10 bits por byte. Es la máxima cantidad de tramas que puede transportar el cable
+TRAMAS_POR_SEGUNDO_CABLE = BAUDRATE / 10 / len(TRAMA)
+# El lector tiene que ir holgadamente más rápido que el cable
+OBJETIVO_TRAMAS_POR_SEGUNDO = TRAMAS_POR_SEGUNDO_CABLE * 10
+
+
+def escribir_tramas(maestro):
+    """Escribe todas las tramas de prueba en el extremo maestro del pty"""
+    bloque = TRAMA * 100
+    for _ in range(CANTIDAD_TRAMAS // 100):
+        os.write(maestro, bloque)
+
+
+def abrir_pty():
+    """Crea un pty y abre el extremo esclavo como puerto serie"""
+    maestro, esclavo = pty.openpty()
+    conexion = serial.Serial(os.ttyname(esclavo), baudrate=BAUDRATE, timeout=0.5)
+    return maestro, esclavo, conexion
+
+
+def medir_por_bloques():
+    """Mide tramas/s usando LectorTramas"""
+    maestro, esclavo, conexion = abrir_pty()
+    lector = LectorTramas()
+    hilo = threading.Thread(target=escribir_tramas, args=(maestro,), daemon=True)
+
+    recibidas = 0
+    inicio = time.perf_counter()
+    hilo.start()
+    while recibidas < CANTIDAD_TRAMAS:
+        tramas = lector.leer(conexion)
+        if not tramas and not hilo.is_alive() and not conexion.in_waiting:
+            break
+        recibidas += len(tramas)
+    duracion = time.perf_counter() - inicio
+
+    conexion.close()
+    os.close(maestro)
+    os.close(esclavo)
+    return recibidas, duracion
+
+
+def medir_byte_a_byte():
+    """Mide tramas/s con la lectura anterior (un read() y un decode por byte)"""
+    maestro, esclavo, conexion = abrir_pty()
+    hilo = threading.Thread(target=escribir_tramas, args=(maestro,), daemon=True)
+
+    buffer = ""
+    recibidas = 0
+    inicio = time.perf_counter()
+    hilo.start()
+    while recibidas < CANTIDAD_TRAMAS:
+        byte = conexion.read().decode('ascii', errors='ignore')
+        if not byte:
+            break
+        if byte in ['\r', '\n']:
+            if buffer.strip():
+                recibidas += 1
+            buffer = ""
+        else:
+            buffer += byte
+    duracion = time.perf_counter() - inicio
+
+    conexion.close()
+    os.close(maestro)
+    os.close(esclavo)
+    return recibidas, duracion
+
+
+def main():
+    """Función principal"""
+    print(f"📏 Objetivo: {OBJETIVO_TRAMAS_POR_SEGUNDO:,.0f} tramas/s "
+          f"(cable a {BAUDRATE} bps: {TRAMAS_POR_SEGUNDO_CABLE:,.0f} tramas/s)")
+
+    recibidas, duracion = medir_byte_a_byte()
+    print(f"🐢 Byte a byte: {recibidas} tramas en {duracion:.3f} s "
+          f"-> {recibidas / duracion:,.0f} tramas/s")
+
+    recibidas, duracion = medir_por_bloques()
+    tasa = recibidas / duracion
+    print(f"🚀 Por bloques: {recibidas} tramas en {duracion:.3f} s "
+          f"-> {tasa:,.0f} tramas/s")
+
+    if recibidas < CANTIDAD_TRAMAS or tasa < OBJETIVO_TRAMAS_POR_SEGUNDO:
+        print("❌ No se alcanzó el objetivo de rendimiento")
+        return 1
+
+    print("✅ Objetivo de rendimiento alcanzado")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reproductor de capturas - Sistema de Pesaje de Fardos
+Pasa una o varias capturas crudas (BALANZA_CONFIG['grabar_captura']) por el mismo
+camino de adquisición que la balanza real y muestra cuántas tramas se
+decodificaron, cuántas cargas quedaron estables y a qué velocidad se procesó.
+
+Sirve para reproducir fallas de campo y comparar cambios del parser o de la
+detección de estabilidad contra tráfico real. Ejemplo:
+    python utils/reproducir_captura.py capturas/captura_*.cap --velocidad 0
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from funciones.conexion_balanza import ConexionBalanza
+from funciones.captura_serie import ReproductorCaptura, listar_capturas
+from funciones.protocolos import PROTOCOLOS, obtener_decodificador
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description="Reproduce capturas de la balanza")
+    parser.add_argument('capturas', nargs='*',
+                        help="Archivos .cap (default: todos los de la carpeta de capturas)")
+    parser.add_argument('--velocidad', type=float, default=0.0,
+                        help="1 = tiempo real, 2 = doble, 0 = lo más rápido posible (default)")
+    parser.add_argument('--protocolo', choices=list(PROTOCOLOS),
+                        help="Decodificador a usar (default: el grabado en la captura)")
+    args = parser.parse_args()
+
+    rutas = args.capturas
+    if not rutas:
+        carpeta = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                               'capturas')
+        rutas = listar_capturas(carpeta)
+    if not rutas:
+        print("❌ No hay capturas para reproducir")
+        return 1
+
+    balanza = ConexionBalanza(conectar=False)
+    protocolo = args.protocolo or ReproductorCaptura(rutas).metadatos.get('protocolo')
+    if protocolo:
+        balanza.protocolo = protocolo
+        balanza.decodificador = obtener_decodificador(protocolo)
+
+    print(f"▶️ Reproduciendo {len(rutas)} captura(s) como {balanza.protocolo}...")
+    inicio = time.perf_counter()
+    balanza.reproducir_captura(rutas, args.velocidad, esperar=True)
+    duracion = time.perf_counter() - inicio
+
+    estado = balanza.obtener_estado()
+    lectura = balanza.obtener_lectura()
+    recibidas = estado['tramas_recibidas']
+    print(f"📦 Tramas: {recibidas} ({estado['tramas_invalidas']} sin decodificar)")
+    print(f"⚖️ Cargas estables: {balanza.estabilidad.asentamientos}")
+    print(f"🏁 Última lectura: {lectura['peso']:.2f} kg")
+    if duracion > 0:
+        print(f"⏱️ {duracion:.3f} s -> {recibidas / duracion:,.0f} tramas/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -15,16 +15,16 @@ import os
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
-import sqlite3
 from typing import List, Optional, Tuple
 
 # Agregar el directorio actual al path para importaciones
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config.configuracion import COLORES, FUENTES, DIMENSIONES
+from config.configuracion import COLORES, FUENTES, DIMENSIONES, BASE_DATOS_CONFIG
 from interfaz.estilos import EstilosModernos, WidgetsPersonalizados
 from funciones.modelos import Ticket, Fardo
 from funciones.exportador import Exportador
+from funciones.conexion_bd import ConexionesSQLite
 
 class BaseDatosVisor:
     """Clase para manejar la base de datos en modo solo lectura"""
@@ -37,6 +37,8 @@ class BaseDatosVisor:
             self.ruta_db = self.buscar_base_datos()
         
         self.exportador = Exportador()
+        self.conexiones = ConexionesSQLite(self.ruta_db, solo_lectura=True)
+        self._con_resumen = None
         print(f"📍 Conectando a base de datos: {self.ruta_db}")
     
     def buscar_base_datos(self) -> str:
@@ -58,24 +60,55 @@ class BaseDatosVisor:
     def verificar_conexion(self) -> bool:
         """Verifica que se pueda conectar a la base de datos"""
         try:
-            with sqlite3.connect(self.ruta_db, timeout=5.0) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.consulta() as cursor:
                 cursor.execute("SELECT COUNT(*) FROM tickets")
                 return True
         except Exception as e:
             print(f"❌ Error de conexión: {e}")
             return False
     
-    def obtener_tickets(self, filtro_fecha: str = None, filtro_numero: str = None) -> List[Tuple]:
-        """Obtiene la lista de tickets con filtros opcionales"""
+    def tiene_resumen(self) -> bool:
+        """True si la base ya tiene tickets_resumen (la crea la aplicación de pesaje)"""
+        if self._con_resumen is None:
+            with self.conexiones.consulta() as cursor:
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'tickets_resumen'")
+                self._con_resumen = cursor.fetchone() is not None
+        return self._con_resumen
+    
+    def obtener_tickets(self, filtro_fecha: str = None, filtro_numero: str = None,
+                        limite: int = None) -> List[Tuple]:
+        """Obtiene la lista de tickets con filtros opcionales
+
+        Cada fila: numero, fecha_creacion, cantidad_fardos, peso_total,
+        fecha_guardado, kg_bruto_romaneo, agregado, resto, rinde (None si la
+        base todavía no tiene tickets_resumen o no hay kg de romaneo).
+        """
         try:
-            with sqlite3.connect(self.ruta_db, timeout=10.0) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.consulta() as cursor:
+                if self.tiene_resumen():
+                    query = '''
+                        SELECT numero, fecha_creacion, cantidad_fardos, peso_total, fecha_guardado,
+                               kg_bruto_romaneo, agregado, resto, rinde
+                        FROM tickets_resumen
+                        WHERE estado = 'ACTIVO'
+                    '''
+                    params = []
+                    if filtro_numero:
+                        query += " AND numero LIKE ?"
+                        params.append(f"%{filtro_numero}%")
+                    if filtro_fecha:
+                        query += " AND DATE(fecha_creacion) = ?"
+                        params.append(filtro_fecha)
+                    query += " ORDER BY fecha_guardado DESC LIMIT ?"
+                    params.append(-1 if limite is None else limite)
+                    cursor.execute(query, params)
+                    return cursor.fetchall()
                 
+                # Base de una versión anterior: se agrupan los fardos
                 query = '''
                     SELECT t.numero, t.fecha_creacion, COUNT(f.id) as cantidad_fardos,
                            COALESCE(SUM(f.peso), 0) as peso_total, t.fecha_guardado,
-                           t.kg_bruto_romaneo, t.agregado, t.resto
+                           t.kg_bruto_romaneo, t.agregado, t.resto, NULL as rinde
                     FROM tickets t
                     LEFT JOIN fardos f ON t.id = f.ticket_id
                     WHERE t.estado = 'ACTIVO'
@@ -94,7 +127,9 @@ class BaseDatosVisor:
                 query += '''
                     GROUP BY t.id, t.numero, t.fecha_creacion, t.fecha_guardado
                     ORDER BY t.fecha_guardado DESC
+                    LIMIT ?
                 '''
+                params.append(-1 if limite is None else limite)
                 
                 cursor.execute(query, params)
                 return cursor.fetchall()
@@ -106,8 +141,7 @@ class BaseDatosVisor:
     def cargar_ticket_completo(self, numero_ticket: str) -> Optional[Ticket]:
         """Carga un ticket completo con todos sus fardos"""
         try:
-            with sqlite3.connect(self.ruta_db, timeout=10.0) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.consulta() as cursor:
                 
                 # Obtener datos del ticket
                 cursor.execute('''
@@ -156,28 +190,26 @@ class BaseDatosVisor:
     def obtener_estadisticas_generales(self) -> dict:
         """Obtiene estadísticas generales"""
         try:
-            with sqlite3.connect(self.ruta_db, timeout=10.0) as conn:
-                cursor = conn.cursor()
+            with self.conexiones.consulta() as cursor:
                 
                 # Total de tickets
                 cursor.execute('SELECT COUNT(*) FROM tickets WHERE estado = "ACTIVO"')
                 total_tickets = cursor.fetchone()[0]
                 
-                # Total de fardos
-                cursor.execute('''
-                    SELECT COUNT(*) FROM fardos f
-                    JOIN tickets t ON f.ticket_id = t.id
-                    WHERE t.estado = "ACTIVO"
-                ''')
-                total_fardos = cursor.fetchone()[0]
-                
-                # Peso total
-                cursor.execute('''
-                    SELECT COALESCE(SUM(f.peso), 0) FROM fardos f
-                    JOIN tickets t ON f.ticket_id = t.id
-                    WHERE t.estado = "ACTIVO"
-                ''')
-                peso_total = cursor.fetchone()[0]
+                # Total de fardos y peso total
+                if self.tiene_resumen():
+                    cursor.execute('''
+                        SELECT COALESCE(SUM(cantidad_fardos), 0), COALESCE(SUM(peso_total), 0)
+                        FROM tickets_resumen
+                        WHERE estado = 'ACTIVO'
+                    ''')
+                else:
+                    cursor.execute('''
+                        SELECT COUNT(*), COALESCE(SUM(f.peso), 0) FROM fardos f
+                        JOIN tickets t ON f.ticket_id = t.id
+                        WHERE t.estado = "ACTIVO"
+                    ''')
+                total_fardos, peso_total = cursor.fetchone()
                 
                 return {
                     'total_tickets': total_tickets,
@@ -607,8 +639,9 @@ class VisorTickets:
             # Obtener filtro
             filtro = self.entry_filtro.get().strip()
             
-            # Cargar tickets
-            tickets = self.bd.obtener_tickets(filtro_numero=filtro if filtro else None)
+            # Cargar tickets (una página; el filtro encuentra los más viejos)
+            pagina = BASE_DATOS_CONFIG.get('pagina_historial', 500) or None
+            tickets = self.bd.obtener_tickets(filtro_numero=filtro if filtro else None, limite=pagina)
             
             # Limpiar tabla
             for item in self.tabla_tickets.get_children():
@@ -616,7 +649,7 @@ class VisorTickets:
             
             # Llenar tabla
             for ticket_data in tickets:
-                numero, fecha_creacion, cantidad_fardos, peso_total, fecha_guardado, kg_bruto_romaneo, agregado, resto = ticket_data
+                numero, fecha_creacion, cantidad_fardos, peso_total, fecha_guardado, kg_bruto_romaneo, agregado, resto, rinde = ticket_data
                 
                 # Formatear fecha
                 try:
@@ -625,9 +658,11 @@ class VisorTickets:
                 except:
                     fecha_str = fecha_creacion
                 
-                # Calcular rinde
+                # Rinde (precalculado en tickets_resumen; en bases viejas se calcula aquí)
                 rinde_str = "--"
-                if kg_bruto_romaneo and kg_bruto_romaneo > 0:
+                if rinde is not None:
+                    rinde_str = f"{rinde:.1f}%"
+                elif kg_bruto_romaneo and kg_bruto_romaneo > 0:
                     tara_fardos = cantidad_fardos * 2.0
                     agregado = agregado or 0.0
                     resto = resto or 0.0
@@ -644,7 +679,10 @@ class VisorTickets:
                 ))
             
             # Actualizar contador
-            self.label_total_tickets.configure(text=f"({len(tickets)} tickets)")
+            if pagina is not None and len(tickets) == pagina:
+                self.label_total_tickets.configure(text=f"(últimos {len(tickets)} tickets)")
+            else:
+                self.label_total_tickets.configure(text=f"({len(tickets)} tickets)")
             
             # Actualizar estadísticas generales
             self.actualizar_estadisticas_generales()
@@ -921,6 +959,7 @@ RINDE:
         
         # Iniciar loop principal
         self.root.mainloop()
+        self.bd.conexiones.cerrar()
 
 def main():
     """Función principal"""